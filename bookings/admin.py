@@ -5,7 +5,10 @@ File Location: bookings/admin.py
 """
 
 from django.contrib import admin
-from .models import Booking, GuestDetail, Payment, Coupon
+from . import rollups
+from .analytics import sync_bookings
+from .inventory import release_booking
+from .models import Booking, GuestDetail, Payment, PaymentEvent, PaymentOutbox, Coupon
 
 
 class GuestDetailInline(admin.StackedInline):
@@ -70,6 +73,9 @@ class BookingAdmin(admin.ModelAdmin):
         'guest_detail__phone'
     ]
     
+    # guest_name reads guest_detail; join it instead of one query per row
+    list_select_related = ['hotel', 'guest_detail']
+    
     readonly_fields = [
         'booking_id', 
         'created_at', 
@@ -137,19 +143,32 @@ class BookingAdmin(admin.ModelAdmin):
     
     def mark_as_confirmed(self, request, queryset):
         """Mark selected bookings as confirmed"""
+        ids = list(queryset.values_list('pk', flat=True))
         updated = queryset.update(status='confirmed')
+        sync_bookings(ids)
+        rollups.schedule_bookings(ids)
         self.message_user(request, f'{updated} booking(s) marked as confirmed.')
     mark_as_confirmed.short_description = "Mark as Confirmed"
     
     def mark_as_completed(self, request, queryset):
         """Mark selected bookings as completed"""
+        ids = list(queryset.values_list('pk', flat=True))
         updated = queryset.update(status='completed')
+        sync_bookings(ids)
+        rollups.schedule_bookings(ids)
         self.message_user(request, f'{updated} booking(s) marked as completed.')
     mark_as_completed.short_description = "Mark as Completed"
     
     def mark_as_cancelled(self, request, queryset):
         """Mark selected bookings as cancelled"""
+        ids = list(queryset.values_list('pk', flat=True))
+        holding = list(queryset.filter(inventory_reserved=True))
         updated = queryset.update(status='cancelled')
+        # Bulk updates skip post_save, so hand the rooms back explicitly
+        for booking in holding:
+            release_booking(booking)
+        sync_bookings(ids)
+        rollups.schedule_bookings(ids)
         self.message_user(request, f'{updated} booking(s) marked as cancelled.')
     mark_as_cancelled.short_description = "Mark as Cancelled"
 
@@ -214,4 +233,69 @@ class CouponAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ['used_count']
\ No newline at end of file
+    readonly_fields = ['used_count']
+
+@admin.register(PaymentOutbox)
+class PaymentOutboxAdmin(admin.ModelAdmin):
+    """Read-only view of queued gateway orders (written by bookings/outbox.py)"""
+    
+    list_display = [
+        'payment',
+        'status',
+        'attempts',
+        'next_attempt_at',
+        'processed_at',
+        'created_at'
+    ]
+    
+    list_filter = ['status']
+    
+    search_fields = ['payment__booking__booking_id']
+    
+    readonly_fields = [
+        'payment',
+        'status',
+        'attempts',
+        'next_attempt_at',
+        'last_error',
+        'processed_at',
+        'created_at'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    """Read-only log of Razorpay webhook deliveries"""
+    
+    list_display = [
+        'event_id',
+        'event',
+        'order_id',
+        'outcome',
+        'received_at',
+        'processed_at'
+    ]
+    
+    list_filter = ['event', 'outcome']
+    
+    search_fields = ['event_id', 'order_id', 'payment_id']
+    
+    readonly_fields = [
+        'event_id',
+        'event',
+        'order_id',
+        'payment_id',
+        'payload',
+        'outcome',
+        'received_at',
+        'processed_at'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,226 @@
+"""
+Occupancy, ADR and RevPAR
+
+Reports never touch the bookings table. Each confirmed booking contributes
+one BookedNight row per night (rooms sold and that night's share of the room
+revenue before taxes); a booking that stops being confirmed contributes the
+same rows negated. The table is append-only, so any date range sums to the
+current truth, and per-hotel reports are a GROUP BY over the covering
+(hotel, date, rooms, revenue) index.
+
+Facts follow Booking state through ``sync_booking`` (post_save, see
+bookings/signals.py) and ``sync_bookings`` for the paths that update bookings
+in bulk (webhook and reconciliation batches, admin actions). The
+``Booking.nights_recorded`` flag is flipped with a conditional UPDATE before
+rows are written, as ``inventory_reserved`` is, so a booking is never counted
+twice. ``manage.py backfill_booked_nights`` records bookings confirmed before
+the table existed.
+
+``performance()`` turns the grouped rows into daily arrays and derives the
+metrics with NumPy:
+
+    occupancy = rooms sold / rooms available
+    ADR       = room revenue / rooms sold
+    RevPAR    = room revenue / rooms available
+
+Rooms available are the hotel's current ``total_rooms`` for every night.
+
+File Location: bookings/analytics.py
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+
+from hotels.models import RoomType
+
+from .models import BookedNight, Booking
+
+
+CONFIRMED_STATUSES = ('confirmed', 'completed')
+PAISE = Decimal('0.01')
+SYNC_CHUNK_SIZE = 500
+FACT_FIELDS = ['pk', 'hotel_id', 'room_type_id', 'check_in', 'nights', 'num_rooms',
+               'base_price', 'discount_amount', 'coupon_discount']
+
+
+def room_revenue(booking):
+    """Revenue from the rooms themselves: base price less discounts, before taxes"""
+    amounts = [Decimal(str(amount)) for amount in (booking.base_price, booking.discount_amount, booking.coupon_discount)]
+    return max(amounts[0] - amounts[1] - amounts[2], Decimal(0))
+
+
+def night_rows(booking):
+    """Unsaved BookedNight rows for a booking; the last night takes the rounding remainder"""
+    if not booking.nights:
+        return []
+    revenue = room_revenue(booking)
+    share = (revenue / booking.nights).quantize(PAISE, rounding=ROUND_DOWN)
+    rows = []
+    for offset in range(booking.nights):
+        last = offset == booking.nights - 1
+        rows.append(BookedNight(
+            booking_id=booking.pk,
+            hotel_id=booking.hotel_id,
+            room_type_id=booking.room_type_id,
+            date=booking.check_in + timedelta(days=offset),
+            rooms=booking.num_rooms,
+            revenue=revenue - share * (booking.nights - 1) if last else share,
+        ))
+    return rows
+
+
+def reversal_rows(booking_ids):
+    """Rows cancelling whatever the given bookings currently contribute"""
+    current = (
+        BookedNight.objects.filter(booking_id__in=booking_ids)
+        .values('booking_id', 'hotel_id', 'room_type_id', 'date')
+        .annotate(rooms=Sum('rooms'), revenue=Sum('revenue'))
+        .order_by()
+    )
+    return [
+        BookedNight(
+            booking_id=row['booking_id'],
+            hotel_id=row['hotel_id'],
+            room_type_id=row['room_type_id'],
+            date=row['date'],
+            rooms=-row['rooms'],
+            revenue=-row['revenue'],
+        )
+        for row in current
+        if row['rooms'] or row['revenue']
+    ]
+
+
+def sync_booking(booking):
+    """Record or reverse one booking's nights to match its status"""
+    confirmed = booking.status in CONFIRMED_STATUSES
+    if confirmed == booking.nights_recorded:
+        return
+    with transaction.atomic(savepoint=False):
+        claimed = Booking.objects.filter(pk=booking.pk, nights_recorded=not confirmed).update(
+            nights_recorded=confirmed
+        )
+        if claimed:
+            BookedNight.objects.bulk_create(night_rows(booking) if confirmed else reversal_rows([booking.pk]))
+    booking.nights_recorded = confirmed
+
+
+def sync_bookings(booking_ids):
+    """
+    ``sync_booking`` for many bookings changed without post_save; a fixed
+    number of statements per chunk of ``SYNC_CHUNK_SIZE`` bookings
+    """
+    booking_ids = list(booking_ids)
+    for start in range(0, len(booking_ids), SYNC_CHUNK_SIZE):
+        chunk = booking_ids[start:start + SYNC_CHUNK_SIZE]
+        with transaction.atomic(savepoint=False):
+            to_record = list(
+                Booking.objects.filter(pk__in=chunk, status__in=CONFIRMED_STATUSES, nights_recorded=False)
+                .only(*FACT_FIELDS)
+                .order_by()
+            )
+            if to_record:
+                Booking.objects.filter(pk__in=[booking.pk for booking in to_record]).update(nights_recorded=True)
+                BookedNight.objects.bulk_create(
+                    [row for booking in to_record for row in night_rows(booking)], batch_size=500
+                )
+            to_reverse = list(
+                Booking.objects.filter(pk__in=chunk, nights_recorded=True)
+                .exclude(status__in=CONFIRMED_STATUSES)
+                .values_list('pk', flat=True)
+                .order_by()
+            )
+            if to_reverse:
+                Booking.objects.filter(pk__in=to_reverse).update(nights_recorded=False)
+                BookedNight.objects.bulk_create(reversal_rows(to_reverse), batch_size=500)
+
+
+@dataclass(frozen=True)
+class Performance:
+    start: object
+    end: object
+    days: list
+    totals: dict
+    room_types: list
+
+
+def _ratios(numerator, denominator):
+    """Element-wise numerator / denominator, 0 where the denominator is 0"""
+    out = np.zeros_like(numerator, dtype=float)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def performance(start, end, hotel_ids=None):
+    """
+    Daily and total occupancy, ADR and RevPAR for nights ``start``..``end``
+    (inclusive), for the given hotels or all of them. Three queries.
+    """
+    span = (end - start).days + 1
+    facts = BookedNight.objects.filter(date__gte=start, date__lte=end)
+    room_types = RoomType.objects.all()
+    if hotel_ids is not None:
+        facts = facts.filter(hotel_id__in=hotel_ids)
+        room_types = room_types.filter(hotel_id__in=hotel_ids)
+
+    daily = list(
+        facts.values('date').annotate(rooms=Sum('rooms'), revenue=Sum('revenue')).order_by()
+    )
+    by_room_type = {
+        row['room_type_id']: row
+        for row in facts.values('room_type_id').annotate(rooms=Sum('rooms'), revenue=Sum('revenue')).order_by()
+    }
+    inventory = list(room_types.values_list('id', 'name', 'hotel__name', 'total_rooms').order_by('hotel__name', 'name'))
+
+    offsets = np.array([(row['date'] - start).days for row in daily], dtype=int)
+    sold = np.zeros(span)
+    revenue = np.zeros(span)
+    sold[offsets] = [row['rooms'] for row in daily]
+    revenue[offsets] = [float(row['revenue']) for row in daily]
+    available = np.full(span, float(sum(total for _, _, _, total in inventory)))
+
+    occupancy = _ratios(sold, available) * 100
+    adr = _ratios(revenue, sold)
+    revpar = _ratios(revenue, available)
+    days = [
+        {
+            'date': start + timedelta(days=offset),
+            'rooms_sold': int(sold[offset]),
+            'rooms_available': int(available[offset]),
+            'occupancy': round(float(occupancy[offset]), 1),
+            'adr': round(float(adr[offset]), 2),
+            'revpar': round(float(revpar[offset]), 2),
+            'revenue': round(float(revenue[offset]), 2),
+        }
+        for offset in range(span)
+    ]
+
+    total_sold, total_available, total_revenue = float(sold.sum()), float(available.sum()), float(revenue.sum())
+    totals = {
+        'rooms_sold': int(total_sold),
+        'rooms_available': int(total_available),
+        'revenue': round(total_revenue, 2),
+        'occupancy': round(total_sold / total_available * 100, 1) if total_available else 0.0,
+        'adr': round(total_revenue / total_sold, 2) if total_sold else 0.0,
+        'revpar': round(total_revenue / total_available, 2) if total_available else 0.0,
+    }
+
+    rows = []
+    for room_type_id, name, hotel_name, total_rooms in inventory:
+        row = by_room_type.get(room_type_id, {})
+        rooms_sold, room_revenue_total = row.get('rooms') or 0, float(row.get('revenue') or 0)
+        capacity = total_rooms * span
+        rows.append({
+            'room_type': name,
+            'hotel': hotel_name,
+            'rooms_sold': rooms_sold,
+            'occupancy': round(rooms_sold / capacity * 100, 1) if capacity else 0.0,
+            'adr': round(room_revenue_total / rooms_sold, 2) if rooms_sold else 0.0,
+            'revenue': round(room_revenue_total, 2),
+        })
+    return Performance(start=start, end=end, days=days, totals=totals, room_types=rows)
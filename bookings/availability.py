@@ -0,0 +1,127 @@
+"""
+Room availability engine
+
+Answers "which room types can still sell N rooms for these nights?" with a
+bounded number of queries regardless of how many hotels are being searched:
+one for the candidate room types and one interval-overlap query for the
+bookings that hold rooms during the stay. The peak number of rooms held on
+any single night is then computed per room type with a sweep over the
+overlapping bookings, so back-to-back stays do not double count.
+
+File Location: bookings/availability.py
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db.models import F
+
+from hotels.models import RoomType
+
+from .models import Booking
+
+
+# Bookings in these states do not hold inventory
+RELEASED_STATUSES = ('cancelled',)
+
+
+def parse_stay(checkin, checkout):
+    """Return ``(check_in, check_out)`` dates, or None for a missing/invalid stay"""
+    if not checkin or not checkout:
+        return None
+    try:
+        check_in = datetime.strptime(checkin, '%Y-%m-%d').date()
+        check_out = datetime.strptime(checkout, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+    if check_out <= check_in:
+        return None
+    return check_in, check_out
+
+
+def overlapping_bookings(check_in, check_out, room_type_ids=None):
+    """Bookings holding rooms on at least one night of ``[check_in, check_out)``"""
+    bookings = Booking.objects.filter(
+        check_in__lt=check_out,
+        check_out__gt=check_in,
+    ).exclude(status__in=RELEASED_STATUSES)
+    if room_type_ids is not None:
+        bookings = bookings.filter(room_type_id__in=room_type_ids)
+    return bookings
+
+
+def rooms_held(check_in, check_out, room_type_ids=None):
+    """Map room_type_id -> peak rooms held by bookings on any night of the stay"""
+    events = defaultdict(list)
+    rows = overlapping_bookings(check_in, check_out, room_type_ids).values_list(
+        'room_type_id', 'check_in', 'check_out', 'num_rooms'
+    )
+    for room_type_id, start, end, num_rooms in rows:
+        events[room_type_id].append((max(start, check_in), num_rooms))
+        events[room_type_id].append((min(end, check_out), -num_rooms))
+
+    held = {}
+    for room_type_id, changes in events.items():
+        # Check-outs sort before check-ins on the same day, freeing the room first
+        changes.sort(key=lambda change: (change[0], change[1]))
+        current = peak = 0
+        for _, delta in changes:
+            current += delta
+            peak = max(peak, current)
+        held[room_type_id] = peak
+    return held
+
+
+def nightly_rooms_held(room_type_id, check_in, check_out):
+    """Map each night of ``[check_in, check_out)`` -> rooms held by bookings"""
+    held = defaultdict(int)
+    rows = overlapping_bookings(check_in, check_out, [room_type_id]).values_list(
+        'check_in', 'check_out', 'num_rooms'
+    )
+    for start, end, num_rooms in rows:
+        night = max(start, check_in)
+        while night < min(end, check_out):
+            held[night] += num_rooms
+            night += timedelta(days=1)
+    return held
+
+
+def _sellable(check_in, check_out, guests, rooms, hotel_ids):
+    candidates = RoomType.objects.filter(
+        is_available=True,
+        total_rooms__gte=rooms,
+    ).annotate(
+        party_capacity=F('max_guests') * rooms,
+    ).filter(party_capacity__gte=guests)
+    if hotel_ids is not None:
+        candidates = candidates.filter(hotel_id__in=hotel_ids)
+    inventory = {
+        room_type_id: (hotel_id, total_rooms)
+        for room_type_id, hotel_id, total_rooms in candidates.values_list('id', 'hotel_id', 'total_rooms')
+    }
+    if not inventory:
+        return {}
+
+    held = rooms_held(check_in, check_out, candidates.values('id'))
+    sellable = {}
+    for room_type_id, (hotel_id, total_rooms) in inventory.items():
+        remaining = total_rooms - held.get(room_type_id, 0)
+        if remaining >= rooms:
+            sellable[room_type_id] = (hotel_id, remaining)
+    return sellable
+
+
+def sellable_room_types(check_in, check_out, guests=1, rooms=1, hotel_ids=None):
+    """
+    Map room_type_id -> free rooms for room types that can host ``guests``
+    across ``rooms`` rooms for the whole stay. ``hotel_ids`` may be a list
+    or a queryset (used as a subquery).
+    """
+    sellable = _sellable(check_in, check_out, guests, rooms, hotel_ids)
+    return {room_type_id: remaining for room_type_id, (_, remaining) in sellable.items()}
+
+
+def available_hotel_ids(check_in, check_out, guests=1, rooms=1, hotel_ids=None):
+    """Ids of hotels with at least one sellable room type for the stay"""
+    sellable = _sellable(check_in, check_out, guests, rooms, hotel_ids)
+    return {hotel_id for hotel_id, _ in sellable.values()}
@@ -0,0 +1,167 @@
+"""
+Coupon lookup and redemption
+
+Redemption is a single conditional UPDATE:
+``used_count = used_count + 1 WHERE used_count < max_uses`` plus the
+active/validity-date/minimum-amount guards. Two guests racing for the last
+use of a flash coupon can therefore never both get it, and there is no
+read-modify-write window in Python.
+
+Lookups are served from a per-process cache so a burst of checkouts using a
+promo like TEMPLE20 does not hit the Coupon table for every request:
+
+* entries are keyed by code and hold the Coupon row as last loaded; unknown
+  codes are cached too (negative caching), so typos and guessing cost
+  nothing after the first miss
+* a shared version number in the Django cache is bumped whenever a coupon is
+  saved or deleted (bookings/signals.py); every process drops its entries
+  when it sees a new version
+* redemptions deliberately do not bump the version. The cached ``used_count``
+  may lag, which is harmless because the UPDATE is authoritative, and a
+  coupon seen to be exhausted is marked so locally
+* releases do bump it: a use handed back can revive a coupon that some
+  process has cached (or marked) as exhausted, and that process would
+  otherwise keep rejecting it until its entry expired
+
+File Location: bookings/coupons.py
+"""
+
+import threading
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Coupon
+
+
+COUPON_VERSION_KEY = "bookings:coupons:version"
+# Upper bound on staleness even if a version bump is missed (e.g. bulk updates)
+LOCAL_CACHE_SECONDS = 300
+
+_MISSING = object()
+_lock = threading.Lock()
+_local = {"version": None, "entries": {}}
+
+
+class CouponRejected(Exception):
+    """Raised with a guest-facing reason when a coupon cannot be applied"""
+
+
+def normalise_code(code):
+    return (code or "").strip().upper()
+
+
+def bump_coupon_version():
+    """Invalidate every process's coupon cache"""
+    try:
+        cache.incr(COUPON_VERSION_KEY)
+    except ValueError:
+        cache.set(COUPON_VERSION_KEY, time.time_ns(), None)
+
+
+def _current_version():
+    version = cache.get(COUPON_VERSION_KEY)
+    if version is None:
+        cache.add(COUPON_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(COUPON_VERSION_KEY)
+    return version
+
+
+def get_coupon(code):
+    """The Coupon for ``code`` (from the local cache when possible) or None"""
+    code = normalise_code(code)
+    if not code:
+        return None
+    version = _current_version()
+    now = time.monotonic()
+    with _lock:
+        if _local["version"] != version:
+            _local["version"] = version
+            _local["entries"] = {}
+        entry = _local["entries"].get(code)
+    if entry is not None and entry[1] > now:
+        coupon = entry[0]
+        return None if coupon is _MISSING else coupon
+
+    coupon = Coupon.objects.filter(code=code).first()
+    with _lock:
+        if _local["version"] == version:
+            _local["entries"][code] = (coupon or _MISSING, now + LOCAL_CACHE_SECONDS)
+    return coupon
+
+
+def _mark_exhausted(coupon):
+    """Remember locally that the last use has gone, without a DB round trip"""
+    coupon.used_count = max(coupon.used_count, coupon.max_uses)
+
+
+def coupon_discount(coupon, amount):
+    """Discount ``coupon`` gives on ``amount`` (Decimal), rounded to paise"""
+    amount = Decimal(amount)
+    if coupon.discount_type == "percentage":
+        discount = amount * coupon.discount_value / 100
+        if coupon.max_discount:
+            discount = min(discount, coupon.max_discount)
+    else:
+        discount = coupon.discount_value
+    return min(discount, amount).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def check_coupon(coupon, amount, today=None):
+    """Raise CouponRejected if the (possibly cached) coupon clearly cannot apply"""
+    today = today or timezone.localdate()
+    if coupon is None or not coupon.is_active:
+        raise CouponRejected("Coupon code is invalid or expired.")
+    if not coupon.valid_from <= today <= coupon.valid_until:
+        raise CouponRejected("Coupon code is invalid or expired.")
+    if coupon.used_count >= coupon.max_uses:
+        raise CouponRejected("This coupon has been fully redeemed.")
+    if Decimal(amount) < coupon.min_booking_amount:
+        raise CouponRejected(
+            f"This coupon needs a minimum booking of ₹{coupon.min_booking_amount:,.0f}."
+        )
+
+
+def redeem_coupon(code, amount):
+    """
+    Atomically claim one use of ``code`` for a booking worth ``amount``.
+    Returns ``(coupon, discount)`` or raises CouponRejected.
+    """
+    amount = Decimal(amount)
+    today = timezone.localdate()
+    coupon = get_coupon(code)
+    check_coupon(coupon, amount, today)
+
+    claimed = Coupon.objects.filter(
+        pk=coupon.pk,
+        is_active=True,
+        valid_from__lte=today,
+        valid_until__gte=today,
+        min_booking_amount__lte=amount,
+        used_count__lt=F("max_uses"),
+    ).update(used_count=F("used_count") + 1)
+    if not claimed:
+        # The cached row was stale; the only guard that moves on its own is usage
+        _mark_exhausted(coupon)
+        raise CouponRejected("This coupon has been fully redeemed.")
+    return coupon, coupon_discount(coupon, amount)
+
+
+def release_coupon(coupon):
+    """Give back a use claimed by a booking that did not go through"""
+    released = Coupon.objects.filter(pk=coupon.pk, used_count__gt=0).update(used_count=F("used_count") - 1)
+    coupon.used_count = min(coupon.used_count, coupon.max_uses - 1)
+    if released:
+        bump_coupon_version()
+
+
+def release_coupon_uses(code_counts):
+    """Give back uses in bulk: ``{code: uses}``, one UPDATE per code"""
+    released = 0
+    for code, count in code_counts.items():
+        released += Coupon.objects.filter(code=code, used_count__gte=count).update(used_count=F("used_count") - count)
+    if released:
+        bump_coupon_version()
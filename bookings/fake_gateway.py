@@ -0,0 +1,146 @@
+"""
+Local stand-in for the Razorpay orders API
+
+``FakeRazorpay`` runs a threaded keep-alive HTTP server on 127.0.0.1 that
+implements ``POST /v1/orders`` and ``GET /v1/orders/<id>`` closely enough
+for ``razorpay.Client``. ``mode`` can be switched while it runs:
+
+* ``ok``: orders are created and returned
+* ``error``: HTTP 500 with a SERVER_ERROR body (razorpay raises ServerError)
+* ``slow``: answers after ``delay`` seconds, to exercise read timeouts
+
+It counts requests and TCP connections, so tests can check that the pooled
+client reuses connections. The gateway tests use it directly. For
+benchmarks, run ``manage.py fake_razorpay`` and start the site with
+RAZORPAY_BASE_URL pointing at it.
+
+File Location: bookings/fake_gateway.py
+"""
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-reply; that is the point of slow mode
+        pass
+
+
+class FakeRazorpay:
+    def __init__(self, host='127.0.0.1', port=0, mode='ok', delay=0.0):
+        self.mode = mode
+        self.delay = delay
+        self.orders = {}
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self.server = _QuietServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def create_order(self, payload):
+        order = {
+            'id': f"order_{uuid.uuid4().hex[:14]}",
+            'entity': 'order',
+            'amount': payload['amount'],
+            'amount_paid': 0,
+            'amount_due': payload['amount'],
+            'currency': payload.get('currency', 'INR'),
+            'receipt': payload.get('receipt'),
+            'notes': payload.get('notes') or {},
+            'status': 'created',
+            'attempts': 0,
+            'created_at': int(time.time()),
+        }
+        with self._lock:
+            self.orders[order['id']] = order
+        return order
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real API, so connection reuse is visible
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                fake._count('connections')
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _error(self, status, code, description):
+                self._reply(status, {'error': {'code': code, 'description': description}})
+
+            def _gate(self):
+                """Apply the current mode; False when the request was answered with an error"""
+                fake._count('requests')
+                if fake.mode == 'slow':
+                    time.sleep(fake.delay)
+                if fake.mode == 'error':
+                    self._error(500, 'SERVER_ERROR', 'The server encountered an error.')
+                    return False
+                return True
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                if not self._gate():
+                    return
+                if self.path.rstrip('/') != '/v1/orders':
+                    return self._error(404, 'BAD_REQUEST_ERROR', 'The requested URL was not found on the server.')
+                try:
+                    payload = json.loads(body or b'{}')
+                except ValueError:
+                    return self._error(400, 'BAD_REQUEST_ERROR', 'Malformed JSON body.')
+                if not isinstance(payload.get('amount'), int) or payload['amount'] < 100:
+                    return self._error(400, 'BAD_REQUEST_ERROR', 'Order amount less than minimum amount allowed')
+                self._reply(200, fake.create_order(payload))
+
+            def do_GET(self):
+                if not self._gate():
+                    return
+                order = fake.orders.get(self.path.rstrip('/').rsplit('/', 1)[-1])
+                if not self.path.startswith('/v1/orders/') or order is None:
+                    return self._error(400, 'BAD_REQUEST_ERROR', 'The id provided does not exist')
+                self._reply(200, order)
+
+        return Handler
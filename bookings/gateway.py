@@ -0,0 +1,209 @@
+"""
+Razorpay gateway client
+
+One ``razorpay.Client`` per process, built on a pooled ``requests`` session
+(keep-alive connections, no urllib3 retries) with explicit connect/read
+timeouts, so a slow gateway costs a request at most ``RAZORPAY_*_TIMEOUT``
+seconds instead of the library's unbounded default.
+
+Calls that go over the network pass through a circuit breaker:
+
+* closed: calls go through; ``BREAKER_FAILURE_THRESHOLD`` consecutive
+  failures (timeouts, connection errors, 5xx/gateway errors) open it
+* open: calls fail fast with GatewayUnavailable and the booking page hides
+  the Razorpay option, steering guests to Pay at Hotel
+* after ``BREAKER_COOLDOWN_SECONDS`` a single trial call is let through
+  (half-open); success closes the breaker, failure re-opens it
+
+Bad requests (4xx) are our fault, not the gateway's, and do not count.
+Breaker state is per process, like the coupon cache in bookings/coupons.py.
+``bookings/fake_gateway.py`` serves a local stand-in for tests and
+benchmarks (point ``RAZORPAY_BASE_URL`` at it).
+
+File Location: bookings/gateway.py
+"""
+
+import hashlib
+import hmac
+import threading
+import time
+import warnings
+
+warnings.filterwarnings(
+    "ignore",
+    message=r"pkg_resources is deprecated as an API",
+    category=UserWarning,
+    module="razorpay.client",
+)
+
+import razorpay
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+POOL_MAXSIZE = 10
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 30
+
+# Failures that say the gateway is unhealthy (requests' JSON errors included)
+GATEWAY_FAILURES = (
+    requests.RequestException,
+    razorpay.errors.ServerError,
+    razorpay.errors.GatewayError,
+)
+
+
+class GatewayUnavailable(Exception):
+    """Online payments are not configured or the circuit breaker is open"""
+
+
+class TimeoutSession(requests.Session):
+    """Session with a connection pool and a default timeout on every request"""
+
+    def __init__(self, timeout, pool_maxsize=POOL_MAXSIZE):
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def _cooled_down(self):
+        return time.monotonic() - self.opened_at >= self.cooldown
+
+    @property
+    def available(self):
+        """Whether a call would be attempted now (no state change)"""
+        with self._lock:
+            return self.state == self.CLOSED or (self.state == self.OPEN and self._cooled_down())
+
+    def before_call(self):
+        """Admit a call or raise GatewayUnavailable; only one half-open trial at a time"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and self._cooled_down():
+                self.state = self.HALF_OPEN
+                return
+            raise GatewayUnavailable("Razorpay is temporarily unavailable")
+
+    def record_success(self):
+        with self._lock:
+            self.reset()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker()
+_lock = threading.Lock()
+_client = {'config': None, 'client': None}
+
+
+def gateway_configured():
+    return bool(settings.RAZORPAY_KEY_ID and settings.RAZORPAY_KEY_SECRET)
+
+
+def online_payments_available():
+    """Offer Razorpay only when it is configured and not known to be failing"""
+    return gateway_configured() and breaker.available
+
+
+def _config():
+    return (
+        settings.RAZORPAY_KEY_ID,
+        settings.RAZORPAY_KEY_SECRET,
+        settings.RAZORPAY_BASE_URL,
+        (settings.RAZORPAY_CONNECT_TIMEOUT, settings.RAZORPAY_READ_TIMEOUT),
+    )
+
+
+def get_client():
+    """The process-wide Razorpay client, rebuilt only if the settings change"""
+    if not gateway_configured():
+        raise GatewayUnavailable("Razorpay credentials are not configured")
+    config = _config()
+    with _lock:
+        if _client['config'] != config:
+            key_id, key_secret, base_url, timeout = config
+            if _client['client'] is not None:
+                _client['client'].session.close()
+            _client['client'] = razorpay.Client(
+                session=TimeoutSession(timeout),
+                auth=(key_id, key_secret),
+                base_url=base_url,
+            )
+            _client['config'] = config
+        return _client['client']
+
+
+def call(operation, *args, **kwargs):
+    """Run ``operation(client, ...)`` through the circuit breaker"""
+    client = get_client()
+    breaker.before_call()
+    try:
+        result = operation(client, *args, **kwargs)
+    except GATEWAY_FAILURES:
+        breaker.record_failure()
+        raise
+    except Exception:
+        # e.g. BadRequestError: the gateway answered, so it is healthy
+        breaker.record_success()
+        raise
+    breaker.record_success()
+    return result
+
+
+def create_order(amount_paise, receipt, notes=None):
+    """Create a Razorpay order; returns the order dict"""
+    return call(lambda client: client.order.create(data={
+        'amount': amount_paise,
+        'currency': settings.RAZORPAY_DEFAULT_CURRENCY,
+        'receipt': receipt,
+        'notes': notes or {},
+    }))
+
+
+def verify_payment_signature(order_id, payment_id, signature):
+    """Local HMAC check (no network call); raises SignatureVerificationError"""
+    return get_client().utility.verify_payment_signature({
+        'razorpay_order_id': order_id,
+        'razorpay_payment_id': payment_id,
+        'razorpay_signature': signature,
+    })
+
+
+def verify_webhook_signature(body, signature):
+    """
+    Whether ``signature`` (the X-Razorpay-Signature header) is the HMAC-SHA256
+    of the raw request ``body`` under RAZORPAY_WEBHOOK_SECRET. Local only, so
+    webhooks are accepted even while the breaker is open.
+    """
+    secret = settings.RAZORPAY_WEBHOOK_SECRET
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
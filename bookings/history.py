@@ -0,0 +1,68 @@
+"""
+A guest's booking history
+
+The user dashboard and ``bookings:my_bookings`` show the same history. It
+costs two queries however many stays a repeat pilgrim has made:
+
+* one conditional aggregate counts all, upcoming and previous bookings
+* one query fetches the most recent ``HISTORY_LIMIT`` bookings with their
+  hotel, room type and payment joined in, and they are split into upcoming
+  and previous in Python
+
+Upcoming means not yet checked in and still pending or confirmed; previous
+means checked out, completed or cancelled. A stay in progress is neither.
+
+File Location: bookings/history.py
+"""
+
+from dataclasses import dataclass
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Booking
+
+
+HISTORY_LIMIT = 200
+UPCOMING_STATUSES = ('pending', 'confirmed')
+CLOSED_STATUSES = ('completed', 'cancelled')
+
+
+@dataclass(frozen=True)
+class BookingHistory:
+    bookings: list
+    upcoming: list
+    previous: list
+    total_count: int
+    upcoming_count: int
+    previous_count: int
+
+
+def is_upcoming(booking, today):
+    return booking.check_in >= today and booking.status in UPCOMING_STATUSES
+
+
+def is_previous(booking, today):
+    return booking.check_out < today or booking.status in CLOSED_STATUSES
+
+
+def booking_history(user, today=None, limit=HISTORY_LIMIT):
+    """The user's bookings (newest first) split into upcoming and previous"""
+    today = today or timezone.localdate()
+    mine = Booking.objects.filter(user=user)
+    counts = mine.aggregate(
+        total=Count('id'),
+        upcoming=Count('id', filter=Q(check_in__gte=today, status__in=UPCOMING_STATUSES)),
+        previous=Count('id', filter=Q(check_out__lt=today) | Q(status__in=CLOSED_STATUSES)),
+    )
+    bookings = list(
+        mine.select_related('hotel', 'room_type', 'payment').order_by('-created_at')[:limit]
+    )
+    return BookingHistory(
+        bookings=bookings,
+        upcoming=[booking for booking in bookings if is_upcoming(booking, today)],
+        previous=[booking for booking in bookings if is_previous(booking, today)],
+        total_count=counts['total'],
+        upcoming_count=counts['upcoming'],
+        previous_count=counts['previous'],
+    )
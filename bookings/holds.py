@@ -0,0 +1,164 @@
+"""
+Expiry of unpaid booking holds
+
+An online booking takes its rooms from the ledger as soon as it is created
+and stays ``pending`` until the payment is verified. If the guest never pays,
+the hold lapses ``BOOKING_HOLD_MINUTES`` after the booking was made:
+
+* ``sweep()`` finds lapsed holds with a range scan of the
+  (status, created_at) index, ``HOLD_SWEEP_BATCH`` at a time
+* each batch is expired with one UPDATE ... RETURNING of the bookings, so
+  a hold confirmed or cancelled by someone else in the meantime is left
+  alone (databases without RETURNING, such as SQLite before 3.35, lock the
+  batch with SELECT ... FOR UPDATE instead); a second one claims the rooms
+  still held, which are returned with ``inventory.release_many`` (one
+  UPDATE per room type and room count), and single UPDATEs handle queued
+  gateway orders, payment remarks and coupon uses, so a sweep costs the
+  same whether it expires one booking or five hundred
+* the payment worker (bookings/worker.py) runs a sweep at most every
+  ``SWEEP_INTERVAL_SECONDS``; ``manage.py expire_booking_holds`` does the
+  same from cron or a timer unit
+
+A payment captured after its hold expired is still recorded, with the
+booking left cancelled and a refund noted (see bookings/webhooks.py).
+
+File Location: bookings/holds.py
+"""
+
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import rollups, worker
+from .coupons import release_coupon_uses
+from .inventory import release_many, retry_on_locked
+from .models import Booking, Payment, PaymentOutbox
+
+
+HOLD_SWEEP_BATCH = 500
+SWEEP_INTERVAL_SECONDS = 60
+
+_last_sweep = {'at': None}
+
+
+def hold_expires_at(booking):
+    return booking.created_at + timedelta(minutes=settings.BOOKING_HOLD_MINUTES)
+
+
+def lapsed_holds(now=None):
+    """Pending, unpaid bookings whose hold has run out (oldest first)"""
+    cutoff = (now or timezone.now()) - timedelta(minutes=settings.BOOKING_HOLD_MINUTES)
+    return (
+        Booking.objects.filter(status='pending', created_at__lt=cutoff)
+        .exclude(payment_status='paid')
+        .order_by('created_at')
+    )
+
+
+def _returning(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _claim_returning(now, batch_size):
+    """
+    Expire a batch with UPDATE ... RETURNING, so only the rows this statement
+    changed are reported: ``(expired, stays)`` with ``(pk, coupon_code)`` per
+    expired hold and the stays whose rooms it still held
+    """
+    table = Booking._meta.db_table
+    lapsed_sql, lapsed_params = lapsed_holds(now).values('pk')[:batch_size].query.sql_with_params()
+    expired = _returning(
+        f"UPDATE {table} SET status = %s, payment_status = %s, updated_at = %s "
+        f"WHERE id IN ({lapsed_sql}) AND status = %s AND payment_status <> %s "
+        "RETURNING id, coupon_code",
+        ['cancelled', 'failed', connection.ops.adapt_datetimefield_value(now), *lapsed_params, 'pending', 'paid'],
+    )
+    if not expired:
+        return [], []
+    check_in = Booking._meta.get_field('check_in')
+    placeholders = ", ".join(["%s"] * len(expired))
+    stays = _returning(
+        f"UPDATE {table} SET inventory_reserved = %s "
+        f"WHERE id IN ({placeholders}) AND inventory_reserved = %s "
+        "RETURNING room_type_id, check_in, nights, num_rooms",
+        [False, *(pk for pk, _ in expired), True],
+    )
+    return expired, [
+        (room_type_id, check_in.to_python(day), nights, rooms) for room_type_id, day, nights, rooms in stays
+    ]
+
+
+def _claim_locked(now, batch_size):
+    """``_claim_returning`` for databases without UPDATE ... RETURNING, where the selected rows stay locked"""
+    holds = list(
+        lapsed_holds(now)
+        .select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+        .values_list('pk', 'room_type_id', 'check_in', 'nights', 'num_rooms', 'inventory_reserved', 'coupon_code')
+        [:batch_size]
+    )
+    if not holds:
+        return [], []
+    Booking.objects.filter(pk__in=[hold[0] for hold in holds]).update(
+        status='cancelled', payment_status='failed', inventory_reserved=False, updated_at=now,
+    )
+    return (
+        [(pk, coupon_code) for pk, *_, coupon_code in holds],
+        [(room_type_id, day, nights, rooms) for _, room_type_id, day, nights, rooms, reserved, _ in holds if reserved],
+    )
+
+
+def _can_update_returning():
+    """
+    UPDATE ... RETURNING is PostgreSQL and SQLite 3.35+ only; Django's
+    INSERT ... RETURNING flag tracks the same SQLite version
+    """
+    return connection.vendor in ('sqlite', 'postgresql') and connection.features.can_return_columns_from_insert
+
+
+@retry_on_locked
+def expire_batch(now=None, batch_size=HOLD_SWEEP_BATCH):
+    """Expire up to ``batch_size`` lapsed holds; returns how many were expired"""
+    now = now or timezone.now()
+    claim = _claim_returning if _can_update_returning() else _claim_locked
+    with transaction.atomic():
+        expired, stays = claim(now, batch_size)
+        if not expired:
+            return 0
+        ids = [pk for pk, _ in expired]
+        # Only holds this batch expired, and only rooms they still held
+        release_many(stays)
+        Payment.objects.filter(booking_id__in=ids, is_successful=False).update(remarks='Payment hold expired')
+        PaymentOutbox.objects.filter(payment__booking_id__in=ids, status='pending').update(
+            status='failed', last_error='Payment hold expired', processed_at=now,
+        )
+        rollups.schedule_bookings(ids)
+        coupon_uses = Counter(coupon_code for _, coupon_code in expired if coupon_code)
+        if coupon_uses:
+            release_coupon_uses(coupon_uses)
+    return len(expired)
+
+
+def sweep(now=None, batch_size=HOLD_SWEEP_BATCH):
+    """Expire every lapsed hold, a batch at a time; returns the total expired"""
+    total = 0
+    while True:
+        expired = expire_batch(now, batch_size)
+        total += expired
+        if expired < batch_size:
+            return total
+
+
+@worker.register
+def sweep_if_due():
+    """The payment worker's hook: sweep at most every SWEEP_INTERVAL_SECONDS"""
+    now = time.monotonic()
+    if _last_sweep['at'] is not None and now - _last_sweep['at'] < SWEEP_INTERVAL_SECONDS:
+        return 0
+    _last_sweep['at'] = now
+    return sweep()
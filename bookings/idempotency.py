@@ -0,0 +1,46 @@
+"""
+Idempotent booking submissions
+
+The booking form carries a random token (``idempotency_key``) that is stored
+on the Booking it creates, unique per user. A resubmission of the same form
+(double-click, mobile retry, back button) finds that booking and replays the
+outcome (confirmation or the existing Razorpay checkout) without touching
+inventory, coupons or the gateway again.
+
+The claim lives in the database, not the cache, so it holds across worker
+processes: when two copies of a submission race, the second INSERT of the
+same (user, key) fails with IntegrityError, its transaction rolls back the
+rooms and coupon use it took, and the view replays the first booking. A
+submission that fails before anything is written leaves no row behind, so
+the guest can correct the form and send it again.
+
+File Location: bookings/idempotency.py
+"""
+
+import re
+import uuid
+
+from .models import Booking
+
+
+KEY_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def new_submission_key():
+    return uuid.uuid4().hex
+
+
+def submission_key(key):
+    """``key`` if it is a well-formed token, else None (not deduplicated)"""
+    return key if KEY_PATTERN.match(key or '') else None
+
+
+def previous_submission(user, key):
+    """booking_id of the booking ``user`` already made with ``key``, or None"""
+    if not key:
+        return None
+    return (
+        Booking.objects.filter(user=user, idempotency_key=key)
+        .values_list('booking_id', flat=True)
+        .first()
+    )
@@ -0,0 +1,185 @@
+"""
+Per-night inventory ledger
+
+Every night of a stay is reserved with a single conditional UPDATE over the
+ledger rows (``remaining >= n``) inside one transaction; if any night cannot
+be decremented the whole reservation rolls back. SQLite serialises writers,
+so the write transaction is kept as short as possible and retried with
+backoff when the database is locked by another writer.
+
+File Location: bookings/inventory.py
+"""
+
+import functools
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .availability import nightly_rooms_held, overlapping_bookings
+from .models import Booking, RoomInventory
+
+
+LOCK_RETRIES = 5
+LOCK_BACKOFF_SECONDS = 0.05
+
+
+class RoomsUnavailable(Exception):
+    """Raised when at least one night of the stay has too few rooms left"""
+
+
+def retry_on_locked(func):
+    """Retry ``func`` when SQLite reports 'database is locked'"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(LOCK_RETRIES):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                # Inside an outer transaction the caller must retry the whole unit
+                if (
+                    'database is locked' not in str(exc)
+                    or connection.in_atomic_block
+                    or attempt == LOCK_RETRIES - 1
+                ):
+                    raise
+                time.sleep(LOCK_BACKOFF_SECONDS * (2 ** attempt))
+
+    return wrapper
+
+
+def stay_nights(check_in, check_out):
+    night = check_in
+    while night < check_out:
+        yield night
+        night += timedelta(days=1)
+
+
+def ensure_ledger(room_type, check_in, check_out):
+    """
+    Create missing ledger rows for the stay, seeded from total_rooms minus
+    any bookings already holding that night. Those bookings are marked
+    ``inventory_reserved`` so cancelling them hands the rooms back.
+    """
+    nights = list(stay_nights(check_in, check_out))
+    existing = set(
+        RoomInventory.objects.filter(
+            room_type=room_type, date__gte=check_in, date__lt=check_out
+        ).values_list('date', flat=True)
+    )
+    missing = [night for night in nights if night not in existing]
+    if not missing:
+        return
+    held = Counter()
+    legacy = []
+    rows = overlapping_bookings(missing[0], missing[-1] + timedelta(days=1), [room_type.id]).values_list(
+        'pk', 'check_in', 'check_out', 'num_rooms', 'inventory_reserved'
+    ).order_by()
+    for pk, start, end, num_rooms, reserved in rows:
+        nights_held = [night for night in missing if start <= night < end]
+        for night in nights_held:
+            held[night] += num_rooms
+        if nights_held and not reserved:
+            legacy.append(pk)
+    RoomInventory.objects.bulk_create(
+        [
+            RoomInventory(room_type=room_type, date=night, remaining=room_type.total_rooms - held[night])
+            for night in missing
+        ],
+        ignore_conflicts=True,
+    )
+    if legacy:
+        # Bookings made before the ledger existed now count against it
+        Booking.objects.filter(pk__in=legacy).update(inventory_reserved=True)
+
+
+def check_availability(room_type, check_in, check_out, rooms=1):
+    """True when every night of the stay has at least ``rooms`` left"""
+    nights = list(stay_nights(check_in, check_out))
+    remaining = dict(
+        RoomInventory.objects.filter(
+            room_type=room_type, date__gte=check_in, date__lt=check_out
+        ).values_list('date', 'remaining')
+    )
+    unseeded = [night for night in nights if night not in remaining]
+    if unseeded:
+        held = nightly_rooms_held(room_type.id, unseeded[0], unseeded[-1] + timedelta(days=1))
+        for night in unseeded:
+            remaining[night] = room_type.total_rooms - held[night]
+    return all(remaining[night] >= rooms for night in nights)
+
+
+def take_rooms(room_type, check_in, check_out, rooms=1):
+    """
+    Take ``rooms`` for every night or raise RoomsUnavailable. Must run inside
+    the caller's transaction, which has to roll back on the exception.
+    """
+    nights = len(list(stay_nights(check_in, check_out)))
+    ensure_ledger(room_type, check_in, check_out)
+    updated = RoomInventory.objects.filter(
+        room_type=room_type,
+        date__gte=check_in,
+        date__lt=check_out,
+        remaining__gte=rooms,
+    ).update(remaining=F('remaining') - rooms)
+    if updated != nights:
+        raise RoomsUnavailable(f"{room_type} is sold out for part of the stay")
+
+
+@retry_on_locked
+def reserve_rooms(room_type, check_in, check_out, rooms=1):
+    """Atomically take ``rooms`` for every night or raise RoomsUnavailable"""
+    with transaction.atomic():
+        take_rooms(room_type, check_in, check_out, rooms)
+
+
+def release_rooms(room_type_id, check_in, check_out, rooms=1):
+    RoomInventory.objects.filter(
+        room_type_id=room_type_id, date__gte=check_in, date__lt=check_out
+    ).update(remaining=F('remaining') + rooms)
+
+
+def release_many(stays):
+    """
+    Return the rooms of many bookings at once. ``stays`` yields
+    ``(room_type_id, check_in, nights, rooms)``; nights are grouped so there is
+    one UPDATE per room type and number of rooms freed, not one per booking.
+    Must run inside the caller's transaction.
+    """
+    freed = Counter()
+    for room_type_id, check_in, nights, rooms in stays:
+        for offset in range(nights):
+            freed[room_type_id, check_in + timedelta(days=offset)] += rooms
+    groups = defaultdict(list)
+    for (room_type_id, night), rooms in freed.items():
+        groups[room_type_id, rooms].append(night)
+    for (room_type_id, rooms), nights in groups.items():
+        RoomInventory.objects.filter(room_type_id=room_type_id, date__in=nights).update(
+            remaining=F('remaining') + rooms
+        )
+
+
+@retry_on_locked
+def release_booking(booking):
+    """Return a booking's rooms to the ledger exactly once"""
+    with transaction.atomic():
+        claimed = Booking.objects.filter(pk=booking.pk, inventory_reserved=True).update(
+            inventory_reserved=False
+        )
+        if claimed:
+            stay_end = booking.check_in + timedelta(days=booking.nights)
+            release_rooms(booking.room_type_id, booking.check_in, stay_end, booking.num_rooms)
+    booking.inventory_reserved = False
+    return bool(claimed)
+
+
+def adjust_allotment(room_type, delta):
+    """Apply a change in total_rooms to every ledger night from today on"""
+    if delta:
+        RoomInventory.objects.filter(
+            room_type=room_type, date__gte=timezone.localdate()
+        ).update(remaining=F('remaining') + delta)
@@ -0,0 +1,23 @@
+"""
+Count the nights of confirmed bookings that have no BookedNight facts yet
+(bookings made before the analytics table existed); safe to run again
+"""
+
+from django.core.management.base import BaseCommand
+
+from bookings import analytics
+from bookings.models import Booking
+
+
+class Command(BaseCommand):
+    help = "Record BookedNight facts for confirmed or completed bookings not yet counted"
+
+    def handle(self, *args, **options):
+        pending = (
+            Booking.objects.filter(status__in=analytics.CONFIRMED_STATUSES, nights_recorded=False)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        ids = list(pending.iterator(chunk_size=analytics.SYNC_CHUNK_SIZE))
+        analytics.sync_bookings(ids)
+        self.stdout.write(self.style.SUCCESS(f"Recorded nights for {len(ids)} booking(s)."))
@@ -0,0 +1,31 @@
+"""
+Cancel pending bookings whose payment hold has lapsed and return their rooms;
+run every minute or so (cron, a systemd timer) or with --loop, in addition to
+the sweeps the in-process payment worker makes
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from bookings import holds
+
+
+class Command(BaseCommand):
+    help = "Expire unpaid booking holds older than BOOKING_HOLD_MINUTES in batched UPDATEs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=holds.HOLD_SWEEP_BATCH)
+        parser.add_argument("--loop", action="store_true", help="Keep sweeping instead of exiting")
+        parser.add_argument("--interval", type=float, default=60.0, help="Seconds between sweeps with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            expired = holds.sweep(batch_size=options["batch_size"])
+            if expired or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(f"Expired {expired} booking hold(s)."))
+            if not options["loop"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
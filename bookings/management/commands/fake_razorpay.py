@@ -0,0 +1,28 @@
+"""Serve the fake Razorpay orders API for local load tests"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.fake_gateway import FakeRazorpay
+
+
+class Command(BaseCommand):
+    help = "Run a local fake Razorpay API; start the site with RAZORPAY_BASE_URL set to the printed URL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--mode", choices=["ok", "error", "slow"], default="ok")
+        parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait per request in slow mode")
+
+    def handle(self, *args, **options):
+        fake = FakeRazorpay(port=options["port"], mode=options["mode"], delay=options["delay"]).start()
+        self.stdout.write(self.style.SUCCESS(f"Fake Razorpay listening on {fake.base_url} ({fake.mode})"))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            fake.stop()
+            self.stdout.write(f"Served {fake.requests} request(s) over {fake.connections} connection(s).")
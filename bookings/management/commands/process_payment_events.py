@@ -0,0 +1,34 @@
+"""
+Apply recorded Razorpay webhook events to payments and bookings; run once to
+catch up or with --loop as a standalone worker when PAYMENT_WORKER is off in
+the web processes
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from bookings import webhooks
+
+
+class Command(BaseCommand):
+    help = "Apply unprocessed payment webhook events in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="Events to apply per pass")
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between passes with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            outcome = webhooks.apply_events(limit=options["limit"])
+            if any(outcome.values()) or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Applied: {outcome['applied']}; ignored: {outcome['ignored']}; "
+                    f"unmatched: {outcome['unmatched']}."
+                ))
+            if not options["loop"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
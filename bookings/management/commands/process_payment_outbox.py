@@ -0,0 +1,34 @@
+"""
+Create pending Razorpay orders from the payment outbox; run once to drain it
+(e.g. after an outage) or with --loop as a standalone worker when
+PAYMENT_WORKER is off in the web processes
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from bookings import outbox
+
+
+class Command(BaseCommand):
+    help = "Process due payment outbox entries (create their Razorpay orders)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="Entries to try per pass")
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between passes with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            outcome = outbox.drain(limit=options["limit"])
+            if any(outcome.values()) or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Orders created: {outcome['done']}; retrying later: {outcome['pending']}; "
+                    f"failed: {outcome['failed']}."
+                ))
+            if not options["loop"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
@@ -0,0 +1,25 @@
+"""
+Recompute the master dashboard's daily booking rollups from the bookings
+table, either all of them or the last --days days
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bookings import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailyBookingStats rows with one GROUP BY over the bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Only rebuild the most recent N days")
+
+    def handle(self, *args, **options):
+        since = None
+        if options["days"]:
+            since = timezone.localdate() - timedelta(days=options["days"] - 1)
+        written = rollups.rebuild(since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily rollup(s)."))
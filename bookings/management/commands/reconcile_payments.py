@@ -0,0 +1,70 @@
+"""
+Compare Razorpay payments with a settlement export and write a discrepancy
+report; payments the gateway captured but we never recorded are marked paid
+(use --dry-run to only report)
+"""
+
+import csv
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings import reconciliation
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r}; expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Stream a Razorpay settlement export (CSV or JSON) and reconcile it against Payment rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("export", help="Settlement export file ('-' for stdin)")
+        parser.add_argument("--format", choices=["csv", "json"], help="Defaults to the file extension")
+        parser.add_argument("--amount-unit", choices=["paise", "rupees"], default="paise")
+        parser.add_argument("--report", help="Write the discrepancy CSV here instead of stdout")
+        parser.add_argument("--from", dest="start", type=_date, help="With --to, report captures missing from the export")
+        parser.add_argument("--to", dest="end", type=_date)
+        parser.add_argument("--chunk-size", type=int, default=reconciliation.CHUNK_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Report only; change nothing")
+
+    def handle(self, *args, **options):
+        path = options["export"]
+        fmt = options["format"] or ("json" if path.endswith((".json", ".jsonl", ".ndjson")) else "csv")
+        if bool(options["start"]) != bool(options["end"]):
+            raise CommandError("--from and --to go together")
+
+        run = reconciliation.Reconciliation(
+            apply=not options["dry_run"],
+            amount_in_paise=options["amount_unit"] == "paise",
+            chunk_size=options["chunk_size"],
+        )
+        source = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8-sig")
+        report = open(options["report"], "w", newline="", encoding="utf-8") if options["report"] else self.stdout
+        try:
+            writer = csv.writer(report)
+            writer.writerow(reconciliation.Discrepancy._fields)
+            rows = reconciliation.iter_json(source) if fmt == "json" else reconciliation.iter_csv(source)
+            try:
+                writer.writerows(run.run(rows))
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            if options["start"]:
+                writer.writerows(run.missing_from_export(options["start"], options["end"]))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if report is not self.stdout:
+                report.close()
+
+        counts = run.counts
+        self.stderr.write(self.style.SUCCESS(
+            f"Read {counts['rows']} row(s): {counts['matched']} matched, {counts['skipped']} skipped, "
+            f"{counts['discrepancies']} discrepancy(ies), {counts['fixed']} payment(s) marked paid"
+            + (" (dry run)" if options["dry_run"] else "") + "."
+        ))
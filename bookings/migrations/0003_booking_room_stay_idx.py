@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_payment_gateway_order_id_payment_gateway_payment_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['room_type', 'check_out', 'check_in'], name='booking_room_stay_idx'),
+        ),
+    ]
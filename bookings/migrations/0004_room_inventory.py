@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0006_amenity_bitmask'),
+        ('bookings', '0003_booking_room_stay_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='inventory_reserved',
+            field=models.BooleanField(default=False, editable=False, help_text='Rooms for every night are held in the RoomInventory ledger'),
+        ),
+        migrations.CreateModel(
+            name='RoomInventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('remaining', models.IntegerField(help_text='Rooms left to sell for this night')),
+                ('room_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='hotels.roomtype')),
+            ],
+            options={
+                'verbose_name': 'Room Inventory',
+                'verbose_name_plural': 'Room Inventory',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='roominventory',
+            constraint=models.UniqueConstraint(fields=('room_type', 'date'), name='unique_room_night'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-17 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_payment_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=100, unique=True)),
+                ('event', models.CharField(help_text='e.g. payment.captured', max_length=50)),
+                ('order_id', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('payment_id', models.CharField(blank=True, max_length=100)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('outcome', models.CharField(blank=True, choices=[('applied', 'Applied'), ('ignored', 'Ignored'), ('unmatched', 'No matching payment')], max_length=10)),
+            ],
+            options={
+                'verbose_name': 'Payment Event',
+                'verbose_name_plural': 'Payment Events',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='paymentevent_queue_idx')],
+            },
+        ),
+    ]
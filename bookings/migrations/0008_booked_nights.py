@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-17 02:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0010_rate_calendar'),
+        ('bookings', '0007_booking_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='nights_recorded',
+            field=models.BooleanField(default=False, editable=False, help_text="The stay's room-nights are counted in the BookedNight facts"),
+        ),
+        migrations.CreateModel(
+            name='BookedNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('rooms', models.SmallIntegerField(help_text='Rooms sold this night; negative for a reversal')),
+                ('revenue', models.DecimalField(decimal_places=2, help_text='Room revenue for the night before taxes; negative for a reversal', max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_nights', to='bookings.booking')),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hotels.hotel')),
+                ('room_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hotels.roomtype')),
+            ],
+            options={
+                'verbose_name': 'Booked Night',
+                'verbose_name_plural': 'Booked Nights',
+                'indexes': [models.Index(fields=['hotel', 'date', 'rooms', 'revenue'], name='bookednight_hotel_date_idx')],
+            },
+        ),
+    ]
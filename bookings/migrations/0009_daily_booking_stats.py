@@ -0,0 +1,39 @@
+# Generated by Django 4.2.16 on 2026-10-17 02:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0010_rate_calendar'),
+        ('bookings', '0008_booked_nights'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBookingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Day the bookings were made')),
+                ('created', models.IntegerField(default=0)),
+                ('confirmed', models.IntegerField(default=0, help_text='Now confirmed or completed')),
+                ('cancelled', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Total amount of the confirmed and completed bookings', max_digits=12)),
+                ('pay_at_hotel', models.IntegerField(default=0)),
+                ('online', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hotels.hotel')),
+            ],
+            options={
+                'verbose_name': 'Daily Booking Stats',
+                'verbose_name_plural': 'Daily Booking Stats',
+                'indexes': [models.Index(fields=['date'], name='bookingstats_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailybookingstats',
+            constraint=models.UniqueConstraint(fields=('hotel', 'date'), name='unique_hotel_booking_day'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.16 on 2026-10-17 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_daily_booking_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, help_text='Token of the booking form submission that created this booking', max_length=32, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='unique_booking_submission'),
+        ),
+    ]
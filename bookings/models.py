@@ -110,6 +110,25 @@ class Booking(models.Model):
         help_text="Any special requirements from guest"
     )
     
+    # Inventory
+    inventory_reserved = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Rooms for every night are held in the RoomInventory ledger"
+    )
+    nights_recorded = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="The stay's room-nights are counted in the BookedNight facts"
+    )
+    idempotency_key = models.CharField(
+        max_length=32,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Token of the booking form submission that created this booking"
+    )
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -128,6 +147,125 @@ class Booking(models.Model):
         ordering = ['-created_at']
         verbose_name = "Booking"
         verbose_name_plural = "Bookings"
+        indexes = [
+            # Interval-overlap lookups in bookings/availability.py
+            models.Index(fields=['room_type', 'check_out', 'check_in'], name='booking_room_stay_idx'),
+            # Expired-hold scan in bookings/holds.py
+            models.Index(fields=['status', 'created_at'], name='booking_status_created_idx'),
+        ]
+        constraints = [
+            # One booking per form submission (bookings/idempotency.py)
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_booking_submission'),
+        ]
+
+
+class RoomInventory(models.Model):
+    """
+    Per-night inventory ledger - rooms still sellable for a room type on a date.
+    Rows are created on demand and only ever changed with conditional
+    UPDATEs (see bookings/inventory.py).
+    """
+    
+    room_type = models.ForeignKey(
+        RoomType,
+        on_delete=models.CASCADE,
+        related_name='inventory'
+    )
+    date = models.DateField()
+    remaining = models.IntegerField(help_text="Rooms left to sell for this night")
+    
+    def __str__(self):
+        return f"{self.room_type} - {self.date}: {self.remaining} left"
+    
+    class Meta:
+        verbose_name = "Room Inventory"
+        verbose_name_plural = "Room Inventory"
+        constraints = [
+            models.UniqueConstraint(fields=['room_type', 'date'], name='unique_room_night'),
+        ]
+
+
+class BookedNight(models.Model):
+    """
+    Analytics fact: one row per booked room type and night. Rows are only
+    ever inserted; confirming a booking adds its nights and cancelling it
+    adds the same rows negated (see bookings/analytics.py).
+    """
+    
+    booking = models.ForeignKey(
+        Booking,
+        on_delete=models.CASCADE,
+        related_name='booked_nights'
+    )
+    hotel = models.ForeignKey(
+        Hotel,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    room_type = models.ForeignKey(
+        RoomType,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    date = models.DateField()
+    rooms = models.SmallIntegerField(help_text="Rooms sold this night; negative for a reversal")
+    revenue = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text="Room revenue for the night before taxes; negative for a reversal"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.booking_id} {self.date}: {self.rooms:+d}"
+    
+    class Meta:
+        verbose_name = "Booked Night"
+        verbose_name_plural = "Booked Nights"
+        indexes = [
+            # Covering index for per-hotel GROUP BY date reports
+            models.Index(fields=['hotel', 'date', 'rooms', 'revenue'], name='bookednight_hotel_date_idx'),
+        ]
+
+
+class DailyBookingStats(models.Model):
+    """
+    Dashboard rollup: the bookings a hotel took on one day (by creation
+    date) and where they stand now. Rows are recomputed for the days whose
+    bookings change (see bookings/rollups.py).
+    """
+
+    hotel = models.ForeignKey(
+        Hotel,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    date = models.DateField(help_text="Day the bookings were made")
+    created = models.IntegerField(default=0)
+    confirmed = models.IntegerField(default=0, help_text="Now confirmed or completed")
+    cancelled = models.IntegerField(default=0)
+    revenue = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Total amount of the confirmed and completed bookings"
+    )
+    pay_at_hotel = models.IntegerField(default=0)
+    online = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.hotel_id} {self.date}: {self.created} booking(s)"
+
+    class Meta:
+        verbose_name = "Daily Booking Stats"
+        verbose_name_plural = "Daily Booking Stats"
+        constraints = [
+            models.UniqueConstraint(fields=['hotel', 'date'], name='unique_hotel_booking_day'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='bookingstats_date_idx'),
+        ]
 
 
 class GuestDetail(models.Model):
@@ -236,6 +374,79 @@ class Payment(models.Model):
         verbose_name_plural = "Payments"
 
 
+class PaymentOutbox(models.Model):
+    """
+    Gateway work recorded in the same transaction as the booking and carried
+    out by the outbox worker (bookings/outbox.py), so web requests never wait
+    on Razorpay. One row per payment; retried with backoff until done or
+    failed.
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    payment = models.OneToOneField(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name='outbox'
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(help_text="Not picked up before this time (retry backoff or a worker's lease)")
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Order for {self.payment.booking.booking_id} ({self.status})"
+    
+    class Meta:
+        verbose_name = "Payment Outbox Entry"
+        verbose_name_plural = "Payment Outbox"
+        indexes = [
+            # The worker's "what is due?" scan
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+
+class PaymentEvent(models.Model):
+    """
+    Append-only log of Razorpay webhook deliveries, one row per gateway event
+    id, so the gateway's retries are no-ops. bookings/webhooks.py applies
+    unprocessed rows to Payment/Booking in batches.
+    """
+    
+    OUTCOME_CHOICES = [
+        ('applied', 'Applied'),
+        ('ignored', 'Ignored'),
+        ('unmatched', 'No matching payment'),
+    ]
+    
+    event_id = models.CharField(max_length=100, unique=True)
+    event = models.CharField(max_length=50, help_text="e.g. payment.captured")
+    order_id = models.CharField(max_length=100, blank=True, db_index=True)
+    payment_id = models.CharField(max_length=100, blank=True)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES, blank=True)
+    
+    def __str__(self):
+        return f"{self.event} {self.event_id}"
+    
+    class Meta:
+        verbose_name = "Payment Event"
+        verbose_name_plural = "Payment Events"
+        ordering = ['-received_at']
+        indexes = [
+            # Unprocessed events in arrival order
+            models.Index(fields=['processed_at', 'id'], name='paymentevent_queue_idx'),
+        ]
+
+
 class Coupon(models.Model):
     """
     Discount coupons for bookings
@@ -0,0 +1,173 @@
+"""
+Payment outbox
+
+A Razorpay booking no longer waits on the gateway inside the web request.
+``create_booking`` writes a PaymentOutbox row in the same transaction as the
+booking, so the order is either recorded alongside the booking or not at all,
+and the checkout page polls ``bookings:checkout_status`` until the worker has
+stored the order id on the Payment.
+
+* entries are claimed with a conditional UPDATE that pushes
+  ``next_attempt_at`` one lease into the future, so two workers (or a worker
+  and ``manage.py process_payment_outbox``) never call the gateway for the
+  same entry at once; a worker that dies mid-call is retried after the lease
+* a failed call is retried with exponential backoff and jitter; after
+  ``MAX_ATTEMPTS`` (or at once for a request the gateway rejects outright)
+  the booking is cancelled, which returns its rooms, and its coupon use is
+  given back; the cancellation is a conditional UPDATE of a still-pending
+  booking, so a hold the sweeper (bookings/holds.py) already expired does
+  not give the coupon use back twice
+* the payment worker (bookings/worker.py) drains the outbox when a booking
+  commits; ``manage.py process_payment_outbox`` drains it on demand
+
+File Location: bookings/outbox.py
+"""
+
+import logging
+import random
+from datetime import timedelta
+
+import razorpay
+from django.db import transaction
+from django.utils import timezone
+
+from . import gateway, rollups, worker
+from .analytics import sync_bookings
+from .coupons import get_coupon, release_coupon
+from .inventory import release_booking
+from .models import Booking, Payment, PaymentOutbox
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 300
+LEASE_SECONDS = 60
+BATCH_SIZE = 20
+
+
+def enqueue_order(payment):
+    """Record that ``payment`` needs a gateway order; call inside the booking's transaction"""
+    entry = PaymentOutbox.objects.create(payment=payment, next_attempt_at=timezone.now())
+    transaction.on_commit(worker.kick)
+    return entry
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number ``attempts`` (full jitter on the upper half)"""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def claim(entry_id, now=None):
+    """Lease one due entry for this caller; False if it is not due or someone else has it"""
+    now = now or timezone.now()
+    return bool(PaymentOutbox.objects.filter(
+        pk=entry_id, status='pending', next_attempt_at__lte=now,
+    ).update(next_attempt_at=now + timedelta(seconds=LEASE_SECONDS)))
+
+
+def process_entry(entry):
+    """Create the gateway order for a claimed entry; returns the entry's new status"""
+    payment = entry.payment
+    booking = payment.booking
+    try:
+        order = gateway.create_order(
+            int(booking.total_amount * 100),
+            booking.booking_id,
+            {
+                'hotel': booking.hotel.name,
+                'guest': booking.guest_detail.full_name,
+                'booking_id': booking.booking_id,
+            },
+        )
+    except razorpay.errors.BadRequestError as exc:
+        # The gateway refused this order; retrying will not change its mind
+        return _give_up(entry, exc)
+    except Exception as exc:
+        entry.attempts += 1
+        if entry.attempts >= MAX_ATTEMPTS:
+            return _give_up(entry, exc)
+        entry.last_error = str(exc)[:500]
+        entry.next_attempt_at = timezone.now() + timedelta(seconds=backoff(entry.attempts))
+        entry.save(update_fields=['attempts', 'last_error', 'next_attempt_at'])
+        logger.warning("Razorpay order for %s failed (attempt %s): %s", booking.booking_id, entry.attempts, exc)
+        return entry.status
+
+    with transaction.atomic():
+        Payment.objects.filter(pk=payment.pk).update(gateway_order_id=order.get('id', ''))
+        entry.status = 'done'
+        entry.attempts += 1
+        entry.last_error = ''
+        entry.processed_at = timezone.now()
+        entry.save(update_fields=['status', 'attempts', 'last_error', 'processed_at'])
+    payment.gateway_order_id = order.get('id', '')
+    return entry.status
+
+
+def _give_up(entry, exc):
+    payment = entry.payment
+    booking = payment.booking
+    logger.error("Giving up on the Razorpay order for %s: %s", booking.booking_id, exc)
+    with transaction.atomic():
+        entry.status = 'failed'
+        entry.last_error = str(exc)[:500]
+        entry.processed_at = timezone.now()
+        entry.save(update_fields=['status', 'attempts', 'last_error', 'processed_at'])
+        cancelled = Booking.objects.filter(pk=booking.pk, status='pending').update(
+            status='cancelled', payment_status='failed', updated_at=timezone.now(),
+        )
+        if not cancelled:
+            # Expired or settled since the entry was leased; nothing to give back
+            return entry.status
+        booking.status = 'cancelled'
+        booking.payment_status = 'failed'
+        payment.remarks = f'Razorpay order creation failed: {exc}'
+        payment.save(update_fields=['remarks'])
+        # A queryset update skips post_save, so hand the rooms back explicitly
+        release_booking(booking)
+        sync_bookings([booking.pk])
+        rollups.schedule_bookings([booking.pk])
+        if booking.coupon_code:
+            coupon = get_coupon(booking.coupon_code)
+            if coupon is not None:
+                release_coupon(coupon)
+    return entry.status
+
+
+@worker.register
+def drain(limit=None, now=None):
+    """
+    Process due entries until none are left (or ``limit`` have been tried);
+    returns ``{'done': n, 'pending': n, 'failed': n}`` for the entries tried
+    """
+    outcome = {'done': 0, 'pending': 0, 'failed': 0}
+    tried = 0
+    while limit is None or tried < limit:
+        batch = BATCH_SIZE if limit is None else min(BATCH_SIZE, limit - tried)
+        due = list(
+            PaymentOutbox.objects.filter(status='pending', next_attempt_at__lte=now or timezone.now())
+            .order_by('next_attempt_at')
+            .values_list('pk', flat=True)[:batch]
+        )
+        if not due:
+            break
+        for entry_id in due:
+            tried += 1
+            if not claim(entry_id, now):
+                continue
+            entry = PaymentOutbox.objects.select_related(
+                'payment__booking__hotel', 'payment__booking__guest_detail'
+            ).get(pk=entry_id)
+            outcome[process_entry(entry)] += 1
+    return outcome
+
+
+def order_state(payment):
+    """'ready', 'pending' or 'failed' for a Razorpay payment (checkout polling)"""
+    if payment.gateway_order_id:
+        return 'ready'
+    if payment.booking.status == 'cancelled':
+        return 'failed'
+    return 'pending'
@@ -0,0 +1,242 @@
+"""
+Stay quote engine
+
+The single place that turns a hotel rate, a stay and an optional coupon into
+money. Every amount is a Decimal rounded to paise (half up), in this order:
+
+    base      = sum of nightly rates x rooms
+    discount  = base x hotel discount %
+    coupon    = coupon discount on (base - discount)
+    taxes     = GST_RATE x (base - discount - coupon)
+    total     = base - discount - coupon + taxes
+
+``price_stay`` is a pure function of its inputs and memoised, so identical
+quotes (the same hotel/nights/rooms/coupon across a search page, a burst of
+booking-page refreshes or a batch request) are computed once per process.
+``quote_room_stay`` prices each night from the room type's rate calendar
+(hotels/rates.py); nights the calendar does not cover yet are expanded from
+the room's rate and rules on demand, so closures and minimum stays hold there
+too. ``quote_many`` resolves a batch of requests with one hotel query, one
+room-type query and one calendar query; ``cheapest_stays`` gives search its
+whole-stay totals the same way.
+
+Coupons are only previewed here; redemption lives in bookings/coupons.py.
+
+File Location: bookings/quotes.py
+"""
+
+from collections import namedtuple
+from dataclasses import asdict, dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+from hotels.models import Hotel, RoomType
+from hotels.rates import StayNotSellable, calendar_rows, check_sellable, stay_calendar, stay_nights
+
+from .availability import parse_stay
+from .coupons import CouponRejected, check_coupon, coupon_discount, get_coupon
+
+
+GST_RATE = Decimal("0.12")
+PAISE = Decimal("0.01")
+MAX_QUOTE_ROOMS = 10
+
+
+def to_money(value):
+    return Decimal(value).quantize(PAISE, rounding=ROUND_HALF_UP)
+
+
+@dataclass(frozen=True)
+class Quote:
+    nightly_rate: Decimal
+    nights: int
+    rooms: int
+    base_price: Decimal
+    discount: Decimal
+    coupon_discount: Decimal
+    taxes: Decimal
+    total: Decimal
+    coupon_code: str = ""
+
+    @property
+    def coupon_basis(self):
+        """Amount a coupon is applied to: base price less the hotel discount"""
+        return self.base_price - self.discount
+
+    def as_dict(self):
+        """JSON-friendly dict; money is sent as strings to keep it exact"""
+        return {
+            key: str(value) if isinstance(value, Decimal) else value
+            for key, value in asdict(self).items()
+        }
+
+
+# The parts of a Coupon that affect the price; hashable for the memo key
+CouponTerms = namedtuple("CouponTerms", ["code", "discount_type", "discount_value", "max_discount"])
+
+
+def _coupon_terms(coupon):
+    if coupon is None:
+        return None
+    return CouponTerms(coupon.code, coupon.discount_type, coupon.discount_value, coupon.max_discount)
+
+
+@lru_cache(maxsize=4096)
+def _price(stay_rate, discount_percentage, nights, rooms, coupon_terms):
+    # stay_rate is the sum of the nightly rates for one room
+    base_price = to_money(stay_rate * rooms)
+    discount = to_money(base_price * discount_percentage / 100)
+    coupon_amount = to_money(0)
+    if coupon_terms is not None:
+        coupon_amount = coupon_discount(coupon_terms, base_price - discount)
+    subtotal = base_price - discount - coupon_amount
+    taxes = to_money(max(subtotal, Decimal(0)) * GST_RATE)
+    return Quote(
+        nightly_rate=to_money(stay_rate / nights),
+        nights=nights,
+        rooms=rooms,
+        base_price=base_price,
+        discount=discount,
+        coupon_discount=coupon_amount,
+        taxes=taxes,
+        total=subtotal + taxes,
+        coupon_code=coupon_terms.code if coupon_terms else "",
+    )
+
+
+def price_stay(nightly_rate, discount_percentage, nights, rooms=1, coupon=None):
+    """Memoised quote for a nightly rate; ``coupon`` is assumed applicable"""
+    return _price(Decimal(nightly_rate) * nights, int(discount_percentage or 0), nights, rooms, _coupon_terms(coupon))
+
+
+def price_nights(rates, discount_percentage, rooms=1, coupon=None):
+    """Memoised quote for a stay with one rate per night; ``nightly_rate`` is the average"""
+    return _price(sum(map(Decimal, rates)), int(discount_percentage or 0), len(rates), rooms, _coupon_terms(coupon))
+
+
+def quote_hotel(hotel, nights, rooms=1, coupon=None):
+    """Quote a stay at a hotel's listed rate (what search and booking show)"""
+    return price_stay(hotel.base_price, hotel.discount_percentage, nights, rooms, coupon)
+
+
+def quote_room_stay(hotel, room_type_id, check_in, check_out, rooms=1, coupon=None, calendar=None):
+    """
+    Quote a stay in one room type from its rate calendar (one range query,
+    or none with a prefetched ``calendar``; three beyond the horizon).
+    Raises StayNotSellable for closed nights or a too-short stay.
+    """
+    nights = stay_nights(room_type_id, check_in, check_out, calendar)
+    if nights is None:
+        # Beyond the materialised horizon (or not materialised yet)
+        room_type = RoomType.objects.only("id", "hotel_id", "price_per_night", "is_available").get(pk=room_type_id)
+        nights = stay_nights(room_type_id, check_in, check_out, stay_calendar([room_type], check_in, check_out))
+    check_sellable(nights, check_in)
+    return price_nights([rate for rate, _, _ in nights], hotel.discount_percentage, rooms, coupon)
+
+
+def cheapest_stays(discounts, check_in, check_out, rooms=1):
+    """
+    ``{hotel_id: Quote}`` for the cheapest sellable room type of each hotel
+    in ``discounts`` (``{hotel_id: discount_percentage}``); hotels with no
+    sellable room for the stay are left out. Two queries, three if some
+    nights are beyond the calendar.
+    """
+    room_types = list(
+        RoomType.objects.filter(hotel_id__in=list(discounts), is_available=True).only(
+            "id", "hotel_id", "price_per_night", "is_available"
+        )
+    )
+    calendar = stay_calendar(room_types, check_in, check_out)
+    cheapest = {}
+    for room_type in room_types:
+        nights = stay_nights(room_type.pk, check_in, check_out, calendar)
+        try:
+            check_sellable(nights, check_in)
+        except StayNotSellable:
+            continue
+        quote = price_nights([rate for rate, _, _ in nights], discounts[room_type.hotel_id], rooms)
+        if room_type.hotel_id not in cheapest or quote.total < cheapest[room_type.hotel_id].total:
+            cheapest[room_type.hotel_id] = quote
+    return cheapest
+
+
+def preview_coupon(code, quote):
+    """``(coupon, None)`` if ``code`` would apply to ``quote``, else ``(None, reason)``"""
+    coupon = get_coupon(code)
+    try:
+        check_coupon(coupon, quote.coupon_basis)
+    except CouponRejected as rejection:
+        return None, str(rejection)
+    return coupon, None
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def quote_many(items, coupons=True):
+    """
+    Quote a batch of dicts with ``hotel`` or ``room_type`` (ids), ``checkin``,
+    ``checkout`` (YYYY-MM-DD), optional ``rooms`` and ``coupon``. Returns one
+    dict per item, in order: a quote or ``{"error": ...}``. Room-type items
+    are priced from the rate calendar, hotel items at the listed rate. With
+    ``coupons`` false, coupon codes are not looked up.
+    """
+    room_type_ids = {_as_id(item.get("room_type")) for item in items} - {None}
+    room_types = dict(RoomType.objects.filter(id__in=room_type_ids).values_list("id", "hotel_id"))
+    hotel_ids = {_as_id(item.get("hotel")) for item in items} - {None}
+    hotels = Hotel.objects.filter(id__in=hotel_ids | set(room_types.values()), is_active=True).only(
+        "id", "base_price", "discount_percentage"
+    ).in_bulk()
+
+    stays = [parse_stay(item.get("checkin"), item.get("checkout")) for item in items]
+    calendar = {}
+    dated = [stay for stay in stays if stay]
+    if room_types and dated:
+        # One range query covering every stay in the batch
+        calendar = calendar_rows(
+            list(room_types), min(stay[0] for stay in dated), max(stay[1] for stay in dated)
+        )
+
+    results = []
+    for item, stay in zip(items, stays):
+        room_type_id = _as_id(item.get("room_type"))
+        hotel_id = _as_id(item.get("hotel")) or room_types.get(room_type_id)
+        hotel = hotels.get(hotel_id)
+        rooms = _as_id(item.get("rooms") or 1) or 0
+        if hotel is None or (item.get("room_type") and room_types.get(room_type_id) != hotel_id):
+            # An unknown room type, or one of another hotel, is never priced at this hotel
+            results.append({"error": "Unknown hotel or room type."})
+            continue
+        if stay is None:
+            results.append({"error": "Invalid check-in or check-out date."})
+            continue
+        if not 1 <= rooms <= MAX_QUOTE_ROOMS:
+            results.append({"error": f"Rooms must be between 1 and {MAX_QUOTE_ROOMS}."})
+            continue
+
+        def quote(coupon=None):
+            if room_type_id in room_types:
+                return quote_room_stay(hotel, room_type_id, *stay, rooms, coupon, calendar=calendar)
+            return quote_hotel(hotel, (stay[1] - stay[0]).days, rooms, coupon)
+
+        try:
+            stay_quote = quote()
+        except StayNotSellable as refusal:
+            results.append({"error": str(refusal)})
+            continue
+        result = {"hotel": hotel.id}
+        if item.get("coupon") and not coupons:
+            result["coupon_error"] = "Sign in to apply a coupon."
+        elif item.get("coupon"):
+            coupon, reason = preview_coupon(item["coupon"], stay_quote)
+            if coupon:
+                stay_quote = quote(coupon)
+            else:
+                result["coupon_error"] = reason
+        result.update(stay_quote.as_dict())
+        results.append(result)
+    return results
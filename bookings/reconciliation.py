@@ -0,0 +1,222 @@
+"""
+Settlement reconciliation
+
+Checks Razorpay payments against a settlement export (CSV, a JSON array or
+JSON lines) without loading the export into memory:
+
+* one pass over the Razorpay Payment rows builds a hash index keyed by
+  ``gateway_payment_id`` and ``gateway_order_id`` (a small tuple per payment)
+* the export is then streamed row by row and looked up in the index, so
+  memory depends on the number of bookings, not the size of the export
+* every disagreement is yielded as a Discrepancy as soon as it is found;
+  payments the gateway captured but we never recorded (the guest closed the
+  tab and the webhook was lost) are fixed with ``bulk_update`` in chunks of
+  ``CHUNK_SIZE``, the same way the webhook worker records a capture
+* with a date window, successful payments in the window that the export
+  never mentions are reported too
+
+Amount mismatches, unknown payments and missing captures are only reported;
+they need a person to look at the gateway dashboard.
+
+File Location: bookings/reconciliation.py
+"""
+
+import csv
+import json
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups
+from .analytics import sync_bookings
+from .models import Booking, Payment
+
+
+CHUNK_SIZE = 500
+INDEX_CHUNK_SIZE = 2000
+READ_SIZE = 64 * 1024
+
+# Column names used by Razorpay's settlement recon exports and the payments API
+PAYMENT_ID_COLUMNS = ('entity_id', 'payment_id', 'id')
+ORDER_ID_COLUMNS = ('order_id',)
+AMOUNT_COLUMNS = ('amount', 'credit')
+TYPE_COLUMNS = ('type', 'entity_type')
+
+FIX_PAYMENT_FIELDS = ['transaction_id', 'gateway_payment_id', 'is_successful', 'payment_date', 'remarks']
+
+Recorded = namedtuple('Recorded', [
+    'payment_pk', 'booking_pk', 'booking_id', 'order_id', 'payment_id', 'amount', 'is_successful', 'booking_status',
+])
+Discrepancy = namedtuple('Discrepancy', [
+    'kind', 'booking_id', 'order_id', 'payment_id', 'recorded_amount', 'settled_amount', 'action',
+])
+
+
+def _first(row, columns):
+    for column in columns:
+        value = row.get(column)
+        if value not in (None, ''):
+            return str(value).strip()
+    return ''
+
+
+def iter_csv(fp):
+    yield from csv.DictReader(fp)
+
+
+def iter_json(fp, read_size=READ_SIZE):
+    """Objects from a JSON array or JSON lines, decoded one at a time"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    in_array = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if buffer[:1] == '[' and not in_array:
+            in_array = True
+            buffer = buffer[1:]
+            continue
+        if buffer[:1] == ']':
+            return
+        if buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError("Settlement export is not a JSON array or JSON lines")
+            else:
+                if not isinstance(item, dict):
+                    raise ValueError("Settlement rows must be JSON objects")
+                yield item
+                buffer = buffer[end:]
+                continue
+        elif eof:
+            return
+        chunk = fp.read(read_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def build_index():
+    """``(by_payment_id, by_order_id)`` dicts of Recorded for every Razorpay payment"""
+    by_payment, by_order = {}, {}
+    rows = Payment.objects.filter(payment_method='razorpay').values_list(
+        'pk', 'booking_id', 'booking__booking_id', 'gateway_order_id', 'gateway_payment_id',
+        'amount', 'is_successful', 'booking__status',
+    ).order_by()
+    for row in rows.iterator(chunk_size=INDEX_CHUNK_SIZE):
+        recorded = Recorded(*row)
+        if recorded.payment_id:
+            by_payment[recorded.payment_id] = recorded
+        if recorded.order_id:
+            by_order[recorded.order_id] = recorded
+    return by_payment, by_order
+
+
+class Reconciliation:
+    """
+    One reconciliation run. Iterate ``run(rows)`` to get Discrepancy tuples;
+    ``counts`` holds the totals afterwards. With ``apply=False`` nothing is
+    written.
+    """
+
+    def __init__(self, apply=True, amount_in_paise=True, chunk_size=CHUNK_SIZE):
+        self.apply = apply
+        self.amount_in_paise = amount_in_paise
+        self.chunk_size = chunk_size
+        self.counts = {'rows': 0, 'skipped': 0, 'matched': 0, 'fixed': 0, 'discrepancies': 0}
+        self.matched = set()
+        self._payments = []
+        self._bookings = []
+
+    def _amount(self, value):
+        try:
+            amount = Decimal(value.replace(',', ''))
+        except InvalidOperation:
+            return None
+        return amount / 100 if self.amount_in_paise else amount
+
+    def _report(self, kind, recorded, order_id, payment_id, settled_amount, action=''):
+        self.counts['discrepancies'] += 1
+        return Discrepancy(
+            kind,
+            recorded.booking_id if recorded else '',
+            order_id or (recorded.order_id if recorded else ''),
+            payment_id,
+            recorded.amount if recorded else None,
+            settled_amount,
+            action,
+        )
+
+    def _fix(self, recorded, payment_id, now):
+        self._payments.append(Payment(
+            pk=recorded.payment_pk,
+            transaction_id=payment_id,
+            gateway_payment_id=payment_id,
+            is_successful=True,
+            payment_date=now,
+            remarks='Marked paid from the settlement export',
+        ))
+        status = 'confirmed' if recorded.booking_status == 'pending' else recorded.booking_status
+        self._bookings.append(Booking(pk=recorded.booking_pk, status=status, payment_status='paid'))
+        self.counts['fixed'] += 1
+        if len(self._payments) >= self.chunk_size:
+            self.flush()
+        return 'marked paid' + (' (booking cancelled; refund due)' if status == 'cancelled' else '')
+
+    def flush(self):
+        """Write the pending fixes (one bulk_update per table)"""
+        if not self._payments:
+            return
+        with transaction.atomic():
+            Payment.objects.bulk_update(self._payments, FIX_PAYMENT_FIELDS)
+            Booking.objects.bulk_update(self._bookings, ['status', 'payment_status'])
+            sync_bookings(booking.pk for booking in self._bookings)
+            rollups.schedule_bookings(booking.pk for booking in self._bookings)
+        self._payments, self._bookings = [], []
+
+    def run(self, rows, index=None):
+        by_payment, by_order = index or build_index()
+        now = timezone.now()
+        for row in rows:
+            self.counts['rows'] += 1
+            row_type = _first(row, TYPE_COLUMNS).lower()
+            payment_id = _first(row, PAYMENT_ID_COLUMNS)
+            order_id = _first(row, ORDER_ID_COLUMNS)
+            settled = self._amount(_first(row, AMOUNT_COLUMNS) or '0')
+            if row_type not in ('', 'payment') or not (payment_id or order_id) or settled is None:
+                # Refunds, adjustments, transfers and unreadable rows
+                self.counts['skipped'] += 1
+                continue
+
+            recorded = by_payment.get(payment_id) or by_order.get(order_id)
+            if recorded is None:
+                yield self._report('unknown_payment', None, order_id, payment_id, settled)
+                continue
+            if recorded.payment_pk in self.matched:
+                continue
+            self.matched.add(recorded.payment_pk)
+            self.counts['matched'] += 1
+            if settled != recorded.amount:
+                yield self._report('amount_mismatch', recorded, order_id, payment_id, settled)
+            elif not recorded.is_successful:
+                action = self._fix(recorded, payment_id, now) if self.apply else ''
+                yield self._report('captured_not_recorded', recorded, order_id, payment_id, settled, action)
+        if self.apply:
+            self.flush()
+
+    def missing_from_export(self, start, end):
+        """Discrepancies for successful payments dated ``[start, end]`` that the export never mentioned"""
+        rows = Payment.objects.filter(
+            payment_method='razorpay', is_successful=True,
+            payment_date__date__gte=start, payment_date__date__lte=end,
+        ).values_list(
+            'pk', 'booking_id', 'booking__booking_id', 'gateway_order_id', 'gateway_payment_id',
+            'amount', 'is_successful', 'booking__status',
+        ).order_by()
+        for row in rows.iterator(chunk_size=INDEX_CHUNK_SIZE):
+            recorded = Recorded(*row)
+            if recorded.payment_pk not in self.matched:
+                yield self._report('missing_from_export', recorded, recorded.order_id, recorded.payment_id, None)
@@ -0,0 +1,171 @@
+"""
+Daily booking rollups for the master dashboard
+
+One DailyBookingStats row per hotel and day holds the bookings made that day
+and where they stand now: how many are confirmed (or completed) and
+cancelled, the confirmed revenue, and how many pay at the hotel versus
+online. The dashboard reads a handful of these rows instead of counting the
+bookings table.
+
+Rows are kept current incrementally: whenever bookings change, only the
+(hotel, day) buckets they belong to are recomputed, with one GROUP BY over
+those hotels' bookings for the affected days and one upsert. Recomputing
+rather than adding deltas means a bucket is right however often it is
+refreshed, so the refresh runs after the transaction commits (the Payment
+row of a new booking is written after the Booking) and a lost refresh is
+fixed by the next one. Single saves are scheduled from post_save (see
+bookings/signals.py); bulk updates (admin actions, webhook and reconciliation
+batches, hold expiry) call ``schedule_bookings``. ``manage.py
+rebuild_booking_rollups`` recomputes everything or a recent window.
+
+File Location: bookings/rollups.py
+"""
+
+import logging
+from datetime import datetime, time, timedelta
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Booking, DailyBookingStats
+
+
+logger = logging.getLogger(__name__)
+
+CONFIRMED_STATUSES = ('confirmed', 'completed')
+STAT_FIELDS = ['created', 'confirmed', 'cancelled', 'revenue', 'pay_at_hotel', 'online']
+REBUILD_BATCH_SIZE = 1000
+
+AGGREGATES = {
+    'created': Count('id'),
+    'confirmed': Count('id', filter=Q(status__in=CONFIRMED_STATUSES)),
+    'cancelled': Count('id', filter=Q(status='cancelled')),
+    'revenue': Sum('total_amount', filter=Q(status__in=CONFIRMED_STATUSES)),
+    'pay_at_hotel': Count('id', filter=Q(payment__payment_method='payathotel')),
+    'online': Count('id', filter=Q(payment__isnull=False) & ~Q(payment__payment_method='payathotel')),
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _grouped(bookings):
+    """Rollup values per (hotel, local creation day) for a Booking queryset"""
+    return (
+        bookings.annotate(day=TruncDate('created_at'))
+        .values('hotel_id', 'day')
+        .annotate(**AGGREGATES)
+        .order_by()
+    )
+
+
+def _stats(hotel_id, day, row=None):
+    row = row or {}
+    values = {field: row.get(field) or 0 for field in STAT_FIELDS}
+    return DailyBookingStats(hotel_id=hotel_id, date=day, **values)
+
+
+def _upsert(stats):
+    DailyBookingStats.objects.bulk_create(
+        stats,
+        batch_size=REBUILD_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['hotel', 'date'],
+        update_fields=STAT_FIELDS + ['updated_at'],
+    )
+
+
+def bucket(booking):
+    """The (hotel_id, day) rollup a booking counts towards"""
+    return booking.hotel_id, timezone.localdate(booking.created_at)
+
+
+def refresh(buckets):
+    """Recompute the given (hotel_id, day) rollups; three statements at most"""
+    buckets = set(buckets)
+    if not buckets:
+        return
+    days = [day for _, day in buckets]
+    bookings = Booking.objects.filter(
+        hotel_id__in={hotel_id for hotel_id, _ in buckets},
+        created_at__gte=_day_start(min(days)),
+        created_at__lt=_day_start(max(days) + timedelta(days=1)),
+    )
+    found = {(row['hotel_id'], row['day']): row for row in _grouped(bookings)}
+    _upsert([_stats(hotel_id, day, found.get((hotel_id, day))) for hotel_id, day in buckets])
+
+
+def refresh_bookings(booking_ids):
+    """Recompute the rollups the given bookings count towards"""
+    booking_ids = list(booking_ids)
+    if not booking_ids:
+        return
+    refresh(
+        Booking.objects.filter(pk__in=booking_ids)
+        .annotate(day=TruncDate('created_at'))
+        .values_list('hotel_id', 'day')
+        .distinct()
+        .order_by()
+    )
+
+
+def _run(refresher, arg):
+    try:
+        refresher(arg)
+    except Exception:
+        # Rollups are derived data; the next refresh or a rebuild corrects them
+        logger.exception("Could not refresh daily booking rollups")
+
+
+def schedule(buckets):
+    """Refresh ``buckets`` once the current transaction commits"""
+    transaction.on_commit(partial(_run, refresh, set(buckets)))
+
+
+def schedule_bookings(booking_ids):
+    """Refresh the rollups of ``booking_ids`` once the current transaction commits"""
+    transaction.on_commit(partial(_run, refresh_bookings, list(booking_ids)))
+
+
+def rebuild(since=None):
+    """Recompute every rollup, or those from ``since`` on; returns the rows written"""
+    bookings = Booking.objects.all()
+    stale = DailyBookingStats.objects.all()
+    if since is not None:
+        bookings = bookings.filter(created_at__gte=_day_start(since))
+        stale = stale.filter(date__gte=since)
+    with transaction.atomic():
+        stale.delete()
+        stats = [
+            _stats(row['hotel_id'], row['day'], row)
+            for row in _grouped(bookings).iterator(chunk_size=REBUILD_BATCH_SIZE)
+        ]
+        _upsert(stats)
+    return len(stats)
+
+
+def summary(days, today=None):
+    """
+    Daily series and totals for the last ``days`` days (today included),
+    summed over all hotels; one query
+    """
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    rows = {
+        row['date']: row
+        for row in DailyBookingStats.objects.filter(date__gte=start, date__lte=today)
+        .values('date')
+        .annotate(**{field: Sum(field) for field in STAT_FIELDS})
+        .order_by()
+    }
+    series = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = rows.get(day, {})
+        series.append(dict({field: row.get(field) or 0 for field in STAT_FIELDS}, date=day))
+    totals = {field: sum(point[field] for point in series) for field in STAT_FIELDS}
+    return {'start': start, 'end': today, 'series': series, 'totals': totals}
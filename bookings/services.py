@@ -0,0 +1,107 @@
+"""
+Booking creation service
+
+``create_booking`` is the one way a booking is made, whether from the web
+checkout, an API or a bulk import. The stay is priced first (reads only);
+then a single transaction takes the rooms from the inventory ledger, claims
+the coupon use and inserts the Booking, GuestDetail and Payment rows. They
+commit together, which on SQLite is one fsync per booking, or not at all: a
+sold-out night or an exhausted coupon rolls the whole unit back, so there are
+no orphaned bookings, held rooms or coupon uses to clean up afterwards.
+Online payments also get their PaymentOutbox entry in that transaction; the
+gateway order itself is created afterwards by bookings/outbox.py.
+
+File Location: bookings/services.py
+"""
+
+from django.db import transaction
+
+from hotels.rates import calendar_rows
+
+from .coupons import redeem_coupon
+from .inventory import retry_on_locked, take_rooms
+from .models import Booking, GuestDetail, Payment
+from .outbox import enqueue_order
+from .quotes import quote_room_stay
+
+
+GUEST_FIELDS = ('title', 'full_name', 'email', 'phone', 'id_type', 'id_number')
+
+
+@retry_on_locked
+def create_booking(
+    *,
+    hotel,
+    room_type,
+    check_in,
+    check_out,
+    guest,
+    payment_method='payathotel',
+    rooms=1,
+    adults=1,
+    children=0,
+    coupon_code='',
+    special_requests='',
+    user=None,
+    idempotency_key=None,
+):
+    """
+    Price, hold and record one booking; returns the saved Booking with its
+    ``guest_detail`` and ``payment`` attached. ``guest`` maps GUEST_FIELDS to
+    values. Raises ValueError for an invalid request, StayNotSellable,
+    RoomsUnavailable or CouponRejected; nothing is written in those cases.
+    Pay-at-hotel bookings are confirmed straight away, others stay pending
+    until the payment is verified; Razorpay bookings are queued for a gateway
+    order. A repeated ``idempotency_key`` for the same user raises
+    IntegrityError and writes nothing (see bookings/idempotency.py).
+    """
+    if check_out <= check_in:
+        raise ValueError("Check-out must be after check-in.")
+    if room_type.hotel_id != hotel.pk:
+        raise ValueError("This room type belongs to another hotel.")
+    if rooms < 1:
+        raise ValueError("At least one room is required.")
+
+    # Read the stay's rates once; re-pricing with a coupon needs no query
+    calendar = calendar_rows([room_type.pk], check_in, check_out)
+    quote = quote_room_stay(hotel, room_type.pk, check_in, check_out, rooms, calendar=calendar)
+
+    with transaction.atomic():
+        take_rooms(room_type, check_in, check_out, rooms)
+        if coupon_code:
+            coupon, _ = redeem_coupon(coupon_code, quote.coupon_basis)
+            quote = quote_room_stay(hotel, room_type.pk, check_in, check_out, rooms, coupon, calendar=calendar)
+
+        booking = Booking.objects.create(
+            user=user,
+            hotel=hotel,
+            room_type=room_type,
+            check_in=check_in,
+            check_out=check_out,
+            nights=quote.nights,
+            num_adults=adults,
+            num_children=children,
+            num_rooms=rooms,
+            base_price=quote.base_price,
+            discount_amount=quote.discount,
+            taxes=quote.taxes,
+            total_amount=quote.total,
+            coupon_code=quote.coupon_code,
+            coupon_discount=quote.coupon_discount,
+            special_requests=special_requests,
+            status='confirmed' if payment_method == 'payathotel' else 'pending',
+            payment_status='pending',
+            inventory_reserved=True,
+            idempotency_key=idempotency_key,
+        )
+        # Creating the one-to-one rows also caches them on the booking
+        GuestDetail.objects.create(booking=booking, **{field: guest.get(field) or '' for field in GUEST_FIELDS})
+        payment = Payment.objects.create(
+            booking=booking,
+            payment_method=payment_method,
+            amount=quote.total,
+            is_successful=False,
+        )
+        if payment_method == 'razorpay':
+            enqueue_order(payment)
+    return booking
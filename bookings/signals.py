@@ -0,0 +1,64 @@
+"""
+Bookings App Signals - keep the inventory ledger, booked-night facts,
+dashboard rollups and coupon cache in step
+
+File Location: bookings/signals.py
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from hotels.models import RoomType
+
+from . import rollups
+from .analytics import sync_booking
+from .coupons import bump_coupon_version
+from .inventory import adjust_allotment, release_booking
+from .models import Booking, Coupon
+
+
+@receiver(pre_save, sender=RoomType)
+def remember_total_rooms(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    instance._previous_total_rooms = (
+        RoomType.objects.filter(pk=instance.pk).values_list('total_rooms', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=RoomType)
+def apply_total_rooms_change(sender, instance, created, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_previous_total_rooms', None)
+    if raw or created or previous is None:
+        return
+    adjust_allotment(instance, instance.total_rooms - previous)
+
+
+@receiver(post_save, sender=Booking)
+def release_cancelled_booking(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.status == 'cancelled' and instance.inventory_reserved:
+        release_booking(instance)
+
+
+@receiver(post_save, sender=Booking)
+def record_booked_nights(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_booking(instance)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def refresh_daily_rollup(sender, instance, raw=False, **kwargs):
+    if raw or instance.created_at is None:
+        return
+    rollups.schedule([rollups.bucket(instance)])
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def expire_coupon_cache(sender, **kwargs):
+    """Admin edits to coupons reach every process's lookup cache"""
+    bump_coupon_version()
@@ -1,12 +1,123 @@
 """Tests for bookings app"""
 
+import csv
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
 from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+
+from bookings.availability import available_hotel_ids, rooms_held
+import razorpay
+import requests
 
-from bookings.models import Payment
+from bookings import analytics, gateway, holds, outbox, rollups, webhooks, worker
+from bookings.admin import BookingAdmin
+from bookings.coupons import CouponRejected, redeem_coupon, release_coupon, release_coupon_uses
+from bookings.fake_gateway import FakeRazorpay
+from bookings.idempotency import new_submission_key
+from bookings.inventory import RoomsUnavailable, check_availability, reserve_rooms
+from bookings.models import (
+    BookedNight, Booking, Coupon, DailyBookingStats, GuestDetail, Payment, PaymentEvent, PaymentOutbox, RoomInventory,
+)
+from bookings.quotes import price_stay
+from bookings.reconciliation import Reconciliation, iter_json
+from bookings.services import create_booking
 from hotels.models import Hotel, RoomType
 
 
+GUEST_FORM = {
+    'adults': 2,
+    'rooms': 1,
+    'title': 'Mr',
+    'full_name': 'Test Guest',
+    'email': 'guest@example.com',
+    'phone': '9999999999',
+    'id_type': 'aadhaar',
+    'id_number': '1234',
+    'payment_method': 'payathotel',
+}
+
+
+class BookingFixtureTestCase(TestCase):
+    """
+    A hotel with one Deluxe room type and the helpers the booking tests share:
+    ``book`` calls create_booking, ``booking_form``/``post_booking`` drive the
+    booking view, ``make_coupon`` and ``login``/``login_staff`` set up the rest.
+    Subclasses pick ``hotel_name``, ``total_rooms`` and ``days_ahead``.
+    """
+
+    hotel_name = "Test Inn"
+    hotel_fields = {}
+    total_rooms = 2
+    days_ahead = 10
+    nights = 2
+
+    def setUp(self):
+        cache.clear()
+        self.hotel = Hotel.objects.create(
+            name=self.hotel_name, description="Test stay", address="Temple Road",
+            distance_from_temple="150m", base_price=Decimal('2000.00'), **self.hotel_fields,
+        )
+        self.room_type = RoomType.objects.create(
+            hotel=self.hotel, name="Deluxe", price_per_night=Decimal('2000.00'), max_guests=2,
+            total_rooms=self.total_rooms,
+        )
+        self.check_in = date.today() + timedelta(days=self.days_ahead)
+        self.check_out = self.check_in + timedelta(days=self.nights)
+
+    def login(self, username='guest', *permissions, **fields):
+        user = User.objects.create_user(username=username, password='pass123', **fields)
+        if permissions:
+            user.user_permissions.add(*Permission.objects.filter(codename__in=permissions))
+        self.client.login(username=username, password='pass123')
+        return user
+
+    def login_staff(self, username, *permissions):
+        return self.login(username, *permissions, is_staff=True)
+
+    def make_coupon(self, code, **fields):
+        fields = dict({
+            'description': code, 'discount_type': 'fixed', 'discount_value': Decimal('100'),
+            'valid_from': date.today(), 'valid_until': date.today(), 'max_uses': 10,
+        }, **fields)
+        return Coupon.objects.create(code=code, **fields)
+
+    def booking_form(self, **overrides):
+        return dict(
+            GUEST_FORM,
+            hotel_id=self.hotel.id,
+            room_type_id=self.room_type.id,
+            checkin=self.check_in.isoformat(),
+            checkout=self.check_out.isoformat(),
+            **overrides,
+        )
+
+    def post_booking(self, **overrides):
+        return self.client.post(reverse('bookings:process'), self.booking_form(**overrides))
+
+    def book(self, nights=1, check_in=None, guest=None, **extra):
+        check_in = check_in or self.check_in
+        return create_booking(
+            hotel=self.hotel, room_type=self.room_type, check_in=check_in,
+            check_out=check_in + timedelta(days=nights), guest=guest or {'full_name': 'Guest'}, **extra,
+        )
+
+
 class BookingPageViewTests(TestCase):
     """Verify booking page context information"""
 
@@ -44,3 +155,937 @@ class PaymentModelTests(TestCase):
     def test_contains_razorpay_method(self):
         methods = dict(Payment.PAYMENT_METHODS)
         self.assertIn('razorpay', methods)
+
+
+class AvailabilityTests(TestCase):
+    """Search only lists hotels with sellable rooms for the stay"""
+
+    def setUp(self):
+        self.full = Hotel.objects.create(
+            name="Full House",
+            description="Popular",
+            address="Temple Road",
+            distance_from_temple="100m",
+            base_price=2000,
+        )
+        self.open = Hotel.objects.create(
+            name="Open Doors",
+            description="Quiet",
+            address="Beach Road",
+            distance_from_temple="1 km",
+            base_price=2000,
+        )
+        self.full_room = RoomType.objects.create(
+            hotel=self.full, name="Standard", price_per_night=2000, max_guests=2, total_rooms=2,
+        )
+        self.open_room = RoomType.objects.create(
+            hotel=self.open, name="Standard", price_per_night=2000, max_guests=2, total_rooms=2,
+        )
+        for check_in, check_out in [(date(2026, 11, 1), date(2026, 11, 3)), (date(2026, 11, 2), date(2026, 11, 4))]:
+            self._book(self.full_room, check_in, check_out)
+
+    def _book(self, room_type, check_in, check_out, rooms=1, status='confirmed'):
+        return Booking.objects.create(
+            hotel=room_type.hotel,
+            room_type=room_type,
+            check_in=check_in,
+            check_out=check_out,
+            nights=(check_out - check_in).days,
+            num_rooms=rooms,
+            base_price=0,
+            total_amount=0,
+            status=status,
+        )
+
+    def test_peak_rooms_held_per_night(self):
+        # Back-to-back stays share no night and must not double count
+        self._book(self.open_room, date(2026, 11, 1), date(2026, 11, 2))
+        self._book(self.open_room, date(2026, 11, 2), date(2026, 11, 3))
+        held = rooms_held(date(2026, 11, 1), date(2026, 11, 5))
+        self.assertEqual(held[self.full_room.id], 2)
+        self.assertEqual(held[self.open_room.id], 1)
+
+    def test_cancelled_bookings_release_rooms(self):
+        self._book(self.open_room, date(2026, 11, 2), date(2026, 11, 3), rooms=2, status='cancelled')
+        ids = available_hotel_ids(date(2026, 11, 2), date(2026, 11, 3))
+        self.assertEqual(ids, {self.open.id})
+
+    def test_capacity_checked_against_max_guests(self):
+        self.assertEqual(available_hotel_ids(date(2026, 12, 1), date(2026, 12, 2), guests=3), set())
+        self.assertEqual(
+            available_hotel_ids(date(2026, 12, 1), date(2026, 12, 2), guests=3, rooms=2),
+            {self.full.id, self.open.id},
+        )
+
+    def test_search_filters_by_stay_with_bounded_queries(self):
+        url = reverse('hotels:search')
+        params = {'checkIn': '2026-11-02', 'checkOut': '2026-11-03', 'guests': 2}
+        self.client.get(url, params)  # warm the card cache
+        # room types, bookings, hotels, stay totals (room types, calendar), amenities
+        with self.assertNumQueries(6):
+            response = self.client.get(url, params)
+        names = [card['name'] for card in response.context['hotel_cards']]
+        self.assertEqual(names, ['Open Doors'])
+
+
+class InventoryLedgerTests(BookingFixtureTestCase):
+    """Rooms are reserved per night and can never be oversold"""
+
+    hotel_name = "Ledger Inn"
+    nights = 3
+
+    def _remaining(self):
+        return list(
+            RoomInventory.objects.filter(room_type=self.room_type).order_by('date').values_list('remaining', flat=True)
+        )
+
+    def test_reserve_decrements_every_night(self):
+        reserve_rooms(self.room_type, self.check_in, self.check_out, 2)
+        self.assertEqual(self._remaining(), [0, 0, 0])
+        with self.assertRaises(RoomsUnavailable):
+            reserve_rooms(self.room_type, self.check_in + timedelta(days=2), self.check_out + timedelta(days=1))
+        # The failed reservation must not leave a partial hold behind
+        self.assertEqual(self._remaining(), [0, 0, 0])
+        self.assertFalse(check_availability(self.room_type, self.check_in, self.check_out))
+        self.assertTrue(check_availability(self.room_type, self.check_out, self.check_out + timedelta(days=2), 2))
+
+    def test_process_booking_stops_overbooking(self):
+        self.login()
+        self.post_booking(rooms=2)
+        response = self.post_booking()
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertRedirects(
+            response,
+            reverse('bookings:booking_page', kwargs={'hotel_slug': self.hotel.slug}) + f'?room={self.room_type.id}',
+            fetch_redirect_response=False,
+        )
+
+    def test_cancellation_releases_rooms_once(self):
+        self.login()
+        self.post_booking()
+        booking = Booking.objects.get()
+        self.assertTrue(booking.inventory_reserved)
+        self.assertEqual(self._remaining(), [1, 1, 1])
+
+        booking.status = 'cancelled'
+        booking.save()
+        booking.save()
+        self.assertEqual(self._remaining(), [2, 2, 2])
+
+    def test_cancelling_a_booking_made_before_the_ledger_releases_it(self):
+        legacy = Booking.objects.create(
+            hotel=self.hotel, room_type=self.room_type, check_in=self.check_in, check_out=self.check_out,
+            nights=3, base_price=6000, total_amount=6720, status='confirmed',
+        )
+        self.assertFalse(legacy.inventory_reserved)
+        # The first reservation seeds the ledger with the legacy booking subtracted
+        reserve_rooms(self.room_type, self.check_in, self.check_out)
+        self.assertEqual(self._remaining(), [0, 0, 0])
+
+        legacy = Booking.objects.get(pk=legacy.pk)
+        self.assertTrue(legacy.inventory_reserved)
+        legacy.status = 'cancelled'
+        legacy.save()
+        self.assertEqual(self._remaining(), [1, 1, 1])
+
+    def test_total_rooms_change_adjusts_future_nights(self):
+        reserve_rooms(self.room_type, self.check_in, self.check_out)
+        self.room_type.total_rooms = 5
+        self.room_type.save()
+        self.assertEqual(self._remaining(), [4, 4, 4])
+
+
+class CouponRedemptionTests(BookingFixtureTestCase):
+    """Coupons are claimed with one conditional UPDATE and looked up from cache"""
+
+    hotel_name = "Coupon Inn"
+
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        self.coupon = self.make_coupon(
+            'TEMPLE20',
+            description='20% off',
+            discount_type='percentage',
+            discount_value=Decimal('20'),
+            max_discount=Decimal('1000'),
+            min_booking_amount=Decimal('3000'),
+            valid_from=today - timedelta(days=1),
+            valid_until=today + timedelta(days=1),
+            max_uses=2,
+        )
+
+    def test_redemption_stops_at_max_uses(self):
+        self.assertEqual(redeem_coupon('temple20', 4000)[1], Decimal('800.00'))
+        self.assertEqual(redeem_coupon('TEMPLE20', 10000)[1], Decimal('1000.00'))
+        with self.assertRaises(CouponRejected):
+            redeem_coupon('TEMPLE20', 4000)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 2)
+
+    def test_min_booking_amount_is_enforced(self):
+        with self.assertRaises(CouponRejected):
+            redeem_coupon('TEMPLE20', 2999)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 0)
+
+    def test_stale_cache_cannot_oversell(self):
+        redeem_coupon('TEMPLE20', 4000)
+        # Another process uses the last redemption behind this cache's back
+        Coupon.objects.filter(pk=self.coupon.pk).update(used_count=2)
+        with self.assertRaises(CouponRejected):
+            redeem_coupon('TEMPLE20', 4000)
+        with self.assertNumQueries(0):
+            with self.assertRaises(CouponRejected):
+                redeem_coupon('TEMPLE20', 4000)
+
+    def test_released_use_revives_a_coupon_cached_as_exhausted(self):
+        redeem_coupon('TEMPLE20', 4000)
+        redeem_coupon('TEMPLE20', 4000)
+        with self.assertRaises(CouponRejected):
+            redeem_coupon('TEMPLE20', 4000)
+        # Released from a fresh row, as another process would, not the cached one
+        release_coupon(Coupon.objects.get(pk=self.coupon.pk))
+        self.assertEqual(redeem_coupon('TEMPLE20', 4000)[1], Decimal('800.00'))
+
+        # Bulk releases behind the cached row invalidate it too
+        with self.assertRaises(CouponRejected):
+            redeem_coupon('TEMPLE20', 4000)
+        release_coupon_uses({'TEMPLE20': 2})
+        self.assertEqual(redeem_coupon('TEMPLE20', 4000)[1], Decimal('800.00'))
+
+    def test_lookups_are_cached_including_unknown_codes(self):
+        redeem_coupon('TEMPLE20', 4000)
+        with self.assertRaises(CouponRejected):
+            redeem_coupon('NOSUCHCODE', 4000)
+        with self.assertNumQueries(1):  # just the conditional UPDATE
+            redeem_coupon('TEMPLE20', 4000)
+        with self.assertNumQueries(0):
+            with self.assertRaises(CouponRejected):
+                redeem_coupon('NOSUCHCODE', 4000)
+
+        # Saving a coupon invalidates the cache everywhere
+        Coupon.objects.create(
+            code='NOSUCHCODE', description='Now exists', discount_type='fixed',
+            discount_value=Decimal('500'), valid_from=date.today(), valid_until=date.today(),
+        )
+        self.assertEqual(redeem_coupon('NOSUCHCODE', 4000)[1], Decimal('500.00'))
+
+    def test_process_booking_applies_and_records_coupon(self):
+        self.login()
+        self.post_booking(coupon_code='temple20')
+        booking = Booking.objects.get()
+        self.assertEqual((booking.coupon_code, booking.coupon_discount), ('TEMPLE20', Decimal('800.00')))
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+
+
+class QuoteEngineTests(BookingFixtureTestCase):
+    """One Decimal pricing path shared by search, booking and the batch API"""
+
+    hotel_name = "Quote Inn"
+    hotel_fields = {'discount_percentage': 10}
+
+    def setUp(self):
+        super().setUp()
+        self.make_coupon('FIRST500', description='Flat 500', discount_value=Decimal('500'))
+
+    def test_price_stay_is_exact_and_memoised(self):
+        quote = price_stay(Decimal('2000.00'), 10, 3, 2)
+        self.assertEqual(
+            (quote.base_price, quote.discount, quote.taxes, quote.total),
+            (Decimal('12000.00'), Decimal('1200.00'), Decimal('1296.00'), Decimal('12096.00')),
+        )
+        self.assertIs(price_stay(Decimal('2000'), 10, 3, 2), quote)
+
+    def test_batch_endpoint(self):
+        self.login()
+        url = reverse('bookings:quotes')
+        payload = {'quotes': [
+            {'hotel': self.hotel.id, 'checkin': '2026-11-10', 'checkout': '2026-11-12', 'rooms': 1},
+            {'room_type': self.room_type.id, 'checkin': '2026-11-10', 'checkout': '2026-11-12', 'coupon': 'first500'},
+            {'hotel': self.hotel.id, 'checkin': '2026-11-12', 'checkout': '2026-11-10'},
+        ]}
+        # session, user, room types, hotels, rate calendar, one coupon lookup
+        with self.assertNumQueries(6):
+            response = self.client.post(url, payload, content_type='application/json')
+        plain, with_coupon, invalid = response.json()['quotes']
+        self.assertEqual(plain['total'], '4032.00')
+        self.assertEqual((with_coupon['coupon_discount'], with_coupon['total']), ('500.00', '3472.00'))
+        self.assertIn('error', invalid)
+
+        self.assertEqual(self.client.post(url, {'nope': 1}, content_type='application/json').status_code, 400)
+
+    def test_batch_endpoint_guards_coupons_and_room_types(self):
+        other = Hotel.objects.create(name="Other Inn", description="x", address="x", base_price=Decimal('900.00'))
+        url = reverse('bookings:quotes')
+        stay = {'checkin': '2026-11-10', 'checkout': '2026-11-12'}
+        payload = {'quotes': [
+            dict(stay, room_type=self.room_type.id, coupon='FIRST500'),
+            dict(stay, hotel=other.id, room_type=self.room_type.id),
+        ]}
+        anonymous, mismatched = self.client.post(url, payload, content_type='application/json').json()['quotes']
+        self.assertEqual((anonymous['coupon_discount'], anonymous['coupon_error']), ('0.00', 'Sign in to apply a coupon.'))
+        self.assertIn('error', mismatched)
+
+        self.login()
+        probe = {'quotes': [dict(stay, room_type=self.room_type.id, coupon=f'GUESS{n}') for n in range(15)]}
+        # One throttle window for the whole burst
+        with mock.patch('bookings.throttle.time.time', return_value=1_000_000.0):
+            self.assertEqual(self.client.post(url, probe, content_type='application/json').status_code, 200)
+            self.assertEqual(self.client.post(url, probe, content_type='application/json').status_code, 429)
+            # Plain quotes have their own budget
+            plain = {'quotes': [dict(stay, hotel=self.hotel.id)]}
+            self.assertEqual(self.client.post(url, plain, content_type='application/json').status_code, 200)
+
+    def test_search_shows_stay_totals(self):
+        response = self.client.get(reverse('hotels:search'), {'checkin': '2026-11-10', 'checkout': '2026-11-13'})
+        card = response.context['hotel_cards'][0]
+        self.assertEqual((card['stayTotal'], card['stayNights']), (6048.0, 3))
+
+
+class BookingServiceTests(BookingFixtureTestCase):
+    """create_booking writes everything in one transaction or nothing at all"""
+
+    hotel_name = "Service Inn"
+    days_ahead = 20
+
+    def setUp(self):
+        super().setUp()
+        self.coupon = self.make_coupon(
+            'SAVE10', description='10%', discount_type='percentage', discount_value=Decimal('10'), max_uses=5,
+        )
+        self.details = {
+            'hotel': self.hotel,
+            'room_type': self.room_type,
+            'check_in': self.check_in,
+            'check_out': self.check_out,
+            'guest': {'title': 'Mr', 'full_name': 'Guest', 'email': 'guest@example.com', 'phone': '1',
+                      'id_type': 'pan', 'id_number': 'X'},
+        }
+
+    def remaining(self):
+        return list(RoomInventory.objects.order_by('date').values_list('remaining', flat=True))
+
+    def test_creates_everything_with_bounded_statements(self):
+        # Rates; ledger seed and decrement (4); coupon lookup and claim; three inserts; booked nights (2); begin/commit
+        with self.assertNumQueries(14):
+            booking = create_booking(coupon_code='save10', **self.details)
+        self.assertEqual((booking.status, booking.nights, booking.coupon_code), ('confirmed', 2, 'SAVE10'))
+        self.assertEqual(booking.total_amount, Decimal('4032.00'))
+        with self.assertNumQueries(0):
+            self.assertEqual((booking.guest_detail.full_name, booking.payment.amount), ('Guest', booking.total_amount))
+        self.assertEqual(self.remaining(), [1, 1])
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+
+    def test_failure_rolls_back_rooms_coupon_and_booking(self):
+        with mock.patch.object(Payment.objects, 'create', side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                create_booking(coupon_code='SAVE10', **self.details)
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(GuestDetail.objects.exists())
+        self.assertFalse(RoomInventory.objects.exists())
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 0)
+
+    def test_rejections_write_nothing(self):
+        create_booking(rooms=2, **self.details)
+        with self.assertRaises(RoomsUnavailable):
+            create_booking(coupon_code='SAVE10', **self.details)
+        self.coupon.refresh_from_db()
+        self.assertEqual((Booking.objects.count(), self.coupon.used_count), (1, 0))
+
+        self.coupon.is_active = False
+        self.coupon.save()
+        details = dict(self.details, check_in=self.check_in + timedelta(days=5), check_out=self.check_in + timedelta(days=6))
+        with self.assertRaises(CouponRejected):
+            create_booking(coupon_code='SAVE10', **details)
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+class IdempotentSubmissionTests(BookingFixtureTestCase):
+    """Resubmitting the same booking form replays the first outcome"""
+
+    hotel_name = "Retry Inn"
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        self.coupon = self.make_coupon('ONCE')
+        self.form = self.booking_form(coupon_code='ONCE', idempotency_key=new_submission_key())
+
+    def test_double_submit_creates_one_booking(self):
+        first = self.client.post(reverse('bookings:process'), self.form)
+        second = self.client.post(reverse('bookings:process'), self.form)
+        booking = Booking.objects.get()
+        self.assertRedirects(first, reverse('bookings:confirmation', args=[booking.booking_id]), fetch_redirect_response=False)
+        self.assertEqual(second.url, first.url)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+        self.assertEqual(set(RoomInventory.objects.values_list('remaining', flat=True)), {1})
+
+        # A fresh form is a new booking
+        self.client.post(reverse('bookings:process'), dict(self.form, idempotency_key=new_submission_key()))
+        self.assertEqual(Booking.objects.count(), 2)
+
+    @override_settings(RAZORPAY_KEY_ID="key123", RAZORPAY_KEY_SECRET="secret123")
+    def test_resubmit_reuses_gateway_order(self):
+        client = mock.Mock()
+        client.order.create.return_value = {'id': 'order_abc'}
+        form = dict(self.form, payment_method='razorpay')
+        with mock.patch('bookings.gateway.get_client', return_value=client):
+            first = self.client.post(reverse('bookings:process'), form)
+            outbox.drain()
+            second = self.client.post(reverse('bookings:process'), form)
+        booking = Booking.objects.get()
+        checkout_url = reverse('bookings:checkout', args=[booking.booking_id])
+        self.assertRedirects(first, checkout_url, fetch_redirect_response=False)
+        self.assertEqual(second.url, checkout_url)
+        self.assertEqual(client.order.create.call_count, 1)
+        self.assertContains(self.client.get(checkout_url), 'order_abc')
+
+    def test_resubmit_on_another_worker_creates_one_booking(self):
+        first = self.client.post(reverse('bookings:process'), self.form)
+        # Another process shares nothing but the database
+        cache.clear()
+        second = self.client.post(reverse('bookings:process'), self.form)
+        self.assertEqual(second.url, first.url)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_concurrent_submit_replays_the_winner(self):
+        first = self.client.post(reverse('bookings:process'), self.form)
+        booking = Booking.objects.get()
+        # The second copy passed its lookup before the first one committed
+        with mock.patch('bookings.views.previous_submission', side_effect=[None, booking.booking_id]):
+            second = self.client.post(reverse('bookings:process'), self.form)
+        self.assertEqual(second.url, first.url)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+        self.assertEqual(set(RoomInventory.objects.values_list('remaining', flat=True)), {1})
+
+    def test_failed_submission_can_be_retried(self):
+        self.client.post(reverse('bookings:process'), dict(self.form, checkout=self.form['checkin']))
+        self.assertFalse(Booking.objects.exists())
+        self.client.post(reverse('bookings:process'), self.form)
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+@override_settings(RAZORPAY_KEY_ID="key123", RAZORPAY_KEY_SECRET="secret123")
+class GatewayClientTests(TestCase):
+    """Pooled Razorpay client with timeouts and a circuit breaker, against the fake gateway"""
+
+    def setUp(self):
+        gateway.breaker.reset()
+        self.addCleanup(gateway.breaker.reset)
+        self.fake = FakeRazorpay().start()
+        self.addCleanup(self.fake.stop)
+        settings_override = override_settings(RAZORPAY_BASE_URL=self.fake.base_url, RAZORPAY_READ_TIMEOUT=0.2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_client_is_shared_and_reuses_connections(self):
+        orders = [gateway.create_order(50000, f"DWK{n}") for n in range(3)]
+        self.assertIs(gateway.get_client(), gateway.get_client())
+        self.assertEqual(len({order['id'] for order in orders}), 3)
+        self.assertEqual((self.fake.requests, self.fake.connections), (3, 1))
+
+    def test_slow_gateway_times_out(self):
+        self.fake.mode, self.fake.delay = 'slow', 0.5
+        with self.assertRaises(requests.Timeout):
+            gateway.create_order(50000, "DWKSLOW")
+
+    def test_breaker_opens_hides_razorpay_and_recovers(self):
+        hotel = Hotel.objects.create(
+            name="Gateway Inn", description="Pay", address="Temple Road",
+            distance_from_temple="150m", base_price=2000,
+        )
+        RoomType.objects.create(hotel=hotel, name="Deluxe", price_per_night=2000)
+        self.fake.mode = 'error'
+        for _ in range(gateway.BREAKER_FAILURE_THRESHOLD):
+            with self.assertRaises(razorpay.errors.ServerError):
+                gateway.create_order(50000, "DWKFAIL")
+        with self.assertRaises(gateway.GatewayUnavailable):
+            gateway.create_order(50000, "DWKFAIL")
+        self.assertEqual(self.fake.requests, gateway.BREAKER_FAILURE_THRESHOLD)
+        response = self.client.get(reverse('bookings:booking_page', args=[hotel.slug]))
+        self.assertFalse(response.context['razorpay_enabled'])
+        self.assertContains(response, 'Reserve with Pay at Hotel')
+
+        # After the cooldown one trial call goes through and closes the breaker
+        self.fake.mode = 'ok'
+        with mock.patch.object(gateway.breaker, 'cooldown', 0):
+            self.assertTrue(gateway.online_payments_available())
+            gateway.create_order(50000, "DWKBACK")
+        self.assertEqual(gateway.breaker.state, gateway.CircuitBreaker.CLOSED)
+
+    def test_bad_requests_do_not_trip_the_breaker(self):
+        for _ in range(gateway.BREAKER_FAILURE_THRESHOLD + 1):
+            with self.assertRaises(razorpay.errors.BadRequestError):
+                gateway.create_order(1, "DWKTINY")
+        self.assertTrue(gateway.online_payments_available())
+
+
+@override_settings(RAZORPAY_KEY_ID="key123", RAZORPAY_KEY_SECRET="secret123")
+class PaymentOutboxTests(BookingFixtureTestCase):
+    """Razorpay orders are queued with the booking and created by the outbox worker"""
+
+    hotel_name = "Outbox Inn"
+    total_rooms = 1
+
+    def setUp(self):
+        super().setUp()
+        gateway.breaker.reset()
+        self.addCleanup(gateway.breaker.reset)
+        self.user = self.login('payer')
+        self.coupon = self.make_coupon('HOLD')
+        self.booking = self.book(
+            nights=2, guest={'full_name': 'Payer'}, payment_method='razorpay', coupon_code='HOLD', user=self.user,
+        )
+        self.checkout_url = reverse('bookings:checkout', args=[self.booking.booking_id])
+        self.status_url = reverse('bookings:checkout_status', args=[self.booking.booking_id])
+
+    def test_entry_is_written_with_the_booking(self):
+        entry = PaymentOutbox.objects.get()
+        self.assertEqual((entry.payment.booking, entry.status, entry.attempts), (self.booking, 'pending', 0))
+        self.assertEqual(self.booking.status, 'pending')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.booking.payment.gateway_order_id, '')
+        # Pay at hotel needs no order
+        self.book(check_in=date.today() + timedelta(days=30), guest={'full_name': 'Cash'})
+        self.assertEqual(PaymentOutbox.objects.count(), 1)
+
+    def test_checkout_waits_for_the_order(self):
+        response = self.client.get(self.checkout_url)
+        self.assertTemplateUsed(response, 'bookings/checkout_pending.html')
+        with mock.patch.object(worker, 'kick') as kick:
+            self.assertEqual(self.client.get(self.status_url).json(), {'state': 'pending'})
+        kick.assert_called_once()
+
+        with FakeRazorpay() as fake, override_settings(RAZORPAY_BASE_URL=fake.base_url):
+            self.assertEqual(outbox.drain(), {'done': 1, 'pending': 0, 'failed': 0})
+            self.assertEqual(outbox.drain(), {'done': 0, 'pending': 0, 'failed': 0})
+            self.assertEqual(fake.requests, 1)
+        order_id = Payment.objects.get().gateway_order_id
+        self.assertTrue(order_id)
+        self.assertEqual(self.client.get(self.status_url).json(), {'state': 'ready'})
+        self.assertContains(self.client.get(self.checkout_url), order_id)
+
+        # Only the guest who booked can see it
+        self.login('other')
+        self.assertEqual(self.client.get(self.checkout_url).status_code, 404)
+
+    def test_claimed_entry_is_not_processed_twice(self):
+        entry = PaymentOutbox.objects.get()
+        self.assertTrue(outbox.claim(entry.pk))
+        self.assertFalse(outbox.claim(entry.pk))
+        with mock.patch.object(gateway, 'create_order') as create_order:
+            self.assertEqual(outbox.drain(), {'done': 0, 'pending': 0, 'failed': 0})
+        create_order.assert_not_called()
+
+    def test_failures_back_off_then_cancel_the_booking(self):
+        later = timezone.now()
+        failing = mock.patch.object(gateway, 'create_order', side_effect=requests.ConnectionError("down"))
+        with failing, self.assertLogs('bookings.outbox', 'WARNING') as logs:
+            self.assertEqual(outbox.drain(), {'done': 0, 'pending': 1, 'failed': 0})
+            entry = PaymentOutbox.objects.get()
+            self.assertEqual(entry.attempts, 1)
+            self.assertGreater(entry.next_attempt_at, later)
+            # Not due again until the backoff has passed
+            self.assertEqual(outbox.drain(), {'done': 0, 'pending': 0, 'failed': 0})
+            for _ in range(outbox.MAX_ATTEMPTS - 1):
+                later += timedelta(seconds=outbox.BACKOFF_MAX_SECONDS)
+                outbox.drain(now=later)
+        self.assertIn('Giving up', logs.output[-1])
+        entry.refresh_from_db()
+        self.booking.refresh_from_db()
+        self.coupon.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts, entry.last_error), ('failed', outbox.MAX_ATTEMPTS, 'down'))
+        self.assertEqual((self.booking.status, self.booking.payment_status), ('cancelled', 'failed'))
+        self.assertFalse(self.booking.inventory_reserved)
+        self.assertEqual(set(RoomInventory.objects.values_list('remaining', flat=True)), {1})
+        self.assertEqual(self.coupon.used_count, 0)
+        self.assertEqual(self.client.get(self.status_url).json(), {'state': 'failed'})
+        self.assertRedirects(self.client.get(self.checkout_url), f"{reverse('bookings:booking_page', args=[self.hotel.slug])}?room={self.room_type.id}", fetch_redirect_response=False)
+
+    def test_giving_up_after_the_hold_expired_releases_nothing_twice(self):
+        Booking.objects.filter(pk=self.booking.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        # The entry is leased first, then the sweeper expires the hold
+        entry = PaymentOutbox.objects.select_related('payment__booking').get()
+        # Another guest's booking holds the coupon's second use
+        Coupon.objects.filter(pk=self.coupon.pk).update(used_count=2)
+        self.assertEqual(holds.sweep(), 1)
+        failing = mock.patch.object(gateway, 'create_order', side_effect=razorpay.errors.BadRequestError("nope"))
+        with failing, self.assertLogs('bookings.outbox', 'ERROR'):
+            outbox.process_entry(entry)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+        self.assertEqual(set(RoomInventory.objects.values_list('remaining', flat=True)), {1})
+        self.assertIn('hold expired', Payment.objects.get().remarks)
+
+    def test_command_drains_the_outbox(self):
+        out = StringIO()
+        with mock.patch.object(gateway, 'create_order', return_value={'id': 'order_cmd'}):
+            call_command('process_payment_outbox', stdout=out)
+        self.assertIn('Orders created: 1', out.getvalue())
+        self.assertEqual(Payment.objects.get().gateway_order_id, 'order_cmd')
+
+
+@override_settings(RAZORPAY_WEBHOOK_SECRET="whsec")
+class RazorpayWebhookTests(BookingFixtureTestCase):
+    """Webhook deliveries are logged once and applied in batches by the worker"""
+
+    hotel_name = "Webhook Inn"
+    total_rooms = 5
+
+    def setUp(self):
+        super().setUp()
+        self.payments = []
+        for offset in range(3):
+            booking = self.book(
+                check_in=self.check_in + timedelta(days=offset), guest={'full_name': 'Payer'}, payment_method='razorpay',
+            )
+            Payment.objects.filter(booking=booking).update(gateway_order_id=f'order_{offset}')
+            self.payments.append(booking.payment)
+
+    def deliver(self, event_id, event, order_id, payment_id='pay_1', secret='whsec', **entity):
+        body = json.dumps({
+            'event': event,
+            'payload': {'payment': {'entity': {'id': payment_id, 'order_id': order_id, **entity}}},
+        }).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            reverse('bookings:razorpay_webhook'), body, content_type='application/json',
+            HTTP_X_RAZORPAY_SIGNATURE=signature, HTTP_X_RAZORPAY_EVENT_ID=event_id,
+        )
+
+    def test_redeliveries_are_recorded_once(self):
+        with self.assertNumQueries(1):
+            response = self.deliver('evt_1', 'payment.captured', 'order_0')
+        self.assertEqual(response.json(), {'status': 'ok'})
+        self.deliver('evt_1', 'payment.captured', 'order_0')
+        event = PaymentEvent.objects.get()
+        self.assertEqual((event.order_id, event.payment_id, event.processed_at), ('order_0', 'pay_1', None))
+
+    def test_bad_signature_is_refused(self):
+        self.assertEqual(self.deliver('evt_1', 'payment.captured', 'order_0', secret='wrong').status_code, 400)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_events_are_applied_in_one_batch(self):
+        self.deliver('evt_1', 'payment.captured', 'order_0', payment_id='pay_a')
+        self.deliver('evt_2', 'order.paid', 'order_1', payment_id='pay_b')
+        self.deliver('evt_3', 'payment.failed', 'order_2', error_description='Card declined')
+        self.deliver('evt_4', 'payment.captured', 'order_0', payment_id='pay_a')  # a second event for a paid order
+        self.deliver('evt_5', 'payment.captured', 'order_unknown')
+        self.deliver('evt_6', 'refund.created', 'order_1')
+
+        # Batch of events, payments, payment/booking bulk updates, booked nights (4), event update, in a savepoint
+        with self.assertNumQueries(11):
+            outcome = webhooks.apply_events()
+        self.assertEqual(outcome, {'applied': 3, 'ignored': 2, 'unmatched': 1})
+        self.assertEqual(webhooks.apply_events(), {'applied': 0, 'ignored': 0, 'unmatched': 0})
+
+        paid = Payment.objects.select_related('booking').get(gateway_order_id='order_0')
+        self.assertTrue(paid.is_successful)
+        self.assertEqual((paid.gateway_payment_id, paid.booking.status, paid.booking.payment_status), ('pay_a', 'confirmed', 'paid'))
+        failed = Payment.objects.select_related('booking').get(gateway_order_id='order_2')
+        self.assertEqual((failed.is_successful, failed.booking.payment_status), (False, 'failed'))
+        self.assertEqual(failed.remarks, 'Payment failed: Card declined')
+        self.assertEqual(
+            dict(PaymentEvent.objects.values_list('event_id', 'outcome')),
+            {'evt_1': 'applied', 'evt_2': 'applied', 'evt_3': 'applied',
+             'evt_4': 'ignored', 'evt_5': 'unmatched', 'evt_6': 'ignored'},
+        )
+
+
+class SettlementReconciliationTests(BookingFixtureTestCase):
+    """Settlement exports are streamed against an index of Razorpay payments"""
+
+    hotel_name = "Ledger Inn"
+    total_rooms = 5
+
+    def setUp(self):
+        super().setUp()
+        self.bookings = []
+        for offset in range(3):
+            booking = self.book(
+                check_in=self.check_in + timedelta(days=offset), guest={'full_name': 'Payer'}, payment_method='razorpay',
+            )
+            Payment.objects.filter(booking=booking).update(gateway_order_id=f'order_{offset}')
+            self.bookings.append(booking)
+        Payment.objects.filter(gateway_order_id='order_1').update(
+            is_successful=True, gateway_payment_id='pay_1', payment_date=timezone.now(),
+        )
+        self.paise = int(self.bookings[0].total_amount * 100)
+        self.export = [
+            {'entity_id': 'pay_0', 'type': 'payment', 'order_id': 'order_0', 'amount': self.paise},
+            {'entity_id': 'pay_1', 'type': 'payment', 'order_id': 'order_1', 'amount': self.paise},
+            {'entity_id': 'pay_2', 'type': 'payment', 'order_id': 'order_2', 'amount': self.paise - 100},
+            {'entity_id': 'pay_x', 'type': 'payment', 'order_id': 'order_x', 'amount': 500},
+            {'entity_id': 'rfnd_1', 'type': 'refund', 'order_id': '', 'amount': 500},
+        ]
+
+    def run_command(self, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='') as export:
+            writer = csv.DictWriter(export, fieldnames=['entity_id', 'type', 'order_id', 'amount'])
+            writer.writeheader()
+            writer.writerows(self.export)
+        self.addCleanup(os.unlink, export.name)
+        out, err = StringIO(), StringIO()
+        call_command('reconcile_payments', export.name, *args, stdout=out, stderr=err)
+        return list(csv.DictReader(StringIO(out.getvalue()))), err.getvalue()
+
+    def test_report_and_fix(self):
+        report, summary = self.run_command()
+        self.assertEqual(
+            [(row['kind'], row['order_id'], row['action']) for row in report],
+            [('captured_not_recorded', 'order_0', 'marked paid'),
+             ('amount_mismatch', 'order_2', ''),
+             ('unknown_payment', 'order_x', '')],
+        )
+        self.assertIn('Read 5 row(s): 3 matched, 1 skipped, 3 discrepancy(ies), 1 payment(s) marked paid', summary)
+        fixed = Payment.objects.select_related('booking').get(gateway_order_id='order_0')
+        self.assertEqual((fixed.is_successful, fixed.gateway_payment_id), (True, 'pay_0'))
+        self.assertEqual((fixed.booking.status, fixed.booking.payment_status), ('confirmed', 'paid'))
+        self.assertFalse(Payment.objects.get(gateway_order_id='order_2').is_successful)
+
+    def test_dry_run_and_missing_captures(self):
+        del self.export[1]
+        today = date.today().isoformat()
+        report, summary = self.run_command('--dry-run', '--from', today, '--to', today)
+        self.assertEqual(
+            [row['kind'] for row in report],
+            ['captured_not_recorded', 'amount_mismatch', 'unknown_payment', 'missing_from_export'],
+        )
+        self.assertEqual(report[-1]['order_id'], 'order_1')
+        self.assertIn('(dry run)', summary)
+        self.assertFalse(Payment.objects.get(gateway_order_id='order_0').is_successful)
+
+    def test_json_exports_stream_in_chunks(self):
+        as_array = StringIO(json.dumps(self.export, indent=2))
+        as_lines = StringIO('\n'.join(json.dumps(row) for row in self.export) + '\n')
+        self.assertEqual(list(iter_json(as_array, read_size=7)), self.export)
+        self.assertEqual(list(iter_json(as_lines, read_size=7)), self.export)
+
+        run = Reconciliation(chunk_size=1)
+        with mock.patch.object(Payment.objects, 'bulk_update', wraps=Payment.objects.bulk_update) as bulk_update:
+            kinds = [found.kind for found in run.run(iter_json(StringIO(json.dumps(self.export))))]
+        self.assertEqual(kinds, ['captured_not_recorded', 'amount_mismatch', 'unknown_payment'])
+        self.assertEqual(bulk_update.call_count, 1)
+        self.assertTrue(Payment.objects.get(gateway_order_id='order_0').is_successful)
+
+
+@override_settings(BOOKING_HOLD_MINUTES=30)
+class BookingHoldExpiryTests(BookingFixtureTestCase):
+    """Unpaid online bookings release their rooms when the hold lapses"""
+
+    hotel_name = "Hold Inn"
+    total_rooms = 3
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='late', password='pass123')
+        self.coupon = self.make_coupon('HOLD')
+
+    def book(self, payment_method='razorpay', age_minutes=45, **extra):
+        booking = super().book(
+            nights=2, guest={'full_name': 'Late'}, payment_method=payment_method, user=self.user, **extra,
+        )
+        Booking.objects.filter(pk=booking.pk).update(created_at=timezone.now() - timedelta(minutes=age_minutes))
+        return booking
+
+    def test_sweep_expires_lapsed_holds_in_one_batch(self):
+        lapsed = [self.book(coupon_code='HOLD'), self.book()]
+        fresh = self.book(age_minutes=5)
+        self.assertEqual(set(RoomInventory.objects.values_list('remaining', flat=True)), {0})
+
+        # Expire; claim rooms; release (one room count); payments; outbox; coupon; inside a savepoint
+        with self.assertNumQueries(8):
+            self.assertEqual(holds.sweep(), 2)
+        self.assertEqual(holds.sweep(), 0)
+
+        self.assertEqual(
+            set(Booking.objects.filter(pk__in=[b.pk for b in lapsed]).values_list('status', 'payment_status', 'inventory_reserved')),
+            {('cancelled', 'failed', False)},
+        )
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, 'pending')
+        self.assertEqual(set(RoomInventory.objects.values_list('remaining', flat=True)), {2})
+        self.assertEqual(
+            set(PaymentOutbox.objects.filter(payment__booking__in=lapsed).values_list('status', flat=True)), {'failed'}
+        )
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 0)
+
+    def test_only_holds_the_batch_expired_are_released(self):
+        lapsed = self.book()
+        confirmed = self.book()
+        released = self.book()
+        # Confirmed, or with rooms already returned, after the sweep picked them
+        Booking.objects.filter(pk=confirmed.pk).update(status='confirmed', payment_status='paid')
+        Booking.objects.filter(pk=released.pk).update(inventory_reserved=False)
+        picked = Booking.objects.filter(pk__in=[lapsed.pk, confirmed.pk, released.pk]).order_by('created_at')
+        with mock.patch.object(holds, 'lapsed_holds', return_value=picked):
+            self.assertEqual(holds.expire_batch(), 2)
+        self.assertEqual(
+            dict(Booking.objects.values_list('pk', 'status')),
+            {lapsed.pk: 'cancelled', confirmed.pk: 'confirmed', released.pk: 'cancelled'},
+        )
+        # Only the lapsed booking still held its rooms
+        self.assertEqual(set(RoomInventory.objects.values_list('remaining', flat=True)), {1})
+
+    def test_databases_without_update_returning_lock_instead(self):
+        lapsed = [self.book(coupon_code='HOLD'), self.book()]
+        fresh = self.book(age_minutes=5)
+        with mock.patch.object(connection.features, 'can_return_columns_from_insert', False), \
+                mock.patch.object(holds, '_claim_returning') as returning:
+            self.assertEqual(holds.sweep(), 2)
+        returning.assert_not_called()
+        self.assertEqual(
+            set(Booking.objects.filter(pk__in=[b.pk for b in lapsed]).values_list('status', 'inventory_reserved')),
+            {('cancelled', False)},
+        )
+        self.assertEqual(Booking.objects.get(pk=fresh.pk).status, 'pending')
+        self.assertEqual(set(RoomInventory.objects.values_list('remaining', flat=True)), {2})
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 0)
+
+    def test_paid_and_pay_at_hotel_bookings_are_kept(self):
+        at_hotel = self.book(payment_method='payathotel')
+        paid = self.book()
+        Booking.objects.filter(pk=paid.pk).update(payment_status='paid')
+        self.assertEqual(holds.sweep(batch_size=1), 0)
+        self.assertEqual(
+            list(Booking.objects.filter(pk__in=[at_hotel.pk, paid.pk]).order_by('pk').values_list('status', flat=True)),
+            ['confirmed', 'pending'],
+        )
+
+    @override_settings(RAZORPAY_KEY_ID="key123", RAZORPAY_KEY_SECRET="secret123")
+    def test_payment_after_expiry_is_recorded_for_refund(self):
+        booking = self.book()
+        call_command('expire_booking_holds', stdout=StringIO())
+        self.client.login(username='late', password='pass123')
+        with mock.patch.object(gateway, 'verify_payment_signature'):
+            response = self.client.post(reverse('bookings:verify_payment'), {
+                'booking_id': booking.booking_id, 'razorpay_order_id': 'order_late',
+                'razorpay_payment_id': 'pay_late', 'razorpay_signature': 'sig',
+            })
+        self.assertRedirects(response, reverse('bookings:booking_page', args=[self.hotel.slug]), fetch_redirect_response=False)
+        booking.refresh_from_db()
+        self.assertEqual((booking.status, booking.payment_status), ('cancelled', 'paid'))
+        self.assertIn('refund due', Payment.objects.get(booking=booking).remarks)
+
+
+class BookedNightAnalyticsTests(BookingFixtureTestCase):
+    """Confirmed bookings are counted night by night and reversed when cancelled"""
+
+    hotel_name = "Fact Inn"
+    total_rooms = 4
+    days_ahead = 30
+
+    def facts(self):
+        return BookedNight.objects.aggregate(rooms=Sum('rooms'), revenue=Sum('revenue'))
+
+    def test_confirmation_records_and_cancellation_reverses(self):
+        booking = self.book(nights=3, rooms=2)
+        self.assertEqual(BookedNight.objects.filter(booking=booking).count(), 3)
+        self.assertEqual(self.facts(), {'rooms': 6, 'revenue': Decimal('12000.00')})
+
+        booking.save()  # saving again does not count the nights twice
+        self.assertEqual(BookedNight.objects.count(), 3)
+
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertEqual(BookedNight.objects.count(), 6)
+        self.assertEqual(self.facts(), {'rooms': 0, 'revenue': Decimal('0.00')})
+
+    def test_bulk_paths_sync_facts(self):
+        online = self.book(nights=2, payment_method='razorpay')
+        self.assertFalse(BookedNight.objects.exists())
+        Booking.objects.filter(pk=online.pk).update(status='confirmed')
+        call_command('backfill_booked_nights', stdout=StringIO())
+        self.assertEqual(self.facts()['rooms'], 2)
+
+        admin = BookingAdmin(Booking, AdminSite())
+        with mock.patch.object(admin, 'message_user'):
+            admin.mark_as_cancelled(None, Booking.objects.filter(pk=online.pk))
+            self.assertEqual(self.facts()['rooms'], 0)
+            admin.mark_as_confirmed(None, Booking.objects.filter(pk=online.pk))
+        self.assertEqual(self.facts()['rooms'], 2)
+
+    def test_performance_metrics(self):
+        self.book(nights=2, rooms=2)  # 2 rooms x 2 nights at 2000
+        other = RoomType.objects.create(hotel=self.hotel, name="Suite", price_per_night=5000, total_rooms=1)
+        create_booking(
+            hotel=self.hotel, room_type=other, check_in=self.check_in,
+            check_out=self.check_in + timedelta(days=1), guest={'full_name': 'Suite'},
+        )
+        with self.assertNumQueries(3):
+            report = analytics.performance(self.check_in, self.check_in + timedelta(days=3), hotel_ids=[self.hotel.pk])
+
+        first, second, third = report.days[:3]
+        self.assertEqual((first['rooms_sold'], first['rooms_available']), (3, 5))
+        self.assertEqual((first['occupancy'], first['adr'], first['revpar']), (60.0, 3000.0, 1800.0))
+        self.assertEqual((second['rooms_sold'], second['adr']), (2, 2000.0))
+        self.assertEqual((third['rooms_sold'], third['occupancy'], third['adr']), (0, 0.0, 0.0))
+        self.assertEqual(report.totals, {
+            'rooms_sold': 5, 'rooms_available': 20, 'revenue': 13000.0,
+            'occupancy': 25.0, 'adr': 2600.0, 'revpar': 650.0,
+        })
+        self.assertEqual(
+            [(row['room_type'], row['rooms_sold'], row['occupancy']) for row in report.room_types],
+            [('Deluxe', 4, 25.0), ('Suite', 1, 25.0)],
+        )
+
+
+@override_settings(PAYMENT_WORKER=False)
+class DailyBookingStatsTests(BookingFixtureTestCase):
+    """Dashboard rollups follow bookings and match a full rebuild"""
+
+    hotel_name = "Rollup Inn"
+    total_rooms = 5
+    days_ahead = 15
+
+    def book(self, payment_method='payathotel'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return super().book(guest={'full_name': 'Summed'}, payment_method=payment_method)
+
+    def today(self):
+        return DailyBookingStats.objects.get(hotel=self.hotel, date=timezone.localdate())
+
+    def rows(self):
+        return list(DailyBookingStats.objects.order_by('hotel', 'date').values('hotel', 'date', *rollups.STAT_FIELDS))
+
+    def test_saves_and_admin_actions_refresh_the_day(self):
+        at_hotel = self.book()
+        online = self.book(payment_method='razorpay')
+        stats = self.today()
+        self.assertEqual(
+            (stats.created, stats.confirmed, stats.cancelled, stats.pay_at_hotel, stats.online),
+            (2, 1, 0, 1, 1),
+        )
+        self.assertEqual(stats.revenue, at_hotel.total_amount)
+
+        admin = BookingAdmin(Booking, AdminSite())
+        with mock.patch.object(admin, 'message_user'), self.captureOnCommitCallbacks(execute=True):
+            admin.mark_as_cancelled(None, Booking.objects.filter(pk=at_hotel.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            online.status = 'confirmed'
+            online.save()
+        stats = self.today()
+        self.assertEqual((stats.created, stats.confirmed, stats.cancelled), (2, 1, 1))
+        self.assertEqual(stats.revenue, online.total_amount)
+
+        incremental = self.rows()
+        DailyBookingStats.objects.all().delete()
+        call_command('rebuild_booking_rollups', stdout=StringIO())
+        self.assertEqual(self.rows(), incremental)
+
+    def test_refresh_costs_the_same_for_many_bookings(self):
+        booking_ids = [self.book().pk for _ in range(4)]
+        DailyBookingStats.objects.all().delete()
+        # Buckets, one GROUP BY and one upsert
+        with self.assertNumQueries(3):
+            rollups.refresh_bookings(booking_ids)
+        self.assertEqual(self.today().created, 4)
@@ -0,0 +1,35 @@
+"""
+Request throttling for public endpoints
+
+Fixed-window counters in the Django cache, keyed by scope, client (the user,
+else the remote address) and window. With a shared cache (Redis, Memcached)
+a limit holds across workers; with the per-process LocMemCache it applies
+per worker, which still bounds how fast one client can probe.
+
+File Location: bookings/throttle.py
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+def client_key(request):
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def allow(request, scope, limit, window=60, cost=1):
+    """Count ``cost`` against the client's budget; False once ``limit`` is exceeded in this window"""
+    if cost <= 0:
+        return True
+    key = f"throttle:{scope}:{client_key(request)}:{int(time.time() // window)}"
+    cache.add(key, 0, window)
+    try:
+        count = cache.incr(key, cost)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, cost, window)
+        count = cost
+    return count <= limit
@@ -11,8 +11,15 @@ urlpatterns = [
     path("hotel/<slug:hotel_slug>/", views.booking_page, name="booking_page"),
     # Process booking submissions
     path("process/", views.process_booking, name="process"),
+    # Batch stay quotes (JSON) for search results and live booking totals
+    path("quotes/", views.quote_batch, name="quotes"),
+    # Razorpay checkout once the outbox worker has created the order
+    path("checkout/<str:booking_id>/", views.checkout, name="checkout"),
+    path("checkout/<str:booking_id>/status/", views.checkout_status, name="checkout_status"),
     # Razorpay verification callback
     path("verify-payment/", views.verify_razorpay_payment, name="verify_payment"),
+    # Server-to-server payment events from Razorpay
+    path("webhooks/razorpay/", views.razorpay_webhook, name="razorpay_webhook"),
     # Confirmation page showing booking summary
     path("confirmation/<str:booking_id>/", views.booking_confirmation, name="confirmation"),
     # Authenticated user's booking history
@@ -1,41 +1,40 @@
 """Bookings app views"""
 
 from datetime import datetime
+import json
 import logging
-import warnings
-
-warnings.filterwarnings(
-    "ignore",
-    message=r"pkg_resources is deprecated as an API",
-    category=UserWarning,
-    module="razorpay.client",
-)
 
 import razorpay
 from django.conf import settings
 from django.contrib import messages
+from django.db import IntegrityError
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
-from .models import Booking, GuestDetail, Payment, Coupon
+from . import gateway, holds, outbox, throttle, webhooks, worker
+from .coupons import CouponRejected
+from .history import booking_history
+from .idempotency import new_submission_key, previous_submission, submission_key
+from .inventory import RoomsUnavailable
+from .models import Booking, Payment
+from .quotes import quote_hotel, quote_many, quote_room_stay
+from .services import create_booking
 from hotels.models import Hotel, RoomType
+from hotels.rates import StayNotSellable
 
 
 logger = logging.getLogger(__name__)
 
 
-def _get_razorpay_client():
-    """Return configured Razorpay client or raise ValueError"""
-    if not settings.RAZORPAY_KEY_ID or not settings.RAZORPAY_KEY_SECRET:
-        raise ValueError("Razorpay credentials are not configured")
-    return razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-
 def booking_page(request, hotel_slug, room_type_id=None):
     """Booking page for a specific hotel"""
     hotel = get_object_or_404(Hotel, slug=hotel_slug, is_active=True)
-    razorpay_enabled = bool(settings.RAZORPAY_KEY_ID and settings.RAZORPAY_KEY_SECRET)
+    # Hidden while the gateway's circuit breaker is open
+    razorpay_enabled = gateway.online_payments_available()
 
     # Determine selected room type
     room_queryset = hotel.room_types.filter(is_available=True)
@@ -66,15 +65,15 @@ def booking_page(request, hotel_slug, room_type_id=None):
         except ValueError:
             checkin_date = checkout_date = None
 
-    # Calculate pricing using hotel's base rate so edits reflect everywhere
-    nightly_rate = float(hotel.base_price)
+    # Same quote engine as process_booking and the batch quote API
     stay_nights = nights or 1
-    base_price = nightly_rate * stay_nights * rooms
-    discount = (base_price * hotel.discount_percentage) / 100 if hotel.discount_percentage else 0
-    coupon_discount = 0  # Placeholder to be updated when coupon applied
-    subtotal = base_price - discount - coupon_discount
-    taxes = subtotal * 0.12  # 12% GST
-    total = subtotal + taxes
+    quote = None
+    if room_type and checkin_date and checkout_date and checkout_date > checkin_date:
+        try:
+            quote = quote_room_stay(hotel, room_type.id, checkin_date, checkout_date, max(rooms, 1))
+        except StayNotSellable as refusal:
+            messages.warning(request, str(refusal))
+    quote = quote or quote_hotel(hotel, stay_nights, max(rooms, 1))
 
     amenities = hotel.amenities.all()
     food_info = getattr(hotel, 'food_info', None)
@@ -103,13 +102,14 @@ def booking_page(request, hotel_slug, room_type_id=None):
         'rooms': rooms,
         'nights': stay_nights,
         'pricing': {
-            'nightly_rate': nightly_rate,
-            'base_price': base_price,
-            'discount': discount,
-            'coupon_discount': coupon_discount,
-            'taxes': taxes,
-            'total': total,
+            'nightly_rate': quote.nightly_rate,
+            'base_price': quote.base_price,
+            'discount': quote.discount,
+            'coupon_discount': quote.coupon_discount,
+            'taxes': quote.taxes,
+            'total': quote.total,
         },
+        'quote_url': reverse('bookings:quotes'),
         'booking_summary': {
             'nights': stay_nights,
             'rooms': rooms,
@@ -119,7 +119,9 @@ def booking_page(request, hotel_slug, room_type_id=None):
         'food_info': food_info or default_food,
         'rules_info': rules_info or default_rules,
         'booking_form_action': reverse('bookings:process'),
+        'idempotency_key': new_submission_key(),
         'razorpay_enabled': razorpay_enabled,
+        'razorpay_configured': gateway.gateway_configured(),
         'login_url': reverse('users:login'),
         'signup_url': reverse('users:signup'),
     }
@@ -160,6 +162,9 @@ def process_booking(request):
         # Coupon
         coupon_code = request.POST.get('coupon_code', '').strip()
 
+        # Identifies this rendering of the form across resubmits
+        idempotency_key = submission_key(request.POST.get('idempotency_key'))
+
         try:
             hotel = Hotel.objects.get(id=hotel_id)
             room_type = RoomType.objects.get(id=room_type_id)
@@ -181,123 +186,64 @@ def process_booking(request):
                 messages.error(request, 'Invalid check-in or check-out date. Please re-enter your stay details.')
                 return redirect(booking_page_with_room)
 
-            nights = max((checkout_date - checkin_date).days, 1)
-
-            # Calculate pricing based on hotel's base rate to keep consistency with listings
-            nightly_rate = float(hotel.base_price)
-            base_price = nightly_rate * nights * rooms_count
-            discount_rate = float(hotel.discount_percentage or 0)
-            discount_amount = (base_price * discount_rate) / 100 if discount_rate else 0
-
-            coupon_discount = 0
-            if coupon_code:
-                try:
-                    coupon = Coupon.objects.get(code=coupon_code.upper())
-                    if coupon.is_valid():
-                        if coupon.discount_type == 'percentage':
-                            coupon_discount = (base_price * coupon.discount_value) / 100
-                            if coupon.max_discount:
-                                coupon_discount = min(coupon_discount, float(coupon.max_discount))
-                        else:
-                            coupon_discount = float(coupon.discount_value)
-                        coupon.used_count += 1
-                        coupon.save()
-                except Coupon.DoesNotExist:
-                    messages.warning(request, 'Coupon code is invalid or expired.')
-
-            subtotal = base_price - discount_amount - coupon_discount
-            taxes = max(subtotal * 0.12, 0)
-            total_amount = subtotal + taxes
-
             requires_online_payment = payment_method == 'razorpay'
-            if requires_online_payment and (not settings.RAZORPAY_KEY_ID or not settings.RAZORPAY_KEY_SECRET):
+            if requires_online_payment and not gateway.online_payments_available():
                 messages.error(request, 'Online payments are temporarily unavailable. Please choose Pay at Hotel.')
                 return redirect(booking_page_with_room)
 
-            booking = Booking.objects.create(
-                user=request.user if request.user.is_authenticated else None,
-                hotel=hotel,
-                room_type=room_type,
-                check_in=checkin_date,
-                check_out=checkout_date,
-                nights=nights,
-                num_adults=adults_count,
-                num_children=children_count,
-                num_rooms=rooms_count,
-                base_price=base_price,
-                discount_amount=discount_amount,
-                taxes=taxes,
-                total_amount=total_amount,
-                coupon_code=coupon_code,
-                coupon_discount=coupon_discount,
-                special_requests=special_requests,
-                status='confirmed' if payment_method == 'payathotel' else 'pending',
-                payment_status='pending'
-            )
-
-            GuestDetail.objects.create(
-                booking=booking,
-                title=title,
-                full_name=full_name,
-                email=email,
-                phone=phone,
-                id_type=id_type,
-                id_number=id_number
-            )
-
-            payment = Payment.objects.create(
-                booking=booking,
-                payment_method=payment_method,
-                amount=total_amount,
-                is_successful=False
-            )
+            booking_details = {
+                'hotel': hotel,
+                'room_type': room_type,
+                'check_in': checkin_date,
+                'check_out': checkout_date,
+                'guest': {
+                    'title': title,
+                    'full_name': full_name,
+                    'email': email,
+                    'phone': phone,
+                    'id_type': id_type,
+                    'id_number': id_number,
+                },
+                'payment_method': payment_method,
+                'rooms': rooms_count,
+                'adults': adults_count,
+                'children': children_count,
+                'special_requests': special_requests,
+                'user': request.user if request.user.is_authenticated else None,
+                'idempotency_key': idempotency_key,
+            }
+            # A repeated submission of the same form replays the first outcome
+            previous_booking_id = previous_submission(request.user, idempotency_key)
+            if previous_booking_id:
+                return _replay_submission(request, previous_booking_id, booking_page_with_room)
+
+            # Rooms, coupon use, booking, guest and payment commit together or not at all
+            try:
+                try:
+                    booking = create_booking(coupon_code=coupon_code, **booking_details)
+                except CouponRejected as rejection:
+                    messages.warning(request, str(rejection))
+                    booking = create_booking(**booking_details)
+            except IntegrityError:
+                # A concurrent copy of this submission committed first
+                previous_booking_id = previous_submission(request.user, idempotency_key)
+                if not previous_booking_id:
+                    raise
+                return _replay_submission(request, previous_booking_id, booking_page_with_room)
+            except RoomsUnavailable:
+                messages.error(request, f'Sorry, {room_type.name} is sold out for the selected dates. Please try other dates or another room.')
+                return redirect(booking_page_with_room)
+            except (ValueError, StayNotSellable) as failure:
+                # Nothing was written, so the same form may be sent again
+                messages.error(request, str(failure))
+                return redirect(booking_page_with_room)
 
             if payment_method == 'payathotel':
                 messages.success(request, f'Booking confirmed! Your booking ID is {booking.booking_id}. Please pay at the hotel.')
                 return redirect('bookings:confirmation', booking_id=booking.booking_id)
 
-            try:
-                client = _get_razorpay_client()
-                amount_paise = int(float(total_amount) * 100)
-                order = client.order.create(data={
-                    'amount': amount_paise,
-                    'currency': settings.RAZORPAY_DEFAULT_CURRENCY,
-                    'receipt': booking.booking_id,
-                    'notes': {
-                        'hotel': hotel.name,
-                        'guest': full_name,
-                        'booking_id': booking.booking_id,
-                    },
-                })
-                payment.gateway_order_id = order.get('id', '')
-                payment.save(update_fields=['gateway_order_id'])
-
-                context = {
-                    'booking': booking,
-                    'hotel': hotel,
-                    'order_id': order.get('id'),
-                    'razorpay_key_id': settings.RAZORPAY_KEY_ID,
-                    'amount_paise': amount_paise,
-                    'display_amount': total_amount,
-                    'currency': settings.RAZORPAY_DEFAULT_CURRENCY,
-                    'verify_url': reverse('bookings:verify_payment'),
-                    'guest': {
-                        'name': full_name,
-                        'email': email,
-                        'phone': phone,
-                    },
-                    'cancel_url': booking_page_with_room,
-                }
-                return render(request, 'bookings/razorpay_checkout.html', context)
-            except Exception as exc:
-                booking.status = 'cancelled'
-                booking.payment_status = 'failed'
-                booking.save(update_fields=['status', 'payment_status'])
-                payment.remarks = f'Razorpay order creation failed: {exc}'
-                payment.save(update_fields=['remarks'])
-                logger.exception("Razorpay order creation failed for booking %s", booking.booking_id)
-                messages.error(request, 'Unable to initiate online payment. Please try again or choose Pay at Hotel.')
-                return redirect(booking_page_with_room)
+            # The gateway order is created by the outbox worker; the checkout page waits for it
+            return redirect('bookings:checkout', booking_id=booking.booking_id)
 
         except Exception as e:
             logger.exception("Booking processing failed. POST data: %s", request.POST.dict())
@@ -307,6 +253,91 @@ def process_booking(request):
     return redirect('hotels:search')
 
 
+def _render_razorpay_checkout(request, booking, cancel_url):
+    """Checkout page for a booking whose Razorpay order already exists"""
+    guest = booking.guest_detail
+    context = {
+        'booking': booking,
+        'hotel': booking.hotel,
+        'order_id': booking.payment.gateway_order_id,
+        'razorpay_key_id': settings.RAZORPAY_KEY_ID,
+        'amount_paise': int(booking.total_amount * 100),
+        'display_amount': booking.total_amount,
+        'currency': settings.RAZORPAY_DEFAULT_CURRENCY,
+        'verify_url': reverse('bookings:verify_payment'),
+        'guest': {
+            'name': guest.full_name,
+            'email': guest.email,
+            'phone': guest.phone,
+        },
+        'cancel_url': cancel_url,
+    }
+    return render(request, 'bookings/razorpay_checkout.html', context)
+
+
+def _replay_submission(request, booking_id, booking_page_url):
+    """Answer a resubmitted booking form with what the first submission produced"""
+    booking = (
+        Booking.objects.select_related('hotel', 'payment', 'guest_detail')
+        .filter(booking_id=booking_id, user=request.user)
+        .first()
+    )
+    if booking is None:
+        return redirect(booking_page_url)
+    payment = booking.payment
+    if booking.status == 'cancelled':
+        messages.error(request, 'Unable to initiate online payment. Please try again or choose Pay at Hotel.')
+        return redirect(booking_page_url)
+    if payment.payment_method == 'razorpay' and not payment.is_successful:
+        return redirect('bookings:checkout', booking_id=booking.booking_id)
+    return redirect('bookings:confirmation', booking_id=booking.booking_id)
+
+
+def _checkout_booking(request, booking_id):
+    return get_object_or_404(
+        Booking.objects.select_related('hotel', 'payment', 'guest_detail'),
+        booking_id=booking_id,
+        user=request.user,
+        payment__payment_method='razorpay',
+    )
+
+
+@login_required(login_url='users:login')
+def checkout(request, booking_id):
+    """Razorpay checkout, or a holding page that polls until the order is ready"""
+    booking = _checkout_booking(request, booking_id)
+    booking_page_url = reverse('bookings:booking_page', kwargs={'hotel_slug': booking.hotel.slug})
+    booking_page_with_room = f"{booking_page_url}?room={booking.room_type_id}"
+    if booking.payment.is_successful:
+        return redirect('bookings:confirmation', booking_id=booking.booking_id)
+
+    state = outbox.order_state(booking.payment)
+    if state == 'failed':
+        messages.error(request, 'Unable to initiate online payment. Please try again or choose Pay at Hotel.')
+        return redirect(booking_page_with_room)
+    if state == 'ready':
+        return _render_razorpay_checkout(request, booking, booking_page_with_room)
+    return render(request, 'bookings/checkout_pending.html', {
+        'booking': booking,
+        'hotel': booking.hotel,
+        'hold_expires_at': holds.hold_expires_at(booking),
+        'status_url': reverse('bookings:checkout_status', kwargs={'booking_id': booking.booking_id}),
+        'checkout_url': request.path,
+        'cancel_url': booking_page_with_room,
+    })
+
+
+@login_required(login_url='users:login')
+def checkout_status(request, booking_id):
+    """JSON order state polled by the holding page: pending, ready or failed"""
+    booking = _checkout_booking(request, booking_id)
+    state = outbox.order_state(booking.payment)
+    if state == 'pending':
+        # Cheap, and revives a worker this process has not started yet
+        worker.kick()
+    return JsonResponse({'state': state})
+
+
 @require_POST
 def verify_razorpay_payment(request):
     """Verify Razorpay payment signature and finalize booking"""
@@ -326,12 +357,7 @@ def verify_razorpay_payment(request):
         return redirect('bookings:booking_page', hotel_slug=booking.hotel.slug)
 
     try:
-        client = _get_razorpay_client()
-        client.utility.verify_payment_signature({
-            'razorpay_order_id': order_id,
-            'razorpay_payment_id': payment_id,
-            'razorpay_signature': signature,
-        })
+        gateway.verify_payment_signature(order_id, payment_id, signature)
     except razorpay.errors.SignatureVerificationError:
         payment.gateway_order_id = order_id
         payment.gateway_payment_id = payment_id
@@ -342,7 +368,7 @@ def verify_razorpay_payment(request):
         booking.save(update_fields=['payment_status'])
         messages.error(request, 'Payment verification failed. No amount was captured.')
         return redirect('bookings:booking_page', hotel_slug=booking.hotel.slug)
-    except ValueError:
+    except gateway.GatewayUnavailable:
         messages.error(request, 'Online payments are unavailable. Please try again later.')
         return redirect('bookings:booking_page', hotel_slug=booking.hotel.slug)
 
@@ -352,6 +378,10 @@ def verify_razorpay_payment(request):
     payment.gateway_signature = signature
     payment.is_successful = True
     payment.payment_date = timezone.now()
+    # The hold may have lapsed (bookings/holds.py) while the guest was paying
+    hold_lapsed = booking.status == 'cancelled'
+    if hold_lapsed:
+        payment.remarks = 'Captured after the booking was cancelled; refund due'
     payment.save(update_fields=[
         'transaction_id',
         'gateway_order_id',
@@ -359,9 +389,14 @@ def verify_razorpay_payment(request):
         'gateway_signature',
         'is_successful',
         'payment_date',
+        'remarks',
     ])
 
     booking.payment_status = 'paid'
+    if hold_lapsed:
+        booking.save(update_fields=['payment_status'])
+        messages.error(request, 'Your booking hold expired before the payment completed. The amount will be refunded.')
+        return redirect('bookings:booking_page', hotel_slug=booking.hotel.slug)
     booking.status = 'confirmed'
     booking.save(update_fields=['payment_status', 'status'])
 
@@ -369,6 +404,20 @@ def verify_razorpay_payment(request):
     return redirect('bookings:confirmation', booking_id=booking.booking_id)
 
 
+@csrf_exempt  # authenticated by the webhook signature instead
+@require_POST
+def razorpay_webhook(request):
+    """Record a Razorpay event for the payment worker; answers before applying it"""
+    if not gateway.verify_webhook_signature(request.body, request.headers.get('X-Razorpay-Signature', '')):
+        return JsonResponse({'error': 'Invalid signature'}, status=400)
+    try:
+        event = webhooks.parse_event(request.body, request.headers.get('X-Razorpay-Event-Id', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Expected a JSON event'}, status=400)
+    webhooks.record_event(event)
+    return JsonResponse({'status': 'ok'})
+
+
 def booking_confirmation(request, booking_id):
     """Booking confirmation page"""
     booking = get_object_or_404(Booking, booking_id=booking_id)
@@ -385,11 +434,40 @@ def my_bookings(request):
     if not request.user.is_authenticated:
         return redirect('users:login')
     
-    bookings = Booking.objects.filter(user=request.user)
+    history = booking_history(request.user)
     
     context = {
-        'bookings': bookings,
+        'bookings': history.bookings,
+        'history': history,
     }
     
     return render(request, 'bookings/my_bookings.html', context)
 
+
+
+MAX_QUOTE_BATCH = 50
+
+
+@csrf_exempt  # read-only: quotes never redeem coupons or hold rooms
+@require_POST
+def quote_batch(request):
+    """Price many stays in one call (JSON in, JSON out)"""
+    try:
+        payload = json.loads(request.body or b'{}')
+        items = payload['quotes']
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected {"quotes": [{...}, ...]}'}, status=400)
+    if len(items) > MAX_QUOTE_BATCH:
+        return JsonResponse({'error': f'At most {MAX_QUOTE_BATCH} quotes per request'}, status=400)
+    # Coupon previews need a signed-in guest and have their own, smaller
+    # budget, so codes cannot be enumerated through this endpoint
+    coupons = request.user.is_authenticated
+    coupon_lookups = sum(1 for item in items if item.get('coupon')) if coupons else 0
+    if not (
+        throttle.allow(request, 'quotes', settings.QUOTE_RATE_LIMIT)
+        and throttle.allow(request, 'quote-coupons', settings.QUOTE_COUPON_RATE_LIMIT, cost=coupon_lookups)
+    ):
+        return JsonResponse({'error': 'Too many quote requests; please wait a minute.'}, status=429)
+    return JsonResponse({'quotes': quote_many(items, coupons=coupons)})
@@ -0,0 +1,155 @@
+"""
+Razorpay webhook events
+
+The browser callback (``verify_razorpay_payment``) is no longer the only way
+a payment is finalised: Razorpay also posts ``payment.captured``,
+``order.paid`` and ``payment.failed`` events to ``bookings:razorpay_webhook``.
+
+* the endpoint checks the signature and records the event with a single
+  INSERT OR IGNORE keyed on the gateway's event id, then answers at once;
+  redeliveries of the same event are no-ops
+* ``apply_events`` (run by the payment worker and
+  ``manage.py process_payment_events``) takes unprocessed events in arrival
+  order, ``BATCH_SIZE`` at a time, and applies them with one payment lookup
+  and one bulk_update each for payments, bookings and events per batch
+* applying an event is idempotent (a captured payment stays captured), so a
+  batch seen by two workers does no harm; where the database supports it the
+  batch is locked with SKIP LOCKED so they do not overlap at all
+
+Bulk updates skip post_save, so changed bookings are passed to
+``analytics.sync_bookings`` to count their nights and to
+``rollups.schedule_bookings`` for the dashboard.
+
+File Location: bookings/webhooks.py
+"""
+
+import hashlib
+import json
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import rollups, worker
+from .analytics import sync_bookings
+from .models import Booking, Payment, PaymentEvent
+
+
+CAPTURE_EVENTS = {'payment.captured', 'order.paid'}
+FAILURE_EVENTS = {'payment.failed'}
+BATCH_SIZE = 200
+PAYMENT_FIELDS = ['transaction_id', 'gateway_payment_id', 'is_successful', 'payment_date', 'remarks']
+
+
+def _entity(payload, name):
+    entity = (payload.get(name) or {}).get('entity') if isinstance(payload, dict) else None
+    return entity if isinstance(entity, dict) else {}
+
+
+def parse_event(body, event_id=''):
+    """
+    Unsaved PaymentEvent for a webhook ``body`` (bytes). Deliveries without an
+    event id header are keyed on a hash of the body. Raises ValueError for a
+    body that is not a JSON object.
+    """
+    data = json.loads(body)
+    if not isinstance(data, dict):
+        raise ValueError("Webhook body is not a JSON object")
+    payment = _entity(data.get('payload'), 'payment')
+    order = _entity(data.get('payload'), 'order')
+    return PaymentEvent(
+        event_id=(event_id or hashlib.sha256(body).hexdigest())[:100],
+        event=str(data.get('event', ''))[:50],
+        order_id=str(payment.get('order_id') or order.get('id') or '')[:100],
+        payment_id=str(payment.get('id') or '')[:100],
+        payload=data,
+    )
+
+
+def record_event(event):
+    """Store ``event`` unless its event id has been seen before; one statement either way"""
+    PaymentEvent.objects.bulk_create([event], ignore_conflicts=True)
+    transaction.on_commit(worker.kick)
+
+
+def _apply_capture(payment, event, now):
+    if payment.is_successful:
+        # Already finalised by the browser callback or an earlier event
+        return 'ignored'
+    payment_id = event.payment_id or payment.gateway_payment_id
+    payment.transaction_id = payment_id
+    payment.gateway_payment_id = payment_id
+    payment.is_successful = True
+    payment.payment_date = now
+    booking = payment.booking
+    booking.payment_status = 'paid'
+    if booking.status == 'pending':
+        booking.status = 'confirmed'
+    elif booking.status == 'cancelled':
+        payment.remarks = 'Captured after the booking was cancelled; refund due'
+    return 'applied'
+
+
+def _apply_failure(payment, event):
+    if payment.is_successful or payment.booking.payment_status != 'pending':
+        return 'ignored'
+    reason = _entity(event.payload.get('payload'), 'payment').get('error_description') or ''
+    payment.remarks = f'Payment failed: {reason}'.strip().rstrip(':')
+    payment.booking.payment_status = 'failed'
+    return 'applied'
+
+
+def _pending_batch(size):
+    events = PaymentEvent.objects.filter(processed_at__isnull=True).order_by('id')
+    if connection.features.has_select_for_update_skip_locked:
+        events = events.select_for_update(skip_locked=True)
+    return list(events[:size])
+
+
+@worker.register
+def apply_events(limit=None):
+    """
+    Apply unprocessed events in batches until none are left (or ``limit``
+    have been applied); returns ``{'applied': n, 'ignored': n, 'unmatched': n}``
+    """
+    outcome = {'applied': 0, 'ignored': 0, 'unmatched': 0}
+    seen = 0
+    while limit is None or seen < limit:
+        size = BATCH_SIZE if limit is None else min(BATCH_SIZE, limit - seen)
+        with transaction.atomic():
+            events = _pending_batch(size)
+            if not events:
+                break
+            order_ids = {event.order_id for event in events if event.order_id}
+            payments = {
+                payment.gateway_order_id: payment
+                for payment in Payment.objects.select_related('booking').filter(gateway_order_id__in=order_ids)
+            }
+            now = timezone.now()
+            touched = {}
+            for event in events:
+                payment = payments.get(event.order_id)
+                if payment is None:
+                    event.outcome = 'unmatched'
+                elif event.event in CAPTURE_EVENTS:
+                    event.outcome = _apply_capture(payment, event, now)
+                elif event.event in FAILURE_EVENTS:
+                    event.outcome = _apply_failure(payment, event)
+                else:
+                    event.outcome = 'ignored'
+                if event.outcome == 'applied':
+                    touched[payment.pk] = payment
+                event.processed_at = now
+                outcome[event.outcome] += 1
+
+            if touched:
+                Payment.objects.bulk_update(touched.values(), PAYMENT_FIELDS)
+                Booking.objects.bulk_update(
+                    [payment.booking for payment in touched.values()], ['status', 'payment_status']
+                )
+                sync_bookings(payment.booking_id for payment in touched.values())
+                rollups.schedule_bookings(payment.booking_id for payment in touched.values())
+            PaymentEvent.objects.bulk_update(events, ['processed_at', 'outcome'])
+        seen += len(events)
+        if len(events) < size:
+            break
+    return outcome
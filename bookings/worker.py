@@ -0,0 +1,69 @@
+"""
+In-process payment worker
+
+One daemon thread per process runs every registered queue drain (the payment
+outbox, the webhook event log) whenever ``kick()`` is called, typically from
+``transaction.on_commit`` after a row is queued, and otherwise every
+``IDLE_SECONDS`` so entries waiting on a backoff are picked up too. The
+queues claim their own rows, so several processes (and the management
+commands) can drain at once.
+
+``PAYMENT_WORKER = False`` turns the thread off where the queues are drained
+by ``process_payment_outbox --loop`` / ``process_payment_events --loop``.
+
+File Location: bookings/worker.py
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+IDLE_SECONDS = 30
+
+_lock = threading.Lock()
+_state = {'thread': None}
+_drains = []
+_wake = threading.Event()
+
+
+def register(drain):
+    """Have the worker call ``drain()`` on every pass; usable as a decorator"""
+    if drain not in _drains:
+        _drains.append(drain)
+    return drain
+
+
+def run_once():
+    for drain in list(_drains):
+        try:
+            drain()
+        except Exception:
+            logger.exception("Payment worker: %s failed", drain.__qualname__)
+
+
+def _run():
+    while True:
+        _wake.wait(IDLE_SECONDS)
+        _wake.clear()
+        try:
+            run_once()
+        finally:
+            close_old_connections()
+
+
+def kick():
+    """Wake this process's worker, starting it on first use"""
+    if not getattr(settings, 'PAYMENT_WORKER', True):
+        return
+    with _lock:
+        thread = _state['thread']
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=_run, name='payment-worker', daemon=True)
+            _state['thread'] = thread
+            thread.start()
+    _wake.set()
@@ -7,6 +7,7 @@ File Location: core/admin.py
 from django.contrib import admin
 
 from .models import ContactMessage, Destination, DestinationImage
+from .search import filter_destinations
 
 
 class DestinationImageInline(admin.TabularInline):
@@ -44,6 +45,12 @@ class DestinationAdmin(admin.ModelAdmin):
     list_editable = ['is_featured']
     inlines = [DestinationImageInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        """Use the full-text index instead of LIKE scans over description"""
+        if not search_term:
+            return queryset, False
+        return filter_destinations(queryset, search_term, ranked=False), False
+
 
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
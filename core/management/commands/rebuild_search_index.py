@@ -0,0 +1,16 @@
+"""Repopulate the hotel/destination keyword search index"""
+
+from django.core.management.base import BaseCommand
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the site_search_fts full-text index from hotels and destinations"
+
+    def handle(self, *args, **options):
+        if not search.fts_enabled():
+            self.stdout.write(self.style.WARNING("Full-text index not available on this database; nothing to do."))
+            return
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} hotel(s) and destination(s)."))
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.16 on 2026-10-17 02:10
+
+from django.db import migrations
+
+# Hotels are stored at rowid id*2, destinations at id*2+1 (see core/search.py)
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE site_search_fts USING fts5(
+        name, description, address, landmark, city,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    INSERT INTO site_search_fts(rowid, name, description, address, landmark, city)
+    SELECT id * 2, name, description, address, landmark, city FROM hotels_hotel
+    """,
+    """
+    INSERT INTO site_search_fts(rowid, name, description, address, landmark, city)
+    SELECT id * 2 + 1, name, description, '', '', '' FROM core_destination
+    """,
+]
+
+DROP_SQL = [
+    "DROP TABLE IF EXISTS site_search_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite-only; other backends use the icontains fallback in core/search.py
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_destination_highlight_points_destinationimage'),
+        ('hotels', '0006_amenity_bitmask'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
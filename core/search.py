@@ -0,0 +1,194 @@
+"""
+Keyword search over hotels and destinations
+
+Backed by the ``site_search_fts`` SQLite FTS5 table (see
+core/migrations/0003_site_search_fts.py), kept current by the save/delete
+signals in core/signals.py. Signals are used rather than SQL triggers because
+SQLite table rebuilds during migrations silently drop triggers. Rows are keyed
+by rowid so each write touches exactly one index row: hotels use ``id * 2``
+and destinations ``id * 2 + 1``. Results are ranked with bm25, weighting the
+name highest. ``filter_queryset`` joins the table into the caller's query,
+so matching and bm25 ordering happen in SQL however many rows match.
+``manage.py rebuild_search_index`` repopulates the table.
+
+On databases without the FTS table (e.g. PostgreSQL) every helper falls back
+to ``icontains`` filters so callers never need to care.
+
+File Location: core/search.py
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from hotels.models import Hotel
+
+from .models import Destination
+
+FTS_TABLE = "site_search_fts"
+KIND_HOTEL = 0
+KIND_DESTINATION = 1
+
+# bm25 column weights: name, description, address, landmark, city
+BM25_WEIGHTS = (10.0, 1.0, 3.0, 3.0, 3.0)
+
+INDEXED_FIELDS = {
+    KIND_HOTEL: ("name", "description", "address", "landmark", "city"),
+    KIND_DESTINATION: ("name", "description"),
+}
+FALLBACK_FIELDS = {
+    KIND_HOTEL: ("name", "description", "address", "landmark", "city"),
+    KIND_DESTINATION: ("name", "description"),
+}
+
+_fts_enabled = None
+
+
+def fts_enabled():
+    """True when the FTS5 index exists on the default database"""
+    global _fts_enabled
+    if _fts_enabled is None:
+        _fts_enabled = (
+            connection.vendor == "sqlite"
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_enabled
+
+
+def _rowid(kind, pk):
+    return pk * 2 + kind
+
+
+def index_object(kind, obj):
+    """Insert or refresh one hotel/destination in the index"""
+    if not fts_enabled():
+        return
+    values = [getattr(obj, field) or "" for field in INDEXED_FIELDS[kind]]
+    values += [""] * (len(BM25_WEIGHTS) - len(values))
+    rowid = _rowid(kind, obj.pk)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [rowid])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, name, description, address, landmark, city) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [rowid, *values],
+        )
+
+
+def unindex_object(kind, pk):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [_rowid(kind, pk)])
+
+
+def rebuild_index():
+    """Repopulate the whole index from the hotel and destination tables"""
+    if not fts_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, name, description, address, landmark, city) "
+            f"SELECT id * 2, name, description, address, landmark, city FROM {Hotel._meta.db_table}"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, name, description, address, landmark, city) "
+            f"SELECT id * 2 + 1, name, description, '', '', '' FROM {Destination._meta.db_table}"
+        )
+        cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def build_match_query(text):
+    """
+    Turn free text into a safe FTS5 MATCH expression: every word must match,
+    as a prefix, so "gomti gh" finds "Gomti Ghat". Returns None for no words.
+    """
+    tokens = re.findall(r"\w+", text or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _bm25():
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+    return f"bm25({FTS_TABLE}, {weights})"
+
+
+def ranked_ids(text, kind, limit=None):
+    """Object ids matching ``text`` for one kind, best bm25 match first"""
+    match = build_match_query(text)
+    if match is None:
+        return []
+    sql = (
+        f"SELECT rowid FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s AND rowid %% 2 = %s "
+        f"ORDER BY {_bm25()}"
+    )
+    params = [match, kind]
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [rowid // 2 for (rowid,) in cursor.fetchall()]
+
+
+def _fallback_filter(queryset, text, kind):
+    condition = Q()
+    for field in FALLBACK_FIELDS[kind]:
+        condition |= Q(**{f"{field}__icontains": text})
+    return queryset.filter(condition)
+
+
+def filter_queryset(queryset, text, kind, ranked=True):
+    """
+    Restrict ``queryset`` to rows matching ``text``. With ``ranked`` the
+    result is ordered by relevance; otherwise the queryset keeps its ordering.
+    """
+    if not fts_enabled():
+        return _fallback_filter(queryset, text, kind)
+    match = build_match_query(text)
+    if match is None:
+        return queryset.none()
+    meta = queryset.model._meta
+    # Driven by the MATCH, then one primary-key lookup per hit
+    queryset = queryset.extra(
+        tables=[FTS_TABLE],
+        where=[
+            f"{FTS_TABLE} MATCH %s",
+            f"{FTS_TABLE}.rowid %% 2 = %s",
+            f"{meta.db_table}.{meta.pk.column} = {FTS_TABLE}.rowid / 2",
+        ],
+        params=[match, kind],
+    )
+    if ranked:
+        queryset = queryset.extra(select={"search_rank": _bm25()}, order_by=["search_rank"])
+    return queryset
+
+
+def filter_hotels(queryset, text, ranked=True):
+    return filter_queryset(queryset, text, KIND_HOTEL, ranked)
+
+
+def filter_destinations(queryset, text, ranked=True):
+    return filter_queryset(queryset, text, KIND_DESTINATION, ranked)
+
+
+def search_site(text, limit=10):
+    """Top hotels and destinations for a public keyword search"""
+    if not fts_enabled():
+        hotels = _fallback_filter(Hotel.objects.filter(is_active=True), text, KIND_HOTEL)[:limit]
+        destinations = _fallback_filter(Destination.objects.all(), text, KIND_DESTINATION)[:limit]
+        return list(hotels), list(destinations)
+
+    hotel_ids = ranked_ids(text, KIND_HOTEL, limit * 2)
+    destination_ids = ranked_ids(text, KIND_DESTINATION, limit)
+    hotels = Hotel.objects.filter(pk__in=hotel_ids, is_active=True).in_bulk()
+    destinations = Destination.objects.filter(pk__in=destination_ids).in_bulk()
+    return (
+        [hotels[pk] for pk in hotel_ids if pk in hotels][:limit],
+        [destinations[pk] for pk in destination_ids if pk in destinations],
+    )
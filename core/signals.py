@@ -0,0 +1,42 @@
+"""
+Core App Signals - keep the keyword search index current
+
+File Location: core/signals.py
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from hotels.models import Hotel
+
+from . import search
+from .models import Destination
+
+
+def _touches_index(kind, update_fields):
+    return update_fields is None or bool(set(update_fields) & set(search.INDEXED_FIELDS[kind]))
+
+
+@receiver(post_save, sender=Hotel)
+def index_hotel(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Rating/mask refreshes use update_fields and never change indexed text
+    if raw or not _touches_index(search.KIND_HOTEL, update_fields):
+        return
+    search.index_object(search.KIND_HOTEL, instance)
+
+
+@receiver(post_delete, sender=Hotel)
+def unindex_hotel(sender, instance, **kwargs):
+    search.unindex_object(search.KIND_HOTEL, instance.pk)
+
+
+@receiver(post_save, sender=Destination)
+def index_destination(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or not _touches_index(search.KIND_DESTINATION, update_fields):
+        return
+    search.index_object(search.KIND_DESTINATION, instance)
+
+
+@receiver(post_delete, sender=Destination)
+def unindex_destination(sender, instance, **kwargs):
+    search.unindex_object(search.KIND_DESTINATION, instance.pk)
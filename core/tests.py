@@ -1,3 +1,72 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from hotels.models import Hotel
+
+from . import search
+from .models import Destination
+
+
+class KeywordSearchTests(TestCase):
+    def setUp(self):
+        self.ghat = Hotel.objects.create(
+            name='Gomti Ghat Residency',
+            description='Rooms overlooking the sacred confluence',
+            address='Gomti Ghat Road',
+            landmark='Sudama Setu',
+            distance_from_temple='300m',
+            base_price=2500,
+        )
+        self.beach = Hotel.objects.create(
+            name='Beach Palace',
+            description='Sea facing rooms a short ride from Gomti Ghat',
+            address='Beach Road',
+            distance_from_temple='2 km',
+            base_price=3500,
+        )
+        self.destination = Destination.objects.create(
+            name='Sudama Setu',
+            slug='sudama-setu',
+            description='Suspension bridge across the Gomti river',
+        )
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertEqual(search.ranked_ids('confluence', search.KIND_HOTEL), [self.ghat.id])
+        self.ghat.description = 'Renovated rooms near the temple'
+        self.ghat.save()
+        self.assertEqual(search.ranked_ids('confluence', search.KIND_HOTEL), [])
+        self.beach.delete()
+        self.assertEqual(search.ranked_ids('beach', search.KIND_HOTEL), [])
+
+    def test_name_matches_rank_first(self):
+        ranked = search.filter_hotels(Hotel.objects.all(), 'gomti gh')
+        self.assertEqual([hotel.id for hotel in ranked], [self.ghat.id, self.beach.id])
+
+    def test_punctuation_only_query_matches_nothing(self):
+        self.assertFalse(search.filter_hotels(Hotel.objects.all(), '"*(').exists())
+
+    def test_public_keyword_search(self):
+        response = self.client.get(reverse('core:search'), {'q': 'sudama'})
+        kinds = [(result['kind'], result['name']) for result in response.json()['results']]
+        self.assertEqual(kinds, [('hotel', 'Gomti Ghat Residency'), ('destination', 'Sudama Setu')])
+
+    def test_master_hotel_list_uses_index(self):
+        get_user_model().objects.create_superuser('staff', 'staff@example.com', 'pass123')
+        self.client.login(username='staff', password='pass123')
+        response = self.client.get(reverse('master:hotels'), {'q': 'confluence'})
+        self.assertEqual(list(response.context['hotels']), [self.ghat])
+
+    def test_ranking_is_done_in_sql(self):
+        ranked = search.filter_hotels(Hotel.objects.all(), 'gomti')
+        sql = str(ranked.query)
+        self.assertIn('bm25(', sql)
+        self.assertNotIn('CASE', sql)
+        self.assertEqual(ranked.count(), 2)
+
+    def test_admin_search_keeps_distance_from_temple(self):
+        get_user_model().objects.create_superuser('staff', 'staff@example.com', 'pass123')
+        self.client.login(username='staff', password='pass123')
+        url = reverse('admin:hotels_hotel_changelist')
+        self.assertEqual(list(self.client.get(url, {'q': '2 km'}).context['cl'].result_list), [self.beach])
+        self.assertEqual(list(self.client.get(url, {'q': 'confluence'}).context['cl'].result_list), [self.ghat])
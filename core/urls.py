@@ -13,6 +13,8 @@ urlpatterns = [
     path("about/", views.about_dwarka, name="about"),
     # Contact form page
     path("contact/", views.contact, name="contact"),
+    # Keyword search across hotels and destinations (JSON)
+    path("search/", views.keyword_search, name="search"),
     # Destination detail page
     path("destinations/<slug:slug>/", views.destination_detail, name="destination_detail"),
 ]
\ No newline at end of file
@@ -1,11 +1,14 @@
 """Core app views - Homepage and general pages"""
 
 from django.contrib import messages
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 
 from hotels.models import Hotel
 
 from .models import ContactMessage, Destination
+from .search import search_site
 
 def index(request):
     """Homepage view"""
@@ -65,3 +68,27 @@ def destination_detail(request, slug):
     }
     return render(request, 'destinations/detail.html', context)
 
+
+def keyword_search(request):
+    """Public keyword search across hotels and destinations (JSON)"""
+    query = request.GET.get('q', '').strip()
+    hotels, destinations = search_site(query) if query else ([], [])
+
+    results = [
+        {
+            'kind': 'hotel',
+            'name': hotel.name,
+            'location': hotel.distance_from_temple,
+            'url': reverse('hotels:details', args=[hotel.slug]),
+        }
+        for hotel in hotels
+    ] + [
+        {
+            'kind': 'destination',
+            'name': destination.name,
+            'location': destination.distance_from_temple,
+            'url': reverse('core:destination_detail', args=[destination.slug]),
+        }
+        for destination in destinations
+    ]
+    return JsonResponse({'query': query, 'results': results})
@@ -85,7 +85,22 @@ WSGI_APPLICATION = 'dwarka_getaways.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',    }
+        'NAME': BASE_DIR / 'db.sqlite3',
+        # Wait for the single SQLite writer instead of failing immediately
+        'OPTIONS': {'timeout': 20},
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Per-process memory cache; point this at Redis/Memcached when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dwarka-getaways',
+    }
 }
 
 
@@ -166,3 +181,17 @@ SOCIALACCOUNT_LOGIN_ON_GET = True
 RAZORPAY_KEY_ID = 'rzp_test_RmHTCE5Pbw7YLF'
 RAZORPAY_KEY_SECRET ='im2QWVwdU5CP4eq5GtNfTxQf'
 RAZORPAY_DEFAULT_CURRENCY = os.getenv('RAZORPAY_DEFAULT_CURRENCY', 'INR')
+# Point at bookings/fake_gateway.py (e.g. http://127.0.0.1:8765) for local benchmarks
+RAZORPAY_BASE_URL = os.getenv('RAZORPAY_BASE_URL', 'https://api.razorpay.com')
+RAZORPAY_CONNECT_TIMEOUT = float(os.getenv('RAZORPAY_CONNECT_TIMEOUT', '3.05'))
+RAZORPAY_READ_TIMEOUT = float(os.getenv('RAZORPAY_READ_TIMEOUT', '10'))
+# Secret set on the webhook in the Razorpay dashboard; webhooks are refused without it
+RAZORPAY_WEBHOOK_SECRET = os.getenv('RAZORPAY_WEBHOOK_SECRET', '')
+# Unpaid online bookings give their rooms back after this long
+BOOKING_HOLD_MINUTES = int(os.getenv('BOOKING_HOLD_MINUTES', '30'))
+# Batch quote API budget per client and minute: requests, and coupon previews
+QUOTE_RATE_LIMIT = int(os.getenv('QUOTE_RATE_LIMIT', '60'))
+QUOTE_COUPON_RATE_LIMIT = int(os.getenv('QUOTE_COUPON_RATE_LIMIT', '20'))
+# Drain the payment outbox and webhook events in a thread of each web process;
+# turn off when `process_payment_outbox --loop` / `process_payment_events --loop` run instead
+PAYMENT_WORKER = os.getenv('PAYMENT_WORKER', '1') == '1'
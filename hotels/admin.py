@@ -5,7 +5,11 @@ File Location: hotels/admin.py
 """
 
 from django.contrib import admin
-from .models import Hotel, HotelImage, RoomType, Amenity, Review
+from django.db.models import Q
+
+from core.search import filter_hotels
+from .models import Hotel, HotelImage, RoomType, Amenity, RateCalendar, RatingSummary, Review
+from .ratings import set_approval
 
 
 class HotelImageInline(admin.TabularInline):
@@ -117,6 +121,18 @@ class HotelAdmin(admin.ModelAdmin):
     
     readonly_fields = ['created_at', 'updated_at']
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Use the full-text index instead of LIKE scans over description;
+        distance_from_temple is not indexed, so it keeps its icontains match
+        """
+        if not search_term:
+            return queryset, False
+        matches = filter_hotels(Hotel.objects.all(), search_term, ranked=False)
+        return queryset.filter(
+            Q(pk__in=matches.values('pk')) | Q(distance_from_temple__icontains=search_term)
+        ), False
+
 
 @admin.register(Amenity)
 class AmenityAdmin(admin.ModelAdmin):
@@ -197,7 +213,7 @@ class ReviewAdmin(admin.ModelAdmin):
     
     def approve_reviews(self, request, queryset):
         """Approve selected reviews"""
-        updated = queryset.update(is_approved=True)
+        updated = set_approval(queryset, True)
         self.message_user(
             request, 
             f'{updated} review(s) approved successfully.'
@@ -206,9 +222,42 @@ class ReviewAdmin(admin.ModelAdmin):
     
     def unapprove_reviews(self, request, queryset):
         """Unapprove selected reviews"""
-        updated = queryset.update(is_approved=False)
+        updated = set_approval(queryset, False)
         self.message_user(
             request, 
             f'{updated} review(s) unapproved.'
         )
-    unapprove_reviews.short_description = "Unapprove selected reviews"  
\ No newline at end of file
+    unapprove_reviews.short_description = "Unapprove selected reviews"  
+
+@admin.register(RatingSummary)
+class RatingSummaryAdmin(admin.ModelAdmin):
+    """Read-only view of the incremental review totals"""
+    
+    list_display = ['hotel', 'review_count', 'rating_sum', 'stars_5', 'stars_4', 'stars_3', 'stars_2', 'stars_1']
+    
+    search_fields = ['hotel__name']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RateCalendar)
+class RateCalendarAdmin(admin.ModelAdmin):
+    """Read-only view of the materialised rates; edit rules in the master module"""
+    
+    list_display = ['room_type', 'date', 'rate', 'min_stay', 'is_closed']
+    
+    list_filter = ['is_closed', 'hotel']
+    
+    search_fields = ['room_type__name', 'hotel__name']
+    
+    date_hierarchy = 'date'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
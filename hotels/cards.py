@@ -0,0 +1,122 @@
+"""
+Precomputed search cards for the hotel listing page
+
+Each hotel's card dict and its rendered HTML fragment are built once when the
+hotel is saved and cached under a key derived from the hotel id and its
+``updated_at`` timestamp. Any edit to the hotel bumps ``updated_at`` and
+therefore lands under a fresh key, so stale cards are never served and old
+entries simply age out of the cache.
+
+File Location: hotels/cards.py
+"""
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from .models import FEATURE_FLAG_BITS, FEATURE_FLAG_MASK, FEATURE_FLAGS, Amenity, Hotel
+
+
+DEFAULT_CARD_IMAGE = "https://images.unsplash.com/photo-1582719508461-905c673771fd?w=300&h=250&fit=crop"
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+CARD_FRAGMENT_TEMPLATE = "hotels/partials/search_card.html"
+
+
+def card_cache_key(hotel_id, updated_at):
+    """Cache key for a hotel card at a given revision"""
+    return f"hotels:card:{hotel_id}:{updated_at.timestamp():.6f}"
+
+
+def amenity_lookup():
+    """Map amenity_mask bit positions to their Amenity"""
+    return {amenity.bit: amenity for amenity in Amenity.objects.exclude(bit=None)}
+
+
+def build_card(hotel, amenities_by_bit=None):
+    """Build the JSON-serialisable card dict used by search results"""
+    distance_label = hotel.distance_from_temple or "Dwarka"
+
+    amenities_list = []
+    features = []
+    mask = hotel.amenity_mask or 0
+
+    for _, key, icon, label in FEATURE_FLAGS:
+        if mask & FEATURE_FLAG_BITS[key]:
+            amenities_list.append(key)
+            features.append({"icon": icon, "label": label})
+    if mask & ~FEATURE_FLAG_MASK:
+        if amenities_by_bit is None:
+            amenities_by_bit = amenity_lookup()
+        for bit, amenity in sorted(amenities_by_bit.items()):
+            if mask & (1 << bit):
+                amenities_list.append(str(amenity.id))
+                features.append({"icon": f"fas {amenity.icon}", "label": amenity.name})
+
+    discount_label = f"{hotel.discount_percentage}% OFF" if hotel.discount_percentage else ""
+
+    return {
+        "id": hotel.slug,
+        "name": hotel.name,
+        "badge": hotel.badge or "",
+        "rating": float(hotel.rating or 0),
+        "reviews": hotel.total_reviews or 0,
+        "distance": hotel.distance_m,
+        "distanceLabel": distance_label,
+        "description": (hotel.description or "")[:200],
+        "price": float(hotel.discounted_price or 0),
+        "originalPrice": float(hotel.base_price or 0),
+        "discountLabel": discount_label,
+        "img": hotel.main_image.url if hotel.main_image else DEFAULT_CARD_IMAGE,
+        "link": reverse('hotels:details', args=[hotel.slug]),
+        "propertyType": hotel.property_type,
+        "amenities": amenities_list,
+        "features": features,
+    }
+
+
+def build_entry(hotel, amenities_by_bit=None):
+    """Card dict plus its pre-rendered HTML fragment"""
+    card = build_card(hotel, amenities_by_bit)
+    return {
+        "card": card,
+        "html": render_to_string(CARD_FRAGMENT_TEMPLATE, {"hotel": card}),
+    }
+
+
+def refresh_card(hotel):
+    """Rebuild and store the cache entry for a freshly saved hotel"""
+    entry = build_entry(hotel)
+    cache.set(card_cache_key(hotel.pk, hotel.updated_at), entry, CARD_CACHE_TIMEOUT)
+    return entry
+
+
+def get_cards(rows):
+    """
+    Return ``(cards, fragments)`` for ``(id, updated_at)`` rows, in row order.
+
+    Cards come from one cache multi-get; only the misses (cold cache, evicted
+    entries, other worker processes) are loaded from the database and cached.
+    """
+    keys = {hotel_id: card_cache_key(hotel_id, updated_at) for hotel_id, updated_at in rows}
+    entries = cache.get_many(list(keys.values()))
+
+    missing = [hotel_id for hotel_id, key in keys.items() if key not in entries]
+    if missing:
+        fresh = {}
+        amenities_by_bit = amenity_lookup()
+        for hotel in Hotel.objects.filter(id__in=missing):
+            fresh[card_cache_key(hotel.pk, hotel.updated_at)] = build_entry(hotel, amenities_by_bit)
+        cache.set_many(fresh, CARD_CACHE_TIMEOUT)
+        entries.update(fresh)
+
+    cards = []
+    fragments = []
+    for idx, (hotel_id, _) in enumerate(rows, start=1):
+        entry = entries.get(keys[hotel_id])
+        if entry is None:
+            # Hotel changed between the id lookup and the reload; skip it for this request
+            continue
+        cards.append({**entry["card"], "order": idx})
+        fragments.append(mark_safe(entry["html"]))
+    return cards, fragments
@@ -0,0 +1,113 @@
+"""
+Cached fragments of the hotel detail page
+
+The gallery, overview (description, rating summary, amenities), room types
+and similar-stays blocks are the same for every visitor, so they are
+rendered once and cached under a per-hotel version number. The signals in
+hotels/signals.py bump the version whenever anything those blocks show
+changes, so the next request renders fresh fragments under new keys. The
+old ones are never read again and age out of the cache.
+
+Anything per-visitor stays outside the fragments and is rendered on every
+request: messages, CSRF tokens, review edit/delete controls and login
+state. Fragments are rendered without a request for that reason.
+
+File Location: hotels/fragments.py
+"""
+
+import time
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Hotel, HotelNeighbour, RatingSummary
+from .similarity import related_hotels
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(hotel_id):
+    return f"hotels:detail:version:{hotel_id}"
+
+
+def detail_version(hotel_id):
+    """Current fragment version for a hotel (created on first use)"""
+    key = _version_key(hotel_id)
+    version = cache.get(key)
+    if version is None:
+        # Seeded from the clock so an evicted counter never reuses old keys
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_detail_version(*hotel_ids):
+    """Invalidate every cached fragment of the given hotels"""
+    for hotel_id in hotel_ids:
+        try:
+            cache.incr(_version_key(hotel_id))
+        except ValueError:
+            cache.set(_version_key(hotel_id), time.time_ns(), None)
+
+
+def bump_neighbour_versions(hotel_id):
+    """Hotels listing ``hotel_id`` as a similar stay show its name and price"""
+    bump_detail_version(
+        hotel_id,
+        *HotelNeighbour.objects.filter(neighbour_id=hotel_id).values_list('hotel_id', flat=True),
+    )
+
+
+def _gallery_context(hotel):
+    return {'gallery_images': list(hotel.images.all())}
+
+
+def _overview_context(hotel):
+    summary = RatingSummary.objects.filter(hotel=hotel).first() or RatingSummary(hotel=hotel)
+    return {
+        'dynamic_rating': summary.average,
+        'review_count': summary.review_count,
+        'rating_distribution': summary.distribution(),
+        'amenities': list(hotel.amenities.all()),
+    }
+
+
+def _rooms_context(hotel):
+    return {'room_types': list(hotel.room_types.filter(is_available=True))}
+
+
+def _related_context(hotel):
+    # Fall back to arbitrary picks until rebuild_related_hotels has run
+    return {
+        'related_hotels': related_hotels(hotel) or list(
+            Hotel.objects.filter(is_active=True).exclude(id=hotel.id)[:3]
+        ),
+    }
+
+
+FRAGMENTS = {
+    'gallery': ('hotels/partials/detail_gallery.html', _gallery_context),
+    'overview': ('hotels/partials/detail_overview.html', _overview_context),
+    'rooms': ('hotels/partials/detail_rooms.html', _rooms_context),
+    'related': ('hotels/partials/detail_related.html', _related_context),
+}
+
+
+def get_fragments(hotel):
+    """
+    Map fragment name -> rendered HTML for the detail page. Warm fragments
+    cost two cache reads (version + one multi-get) and no queries.
+    """
+    version = detail_version(hotel.pk)
+    keys = {name: f"hotels:detail:{hotel.pk}:{version}:{name}" for name in FRAGMENTS}
+    cached = cache.get_many(list(keys.values()))
+
+    fresh = {}
+    for name, (template, build_context) in FRAGMENTS.items():
+        if keys[name] not in cached:
+            fresh[keys[name]] = render_to_string(template, {'hotel': hotel, **build_context(hotel)})
+    if fresh:
+        cache.set_many(fresh, FRAGMENT_CACHE_TIMEOUT)
+        cached.update(fresh)
+    return {name: mark_safe(cached[key]) for name, key in keys.items()}
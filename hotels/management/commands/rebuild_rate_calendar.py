@@ -0,0 +1,27 @@
+"""
+Roll the rate calendar forward; run daily (e.g. from cron shortly after
+midnight) so the horizon and Hotel.lowest_rate_30d follow the date
+"""
+
+from django.core.management.base import BaseCommand
+
+from hotels import rates
+
+
+class Command(BaseCommand):
+    help = "Re-expand every RateRule into RateCalendar rows, drop past nights and refresh lowest rates"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=rates.RATE_HORIZON_DAYS,
+            help="Nights to materialise from today",
+        )
+
+    def handle(self, *args, **options):
+        pruned = rates.prune()
+        written = rates.materialise(days=options["days"])
+        # Hotels without room types still need their lowest rate cleared
+        rates.refresh_lowest_rates()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} calendar night(s); pruned {pruned} past night(s)."
+        ))
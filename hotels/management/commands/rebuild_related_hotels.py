@@ -0,0 +1,22 @@
+"""Recompute the related-hotels similarity index from scratch"""
+
+from django.core.management.base import BaseCommand
+
+from hotels import similarity
+from hotels.fragments import bump_detail_version
+from hotels.models import Hotel
+
+
+class Command(BaseCommand):
+    help = "Rebuild HotelNeighbour rows with a full cosine-similarity pass over active hotels"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-k", type=int, default=similarity.RELATED_HOTELS_K,
+            help="Neighbours to keep per hotel",
+        )
+
+    def handle(self, *args, **options):
+        count = similarity.rebuild(k=options["k"])
+        bump_detail_version(*Hotel.objects.values_list("id", flat=True))
+        self.stdout.write(self.style.SUCCESS(f"Indexed neighbours for {count} hotel(s)."))
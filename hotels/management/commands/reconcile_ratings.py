@@ -0,0 +1,15 @@
+"""Recompute every hotel's review totals from the reviews table"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from hotels import ratings
+
+
+class Command(BaseCommand):
+    help = "Rebuild RatingSummary rows and Hotel.rating/total_reviews with one GROUP BY over approved reviews"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = ratings.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled ratings for {count} hotel(s)."))
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:37
+
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of hotels.models.parse_distance_metres as of this migration
+DISTANCE_PATTERN = re.compile(
+    r"(\d+(?:\.\d+)?)\s*(kms?|kilomet(?:er|re)s?|m|mtrs?|met(?:er|re)s?)\b",
+    re.IGNORECASE,
+)
+
+
+def parse_distance_metres(text):
+    match = DISTANCE_PATTERN.search(text or "")
+    if not match:
+        return None
+    value = float(match.group(1))
+    if match.group(2).lower().startswith('k'):
+        value *= 1000
+    return int(round(value))
+
+
+def backfill_distance_m(apps, schema_editor):
+    Hotel = apps.get_model('hotels', 'Hotel')
+    hotels = list(Hotel.objects.only('id', 'distance_from_temple'))
+    for hotel in hotels:
+        hotel.distance_m = parse_distance_metres(hotel.distance_from_temple)
+    Hotel.objects.bulk_update(hotels, ['distance_m'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0004_hotel_location_zone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hotel',
+            name='distance_m',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, help_text='Walking distance to Dwarkadhish Temple in metres (parsed from distance_from_temple)', null=True),
+        ),
+        migrations.RunPython(backfill_distance_m, migrations.RunPython.noop),
+    ]
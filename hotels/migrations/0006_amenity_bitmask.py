@@ -0,0 +1,56 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:39
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Frozen copy of the hotels.models bit layout as of this migration: the
+# has_* flags own the low bits, amenities take bits 8..62
+FEATURE_FLAG_FIELDS = ['has_wifi', 'has_breakfast', 'has_temple_view', 'has_parking', 'has_ac']
+AMENITY_BIT_OFFSET = 8
+AMENITY_BIT_LIMIT = 63
+
+
+def backfill_amenity_mask(apps, schema_editor):
+    Amenity = apps.get_model('hotels', 'Amenity')
+    Hotel = apps.get_model('hotels', 'Hotel')
+
+    amenities = list(Amenity.objects.order_by('id')[:AMENITY_BIT_LIMIT - AMENITY_BIT_OFFSET])
+    for bit, amenity in enumerate(amenities, start=AMENITY_BIT_OFFSET):
+        amenity.bit = bit
+    Amenity.objects.bulk_update(amenities, ['bit'])
+
+    amenity_bits = defaultdict(int)
+    links = Hotel.amenities.through.objects.filter(amenity__bit__isnull=False)
+    for hotel_id, bit in links.values_list('hotel_id', 'amenity__bit'):
+        amenity_bits[hotel_id] |= 1 << bit
+
+    hotels = list(Hotel.objects.only('id', *FEATURE_FLAG_FIELDS))
+    for hotel in hotels:
+        mask = amenity_bits[hotel.id]
+        for bit, field in enumerate(FEATURE_FLAG_FIELDS):
+            if getattr(hotel, field):
+                mask |= 1 << bit
+        hotel.amenity_mask = mask
+    Hotel.objects.bulk_update(hotels, ['amenity_mask'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0005_hotel_distance_m'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='amenity',
+            name='bit',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, help_text='Bit position in Hotel.amenity_mask (assigned automatically)', null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='hotel',
+            name='amenity_mask',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Bitmask of has_* flags and amenities for join-free filtering'),
+        ),
+        migrations.RunPython(backfill_amenity_mask, migrations.RunPython.noop),
+    ]
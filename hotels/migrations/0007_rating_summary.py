@@ -0,0 +1,55 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_rating_summaries(apps, schema_editor):
+    Hotel = apps.get_model('hotels', 'Hotel')
+    RatingSummary = apps.get_model('hotels', 'RatingSummary')
+    Review = apps.get_model('hotels', 'Review')
+
+    rows = Review.objects.filter(is_approved=True).order_by().values('hotel_id').annotate(
+        review_count=models.Count('id'),
+        rating_sum=models.Sum('rating'),
+        **{f'stars_{stars}': models.Count('id', filter=models.Q(rating=stars)) for stars in range(1, 6)},
+    )
+    summaries = [RatingSummary(**row) for row in rows]
+    RatingSummary.objects.bulk_create(summaries, batch_size=500)
+
+    totals = {summary.hotel_id: summary for summary in summaries}
+    hotels = list(Hotel.objects.all())
+    for hotel in hotels:
+        summary = totals.get(hotel.id)
+        hotel.total_reviews = summary.review_count if summary else 0
+        hotel.rating = round(summary.rating_sum / summary.review_count, 2) if summary else 0
+    Hotel.objects.bulk_update(hotels, ['rating', 'total_reviews'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0006_amenity_bitmask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('hotel', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rating_summary', to='hotels.hotel')),
+            ],
+            options={
+                'verbose_name': 'Rating Summary',
+                'verbose_name_plural': 'Rating Summaries',
+            },
+        ),
+        migrations.RunPython(backfill_rating_summaries, migrations.RunPython.noop),
+    ]
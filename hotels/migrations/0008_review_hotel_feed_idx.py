@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0007_rating_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['hotel', 'is_approved', 'created_at'], name='review_hotel_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0008_review_hotel_feed_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotelNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField(help_text="Cosine similarity of the two hotels' feature vectors")),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='hotels.hotel')),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hotels.hotel')),
+            ],
+            options={
+                'verbose_name': 'Hotel Neighbour',
+                'verbose_name_plural': 'Hotel Neighbours',
+                'ordering': ['hotel', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='hotelneighbour',
+            constraint=models.UniqueConstraint(fields=('hotel', 'rank'), name='unique_neighbour_rank'),
+        ),
+    ]
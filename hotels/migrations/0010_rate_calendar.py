@@ -0,0 +1,64 @@
+# Generated by Django 4.2.16 on 2026-10-17 02:00
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0009_hotel_neighbour'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hotel',
+            name='lowest_rate_30d',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, editable=False, help_text='Lowest open rate-calendar rate in the next 30 days (maintained by hotels/rates.py)', max_digits=10, null=True),
+        ),
+        migrations.CreateModel(
+            name='RateRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='e.g., Janmashtami, Weekend, Renovation', max_length=100)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(help_text='Last night the rule applies to (inclusive)')),
+                ('weekdays', models.PositiveSmallIntegerField(default=127, help_text='Bitmask of weekdays the rule applies to (bit 0 = Monday)')),
+                ('rate', models.DecimalField(blank=True, decimal_places=2, help_text="Fixed nightly rate; leave blank to adjust the room's price instead", max_digits=10, null=True)),
+                ('adjustment_percentage', models.IntegerField(default=0, help_text="Percent added to (or taken off) the room's price per night", validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(500)])),
+                ('min_stay', models.PositiveSmallIntegerField(default=1, help_text='Minimum nights for stays that include these dates', validators=[django.core.validators.MinValueValidator(1)])),
+                ('is_closed', models.BooleanField(default=False, help_text='Stop selling these dates')),
+                ('priority', models.IntegerField(default=0, help_text='Higher priority wins where rules overlap')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rate_rules', to='hotels.hotel')),
+                ('room_type', models.ForeignKey(blank=True, help_text='Leave blank to apply to every room type of the hotel', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rate_rules', to='hotels.roomtype')),
+            ],
+            options={
+                'ordering': ['hotel', '-priority', 'start_date'],
+                'indexes': [models.Index(fields=['hotel', 'end_date'], name='raterule_hotel_end_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RateCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('min_stay', models.PositiveSmallIntegerField(default=1)),
+                ('is_closed', models.BooleanField(default=False)),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hotels.hotel')),
+                ('room_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rate_calendar', to='hotels.roomtype')),
+            ],
+            options={
+                'verbose_name': 'Rate Calendar Day',
+                'verbose_name_plural': 'Rate Calendar',
+                'ordering': ['room_type_id', 'date'],
+                'indexes': [models.Index(fields=['hotel', 'date'], name='ratecalendar_hotel_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ratecalendar',
+            constraint=models.UniqueConstraint(fields=('room_type', 'date'), name='unique_room_rate_date'),
+        ),
+    ]
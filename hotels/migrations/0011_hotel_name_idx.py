@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-17 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0010_rate_calendar'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hotel',
+            index=models.Index(fields=['name', 'id'], name='hotel_name_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-17 02:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0011_hotel_name_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotelVector',
+            fields=[
+                ('hotel', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similarity_vector', serialize=False, to='hotels.hotel')),
+                ('vector', models.BinaryField()),
+            ],
+            options={
+                'verbose_name': 'Hotel Vector',
+                'verbose_name_plural': 'Hotel Vectors',
+            },
+        ),
+    ]
@@ -4,12 +4,50 @@ Hotels App Models - Hotel, Amenities, Room Types, Reviews
 File Location: hotels/models.py
 """
 
+import re
+
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from django.utils.text import slugify
 
 
+DISTANCE_PATTERN = re.compile(
+    r"(\d+(?:\.\d+)?)\s*(kms?|kilomet(?:er|re)s?|m|mtrs?|met(?:er|re)s?)\b",
+    re.IGNORECASE,
+)
+
+
+def parse_distance_metres(text):
+    """
+    Parse free-text distances such as "200m", "1.2 km" or "500 meters from
+    the temple" into whole metres. Returns None when no unit is recognised.
+    """
+    match = DISTANCE_PATTERN.search(text or "")
+    if not match:
+        return None
+    value = float(match.group(1))
+    if match.group(2).lower().startswith('k'):
+        value *= 1000
+    return int(round(value))
+
+
+# Hotel.amenity_mask layout: the has_* feature flags own the low bits, each
+# Amenity is assigned one of the remaining bits (kept below the sign bit).
+# Entries are (field, key, icon, label) and drive the search card features.
+FEATURE_FLAGS = [
+    ('has_wifi', 'wifi', 'fas fa-wifi', 'Free Wi-Fi'),
+    ('has_breakfast', 'breakfast', 'fas fa-coffee', 'Breakfast'),
+    ('has_temple_view', 'templeview', 'fas fa-om', 'Temple View'),
+    ('has_parking', 'parking', 'fas fa-parking', 'Parking'),
+    ('has_ac', 'ac', 'fas fa-snowflake', 'AC Rooms'),
+]
+FEATURE_FLAG_BITS = {key: 1 << index for index, (_, key, _, _) in enumerate(FEATURE_FLAGS)}
+AMENITY_BIT_OFFSET = 8
+AMENITY_BIT_LIMIT = 63
+FEATURE_FLAG_MASK = (1 << AMENITY_BIT_OFFSET) - 1
+
+
 class Amenity(models.Model):
     """Hotel amenities like Wi-Fi, Pool, Parking, etc."""
 
@@ -29,6 +67,23 @@ class Amenity(models.Model):
         choices=CATEGORY_CHOICES,
         default="room",
     )
+    bit = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+        help_text="Bit position in Hotel.amenity_mask (assigned automatically)",
+    )
+
+    def save(self, *args, **kwargs):
+        """Claim the lowest free amenity_mask bit"""
+        if self.bit is None:
+            used = set(Amenity.objects.exclude(bit=None).values_list('bit', flat=True))
+            self.bit = next(
+                (bit for bit in range(AMENITY_BIT_OFFSET, AMENITY_BIT_LIMIT) if bit not in used),
+                None,
+            )
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -73,6 +128,13 @@ class Hotel(models.Model):
         max_length=100, 
         help_text="e.g., 200m from Dwarkadhish Temple"
     )
+    distance_m = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Walking distance to Dwarkadhish Temple in metres (parsed from distance_from_temple)"
+    )
     landmark = models.CharField(max_length=200, blank=True)
     location_zone = models.CharField(
         max_length=40,
@@ -106,6 +168,15 @@ class Hotel(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(100)],
         help_text="Discount percentage (0-100)"
     )
+    lowest_rate_30d = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Lowest open rate-calendar rate in the next 30 days (maintained by hotels/rates.py)"
+    )
     
     # Ratings & Reviews
     rating = models.DecimalField(
@@ -130,6 +201,11 @@ class Hotel(models.Model):
     has_parking = models.BooleanField(default=False)
     has_wifi = models.BooleanField(default=False)
     has_ac = models.BooleanField(default=False)
+    amenity_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        help_text="Bitmask of has_* flags and amenities for join-free filtering"
+    )
     
     # Status & Featured
     is_active = models.BooleanField(default=True)
@@ -158,7 +234,34 @@ class Hotel(models.Model):
         """Auto-generate slug from name"""
         if not self.slug:
             self.slug = slugify(self.name)
+        self.distance_m = parse_distance_metres(self.distance_from_temple)
+        self.amenity_mask = (self.amenity_mask & ~FEATURE_FLAG_MASK) | self.flag_mask()
+        # Partial saves must still bump updated_at; cached search cards are keyed on it
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'updated_at'}
+            if 'distance_from_temple' in update_fields:
+                update_fields.add('distance_m')
+            if any(field in update_fields for field, _, _, _ in FEATURE_FLAGS):
+                update_fields.add('amenity_mask')
+            kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
+
+    def flag_mask(self):
+        """amenity_mask bits for the has_* feature flags"""
+        mask = 0
+        for field, key, _, _ in FEATURE_FLAGS:
+            if getattr(self, field):
+                mask |= FEATURE_FLAG_BITS[key]
+        return mask
+
+    def refresh_amenity_mask(self):
+        """Recompute amenity_mask from the flags and the amenities M2M"""
+        mask = self.flag_mask()
+        for bit in self.amenities.exclude(bit=None).values_list('bit', flat=True):
+            mask |= 1 << bit
+        self.amenity_mask = mask
+        self.save(update_fields=['amenity_mask'])
     
     @property
     def discounted_price(self):
@@ -173,6 +276,10 @@ class Hotel(models.Model):
     
     class Meta:
         ordering = ['-is_featured', '-rating']
+        indexes = [
+            # Keyset pages of the master hotel lists
+            models.Index(fields=['name', 'id'], name='hotel_name_idx'),
+        ]
 
 
 class HotelImage(models.Model):
@@ -272,4 +379,218 @@ class Review(models.Model):
         return f"{self.guest_name} - {self.hotel.name} ({self.rating}★)"
     
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of approved reviews in hotels/reviews.py
+            models.Index(fields=['hotel', 'is_approved', 'created_at'], name='review_hotel_feed_idx'),
+        ]
+
+
+class RatingSummary(models.Model):
+    """
+    Running totals of approved reviews per hotel, maintained incrementally by
+    hotels/ratings.py so the detail page never aggregates on read.
+    ``manage.py reconcile_ratings`` rebuilds every row from the reviews table.
+    """
+    
+    hotel = models.OneToOneField(
+        Hotel,
+        related_name='rating_summary',
+        on_delete=models.CASCADE
+    )
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    
+    @property
+    def average(self):
+        """Average rating rounded to two places, or None without reviews"""
+        if not self.review_count:
+            return None
+        return round(self.rating_sum / self.review_count, 2)
+    
+    def distribution(self):
+        """``(stars, count, percent)`` for 5 down to 1 star"""
+        rows = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, f'stars_{stars}')
+            percent = round(count * 100 / self.review_count) if self.review_count else 0
+            rows.append((stars, count, percent))
+        return rows
+    
+    def __str__(self):
+        return f"{self.hotel.name} - {self.review_count} review(s)"
+    
+    class Meta:
+        verbose_name = "Rating Summary"
+        verbose_name_plural = "Rating Summaries"
+
+class HotelVector(models.Model):
+    """
+    Similarity feature vector of an active hotel (float64 bytes), stored by
+    hotels/similarity.py so a change to one hotel is scored against the
+    others without recomputing their features.
+    """
+    
+    hotel = models.OneToOneField(
+        Hotel,
+        primary_key=True,
+        related_name='similarity_vector',
+        on_delete=models.CASCADE
+    )
+    vector = models.BinaryField()
+    
+    def __str__(self):
+        return f"{self.hotel_id} vector"
+    
+    class Meta:
+        verbose_name = "Hotel Vector"
+        verbose_name_plural = "Hotel Vectors"
+
+
+class HotelNeighbour(models.Model):
+    """
+    Precomputed "similar stays" for a hotel, best match first (rank 0).
+    Written by hotels/similarity.py; read by the detail page in one query.
+    """
+    
+    hotel = models.ForeignKey(
+        Hotel,
+        related_name='neighbours',
+        on_delete=models.CASCADE
+    )
+    neighbour = models.ForeignKey(
+        Hotel,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField(help_text="Cosine similarity of the two hotels' feature vectors")
+    
+    def __str__(self):
+        return f"{self.hotel.name} -> {self.neighbour.name} ({self.score:.2f})"
+    
+    class Meta:
+        ordering = ['hotel', 'rank']
+        verbose_name = "Hotel Neighbour"
+        verbose_name_plural = "Hotel Neighbours"
+        constraints = [
+            models.UniqueConstraint(fields=['hotel', 'rank'], name='unique_neighbour_rank'),
+        ]
+
+
+class RateRule(models.Model):
+    """
+    Staff-managed pricing rule (weekend, festival, closure) for a hotel's room
+    types. Rules are never read when pricing a stay; hotels/rates.py expands
+    them into RateCalendar rows. Where rules overlap on a date the highest
+    priority wins, then the most recently created.
+    """
+
+    WEEKDAY_CHOICES = [
+        (0, 'Mon'),
+        (1, 'Tue'),
+        (2, 'Wed'),
+        (3, 'Thu'),
+        (4, 'Fri'),
+        (5, 'Sat'),
+        (6, 'Sun'),
+    ]
+    ALL_WEEKDAYS = (1 << 7) - 1
+
+    hotel = models.ForeignKey(
+        Hotel,
+        related_name='rate_rules',
+        on_delete=models.CASCADE
+    )
+    room_type = models.ForeignKey(
+        RoomType,
+        related_name='rate_rules',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        help_text="Leave blank to apply to every room type of the hotel"
+    )
+    name = models.CharField(max_length=100, help_text="e.g., Janmashtami, Weekend, Renovation")
+    start_date = models.DateField()
+    end_date = models.DateField(help_text="Last night the rule applies to (inclusive)")
+    weekdays = models.PositiveSmallIntegerField(
+        default=ALL_WEEKDAYS,
+        help_text="Bitmask of weekdays the rule applies to (bit 0 = Monday)"
+    )
+    rate = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Fixed nightly rate; leave blank to adjust the room's price instead"
+    )
+    adjustment_percentage = models.IntegerField(
+        default=0,
+        validators=[MinValueValidator(-90), MaxValueValidator(500)],
+        help_text="Percent added to (or taken off) the room's price per night"
+    )
+    min_stay = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        help_text="Minimum nights for stays that include these dates"
+    )
+    is_closed = models.BooleanField(default=False, help_text="Stop selling these dates")
+    priority = models.IntegerField(default=0, help_text="Higher priority wins where rules overlap")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def applies_on(self, day):
+        return self.start_date <= day <= self.end_date and bool(self.weekdays & (1 << day.weekday()))
+
+    def weekday_labels(self):
+        return [label for bit, label in self.WEEKDAY_CHOICES if self.weekdays & (1 << bit)]
+
+    def __str__(self):
+        return f"{self.hotel.name} - {self.name} ({self.start_date} to {self.end_date})"
+
+    class Meta:
+        ordering = ['hotel', '-priority', 'start_date']
+        indexes = [
+            models.Index(fields=['hotel', 'end_date'], name='raterule_hotel_end_idx'),
+        ]
+
+
+class RateCalendar(models.Model):
+    """
+    Materialised sellable rate per room type and night, written only by
+    hotels/rates.py. The (room_type, date) unique index lets a whole stay be
+    priced with one range scan; (hotel, date) serves the lowest-rate rollup.
+    """
+
+    hotel = models.ForeignKey(
+        Hotel,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    room_type = models.ForeignKey(
+        RoomType,
+        related_name='rate_calendar',
+        on_delete=models.CASCADE
+    )
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=10, decimal_places=2)
+    min_stay = models.PositiveSmallIntegerField(default=1)
+    is_closed = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.room_type} - {self.date}: {self.rate}"
+
+    class Meta:
+        ordering = ['room_type_id', 'date']
+        verbose_name = "Rate Calendar Day"
+        verbose_name_plural = "Rate Calendar"
+        constraints = [
+            models.UniqueConstraint(fields=['room_type', 'date'], name='unique_room_rate_date'),
+        ]
+        indexes = [
+            models.Index(fields=['hotel', 'date'], name='ratecalendar_hotel_date_idx'),
+        ]
@@ -0,0 +1,224 @@
+"""
+Rate calendar
+
+Staff edit RateRule rows (master module); pricing only ever reads the
+RateCalendar, which holds one row per room type and night over the next
+``RATE_HORIZON_DAYS``:
+
+* ``materialise()`` expands the rules for some room types into calendar rows
+  in Python and upserts them in batches. The signals in hotels/signals.py call
+  it for the affected room types whenever a rule or a room's price changes,
+  and ``manage.py rebuild_rate_calendar`` rolls the horizon forward daily
+* a night with no rule sells at the room's ``price_per_night``; otherwise the
+  winning rule (highest priority, then room-specific over hotel-wide, then
+  newest) sets a fixed rate or a percentage adjustment, the minimum stay and
+  the closed flag
+* ``stay_nights()`` prices a whole stay from one range scan of the
+  (room_type, date) unique index; ``stay_calendar()`` also covers nights
+  beyond the horizon (or not materialised yet) by expanding the rules for
+  just those nights, without writing them
+* Hotel.lowest_rate_30d is refreshed with a single correlated UPDATE over the
+  (hotel, date) index, so search can price hotels from a stored column
+  instead of a per-request aggregate over the calendar
+
+File Location: hotels/rates.py
+"""
+
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Min, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Hotel, RateCalendar, RateRule, RoomType
+
+RATE_HORIZON_DAYS = 365
+LOWEST_RATE_WINDOW_DAYS = 30
+CALENDAR_FIELDS = ['rate', 'min_stay', 'is_closed']
+
+
+class StayNotSellable(Exception):
+    """Raised with a guest-facing reason when the calendar refuses a stay"""
+
+
+def _precedence(rule):
+    return (rule.priority, rule.room_type_id is not None, rule.pk)
+
+
+def rule_rate(rule, price_per_night):
+    """Nightly rate a rule sets for a room priced at ``price_per_night``"""
+    if rule.rate is not None:
+        return rule.rate
+    rate = Decimal(price_per_night) * (100 + rule.adjustment_percentage) / 100
+    return rate.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def calendar_days(room_type, rules, start, days):
+    """
+    Unsaved RateCalendar rows for ``days`` nights from ``start``. ``rules``
+    are the hotel's rules in increasing precedence, so later ones overwrite.
+    """
+    closed = not room_type.is_available
+    rows = [
+        RateCalendar(
+            hotel_id=room_type.hotel_id,
+            room_type_id=room_type.pk,
+            date=start + timedelta(days=offset),
+            rate=room_type.price_per_night,
+            min_stay=1,
+            is_closed=closed,
+        )
+        for offset in range(days)
+    ]
+    for rule in rules:
+        if rule.room_type_id not in (None, room_type.pk):
+            continue
+        rate = rule_rate(rule, room_type.price_per_night)
+        first = max((rule.start_date - start).days, 0)
+        last = min((rule.end_date - start).days, days - 1)
+        for row in rows[first:last + 1]:
+            if rule.weekdays & (1 << row.date.weekday()):
+                row.rate = rate
+                row.min_stay = rule.min_stay
+                row.is_closed = closed or rule.is_closed
+    return rows
+
+
+def _rules_by_hotel(hotel_ids, start, end):
+    """Rules touching ``[start, end)`` per hotel, in increasing precedence"""
+    rules_by_hotel = {}
+    rules = RateRule.objects.filter(hotel_id__in=hotel_ids, start_date__lt=end, end_date__gte=start)
+    for rule in sorted(rules, key=_precedence):
+        rules_by_hotel.setdefault(rule.hotel_id, []).append(rule)
+    return rules_by_hotel
+
+
+@transaction.atomic
+def materialise(room_type_ids=None, hotel_ids=None, start=None, days=RATE_HORIZON_DAYS):
+    """
+    Rewrite the calendar for the given room types (or every room type of the
+    given hotels, or everything) from ``start`` (today) for ``days`` nights
+    and refresh the hotels' lowest rates. Returns the number of rows written.
+    """
+    start = start or timezone.localdate()
+    end = start + timedelta(days=days)
+
+    room_types = RoomType.objects.only('id', 'hotel_id', 'price_per_night', 'is_available')
+    if room_type_ids is not None:
+        room_types = room_types.filter(id__in=room_type_ids)
+    if hotel_ids is not None:
+        room_types = room_types.filter(hotel_id__in=hotel_ids)
+    room_types = list(room_types)
+    if not room_types:
+        if hotel_ids is not None:
+            refresh_lowest_rates(hotel_ids)
+        return 0
+
+    touched_hotels = {room_type.hotel_id for room_type in room_types}
+    rules_by_hotel = _rules_by_hotel(touched_hotels, start, end)
+
+    written = 0
+    for room_type in room_types:
+        rows = calendar_days(room_type, rules_by_hotel.get(room_type.hotel_id, []), start, days)
+        RateCalendar.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['room_type', 'date'],
+            update_fields=CALENDAR_FIELDS,
+        )
+        written += len(rows)
+    refresh_lowest_rates(touched_hotels)
+    return written
+
+
+def prune(before=None):
+    """Drop calendar rows for nights before ``before`` (today)"""
+    deleted, _ = RateCalendar.objects.filter(date__lt=before or timezone.localdate()).delete()
+    return deleted
+
+
+def refresh_lowest_rates(hotel_ids=None, today=None):
+    """
+    Set Hotel.lowest_rate_30d (the lowest open rate over the next
+    ``LOWEST_RATE_WINDOW_DAYS`` nights, or NULL) in one UPDATE statement
+    """
+    today = today or timezone.localdate()
+    lowest = (
+        RateCalendar.objects.filter(
+            hotel_id=OuterRef('pk'),
+            date__gte=today,
+            date__lt=today + timedelta(days=LOWEST_RATE_WINDOW_DAYS),
+            is_closed=False,
+        )
+        .order_by()
+        .values('hotel_id')
+        .annotate(lowest=Min('rate'))
+        .values('lowest')
+    )
+    hotels = Hotel.objects.all()
+    if hotel_ids is not None:
+        hotels = hotels.filter(id__in=list(hotel_ids))
+    # A queryset update: search cards and Hotel signals are not involved
+    return hotels.update(lowest_rate_30d=Subquery(lowest))
+
+
+def calendar_rows(room_type_ids, start, end):
+    """``{room_type_id: {date: (rate, min_stay, is_closed)}}`` for nights in ``[start, end)``"""
+    calendar = {}
+    rows = RateCalendar.objects.filter(
+        room_type_id__in=room_type_ids, date__gte=start, date__lt=end
+    ).order_by().values_list('room_type_id', 'date', 'rate', 'min_stay', 'is_closed')
+    for room_type_id, day, rate, min_stay, is_closed in rows:
+        calendar.setdefault(room_type_id, {})[day] = (rate, min_stay, is_closed)
+    return calendar
+
+
+def stay_calendar(room_types, check_in, check_out):
+    """
+    ``calendar_rows`` for the stay with every night filled in: nights missing
+    from the calendar are expanded from the rules on the fly (one more query,
+    only when something is missing). ``room_types`` need ``hotel_id``,
+    ``price_per_night`` and ``is_available``.
+    """
+    calendar = calendar_rows([room_type.pk for room_type in room_types], check_in, check_out)
+    days = (check_out - check_in).days
+    missing = [room_type for room_type in room_types if len(calendar.get(room_type.pk, {})) < days]
+    if missing:
+        rules_by_hotel = _rules_by_hotel({room_type.hotel_id for room_type in missing}, check_in, check_out)
+        for room_type in missing:
+            nights = calendar.setdefault(room_type.pk, {})
+            for row in calendar_days(room_type, rules_by_hotel.get(room_type.hotel_id, []), check_in, days):
+                nights.setdefault(row.date, (row.rate, row.min_stay, row.is_closed))
+    return calendar
+
+
+def stay_nights(room_type_id, check_in, check_out, calendar=None):
+    """
+    ``[(rate, min_stay, is_closed)]`` for each night of the stay, or None if
+    the calendar does not cover every night. Pass ``calendar`` (from
+    ``calendar_rows``) to price many stays from one query.
+    """
+    if calendar is None:
+        calendar = calendar_rows([room_type_id], check_in, check_out)
+    days = calendar.get(room_type_id, {})
+    nights = []
+    for offset in range((check_out - check_in).days):
+        night = days.get(check_in + timedelta(days=offset))
+        if night is None:
+            return None
+        nights.append(night)
+    return nights
+
+
+def check_sellable(nights, check_in):
+    """Raise StayNotSellable if a night is closed or the stay is too short"""
+    for offset, (_, _, is_closed) in enumerate(nights):
+        if is_closed:
+            closed_on = check_in + timedelta(days=offset)
+            raise StayNotSellable(f"This room is not available on {closed_on:%d %b %Y}.")
+    # The strictest minimum stay of any night in the stay applies
+    min_stay = max(min_stay for _, min_stay, _ in nights)
+    if len(nights) < min_stay:
+        raise StayNotSellable(f"A minimum stay of {min_stay} nights applies to these dates.")
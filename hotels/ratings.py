@@ -0,0 +1,116 @@
+"""
+Incremental review aggregates
+
+Every approved review contributes one to ``review_count``, its rating to
+``rating_sum`` and one to its ``stars_N`` bucket of the hotel's RatingSummary.
+Writes to reviews (save, delete, approval changes, admin bulk actions) apply
+the difference as F() updates, then mirror the average into Hotel.rating /
+Hotel.total_reviews for listings and search cards. ``reconcile()`` recomputes
+all summaries with a single GROUP BY.
+
+File Location: hotels/ratings.py
+"""
+
+from collections import Counter
+
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .fragments import bump_detail_version
+from .models import Hotel, RatingSummary, Review
+
+STAR_FIELDS = [f'stars_{stars}' for stars in range(1, 6)]
+SUMMARY_FIELDS = ['review_count', 'rating_sum', *STAR_FIELDS]
+
+
+def apply_delta(hotel_id, rating, count):
+    """Add (or with a negative ``count`` remove) ``count`` approved reviews"""
+    if not count:
+        return
+    changes = {
+        'review_count': F('review_count') + count,
+        'rating_sum': F('rating_sum') + rating * count,
+        f'stars_{rating}': F(f'stars_{rating}') + count,
+    }
+    updated = RatingSummary.objects.filter(hotel_id=hotel_id).update(**changes)
+    if not updated and count > 0:
+        # First review for this hotel; removals never create rows, so a
+        # hotel that is being deleted does not get a summary resurrected
+        RatingSummary.objects.get_or_create(hotel_id=hotel_id)
+        RatingSummary.objects.filter(hotel_id=hotel_id).update(**changes)
+    sync_hotel(hotel_id)
+
+
+def sync_hotel(hotel_id):
+    """Copy the summary's average and count onto the Hotel row"""
+    summary = RatingSummary.objects.filter(hotel_id=hotel_id).first()
+    count = summary.review_count if summary else 0
+    average = summary.average if summary else None
+    # updated_at changes too so the cached search card is rebuilt
+    Hotel.objects.filter(pk=hotel_id).update(
+        rating=average or 0,
+        total_reviews=count,
+        updated_at=timezone.now(),
+    )
+    bump_detail_version(hotel_id)
+
+
+def set_approval(queryset, approved):
+    """Bulk approve/unapprove reviews and adjust the affected summaries"""
+    changing = queryset.exclude(is_approved=approved)
+    groups = list(
+        changing.order_by().values('hotel_id', 'rating').annotate(total=Count('id'))
+    )
+    updated = changing.update(is_approved=approved)
+    sign = 1 if approved else -1
+    for group in groups:
+        apply_delta(group['hotel_id'], group['rating'], sign * group['total'])
+    return updated
+
+
+def reconcile():
+    """Rebuild every RatingSummary from the reviews table; returns hotels touched"""
+    totals = {
+        row['hotel_id']: row
+        for row in Review.objects.filter(is_approved=True).order_by().values('hotel_id').annotate(
+            review_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{field: Count('id', filter=Q(rating=stars)) for stars, field in enumerate(STAR_FIELDS, start=1)},
+        )
+    }
+
+    summaries = []
+    hotels = list(Hotel.objects.only('id', 'rating', 'total_reviews'))
+    for hotel in hotels:
+        row = totals.get(hotel.id, {})
+        summary = RatingSummary(hotel_id=hotel.id, **{field: row.get(field) or 0 for field in SUMMARY_FIELDS})
+        summaries.append(summary)
+        hotel.rating = summary.average or 0
+        hotel.total_reviews = summary.review_count
+        hotel.updated_at = timezone.now()
+
+    RatingSummary.objects.bulk_create(
+        summaries,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['hotel'],
+        update_fields=SUMMARY_FIELDS,
+    )
+    Hotel.objects.bulk_update(hotels, ['rating', 'total_reviews', 'updated_at'], batch_size=500)
+    bump_detail_version(*(hotel.id for hotel in hotels))
+    return len(hotels)
+
+
+def review_contribution(hotel_id, rating, is_approved):
+    """Counter of (hotel_id, rating) -> reviews counted for one review state"""
+    if not is_approved or hotel_id is None:
+        return Counter()
+    return Counter({(hotel_id, rating): 1})
+
+
+def apply_contributions(before, after):
+    """Apply the difference between two review_contribution() results"""
+    for key in set(before) | set(after):
+        delta = after[key] - before[key]
+        if delta:
+            apply_delta(*key, delta)
@@ -0,0 +1,59 @@
+"""
+Keyset pagination for a hotel's approved reviews
+
+Reviews are listed newest first, ordered by ``(created_at, id)`` so ties on
+the timestamp stay stable. Each page is one range scan on the
+``review_hotel_feed_idx`` index (hotel, is_approved, created_at; SQLite
+appends the rowid, which covers the id tiebreak) no matter how deep the
+reader has scrolled. The cursor is an opaque token encoding the last
+review's ``(created_at, id)``.
+
+File Location: hotels/reviews.py
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+from .models import Review
+
+REVIEWS_PAGE_SIZE = 10
+MAX_REVIEWS_PAGE_SIZE = 50
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(review):
+    raw = f"{review.created_at.isoformat()}|{review.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return ``(created_at, id)`` from a cursor token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        created_at, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor(token) from exc
+
+
+def review_page(hotel, cursor=None, limit=REVIEWS_PAGE_SIZE):
+    """
+    One page of approved reviews after ``cursor`` (None for the first page).
+    Returns ``(reviews, next_cursor)``; next_cursor is None on the last page.
+    """
+    reviews = Review.objects.filter(hotel=hotel, is_approved=True).select_related('author')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        reviews = reviews.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    # One extra row tells us whether another page exists without a COUNT
+    page = list(reviews.order_by('-created_at', '-pk')[:limit + 1])
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(page[-1])
+    return page, None
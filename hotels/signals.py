@@ -0,0 +1,187 @@
+"""
+Hotels App Signals - keep derived hotel data in sync
+
+File Location: hotels/signals.py
+"""
+
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cards import refresh_card
+from .fragments import bump_detail_version, bump_neighbour_versions
+from .models import Amenity, Hotel, HotelImage, RateRule, Review, RoomType
+from .rates import materialise, refresh_lowest_rates
+from .ratings import apply_contributions, review_contribution
+from .similarity import FEATURE_FIELDS, refresh_hotel
+
+SIMILARITY_FIELDS = set(FEATURE_FIELDS) | {'is_active'}
+RATE_FIELDS = {'price_per_night', 'is_available'}
+
+
+@receiver(post_save, sender=Hotel)
+def rebuild_search_card(sender, instance, raw=False, **kwargs):
+    """Precompute the search card as soon as a hotel is saved"""
+    if raw:
+        return
+    refresh_card(instance)
+
+
+@receiver(post_save, sender=Hotel)
+def refresh_related_hotels(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Re-rank the similarity index around a hotel whose features changed"""
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & SIMILARITY_FIELDS:
+        return
+    bump_detail_version(*refresh_hotel(instance.pk))
+
+
+@receiver(post_delete, sender=Hotel)
+def drop_related_hotel(sender, instance, **kwargs):
+    bump_detail_version(*refresh_hotel(instance.pk))
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+def expire_hotel_fragments(sender, instance, raw=False, **kwargs):
+    """
+    Any hotel save (including the amenity_mask save triggered by amenities
+    M2M changes) invalidates its detail fragments and the similar-stays
+    blocks that show it
+    """
+    if raw:
+        return
+    bump_neighbour_versions(instance.pk)
+
+
+@receiver(post_save, sender=RoomType)
+@receiver(post_delete, sender=RoomType)
+@receiver(post_save, sender=HotelImage)
+@receiver(post_delete, sender=HotelImage)
+def expire_parent_hotel_fragments(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump_detail_version(instance.hotel_id)
+
+
+@receiver(m2m_changed, sender=Hotel.amenities.through)
+def sync_amenity_mask(sender, instance, action, reverse, pk_set, **kwargs):
+    """Mirror Hotel.amenities changes into Hotel.amenity_mask"""
+    if action == 'pre_clear' and reverse:
+        # pk_set is not provided on clear; remember which hotels lose the amenity
+        instance._mask_hotel_ids = list(instance.hotel_set.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        instance.refresh_amenity_mask()
+        return
+
+    if action == 'post_clear':
+        hotel_ids = instance.__dict__.pop('_mask_hotel_ids', [])
+    else:
+        hotel_ids = pk_set or []
+    for hotel in Hotel.objects.filter(id__in=hotel_ids):
+        hotel.refresh_amenity_mask()
+
+
+@receiver(pre_delete, sender=Amenity)
+def remember_amenity_hotels(sender, instance, **kwargs):
+    """Cascade deletes of the M2M rows do not fire m2m_changed"""
+    instance._mask_hotel_ids = list(instance.hotel_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Amenity)
+def release_amenity_bit(sender, instance, **kwargs):
+    """Drop the deleted amenity's bit so it can be safely reassigned"""
+    for hotel in Hotel.objects.filter(id__in=instance.__dict__.pop('_mask_hotel_ids', [])):
+        hotel.refresh_amenity_mask()
+
+
+@receiver(post_save, sender=Amenity)
+def expire_amenity_cards(sender, instance, created, raw=False, **kwargs):
+    """Renamed or re-iconed amenities invalidate the cards and pages that show them"""
+    if raw or created:
+        return
+    hotel_ids = list(Hotel.objects.filter(amenities=instance).values_list('id', flat=True))
+    Hotel.objects.filter(id__in=hotel_ids).update(updated_at=timezone.now())
+    bump_detail_version(*hotel_ids)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_state(sender, instance, raw=False, **kwargs):
+    """Capture what the stored review counted for before it changes"""
+    if raw:
+        return
+    previous = None
+    if instance.pk:
+        previous = Review.objects.filter(pk=instance.pk).values('hotel_id', 'rating', 'is_approved').first()
+    instance._rating_contribution = review_contribution(**previous) if previous else review_contribution(None, None, False)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_summary(sender, instance, raw=False, **kwargs):
+    """
+    Apply the created/edited/(un)approved review to the hotel's totals, which
+    also expires the hotel's cached detail fragments
+    """
+    if raw:
+        return
+    before = instance.__dict__.pop('_rating_contribution', review_contribution(None, None, False))
+    after = review_contribution(instance.hotel_id, instance.rating, instance.is_approved)
+    apply_contributions(before, after)
+
+
+@receiver(post_delete, sender=Review)
+def remove_from_rating_summary(sender, instance, **kwargs):
+    before = review_contribution(instance.hotel_id, instance.rating, instance.is_approved)
+    apply_contributions(before, review_contribution(None, None, False))
+
+
+def _cascaded_from(origin, *models):
+    """Whether a post_delete was caused by deleting one of ``models``"""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, models)
+
+
+@receiver(post_save, sender=RoomType)
+def materialise_room_rates(sender, instance, raw=False, update_fields=None, **kwargs):
+    """New rooms and price/availability changes rewrite the room's calendar"""
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & RATE_FIELDS:
+        return
+    materialise(room_type_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=RoomType)
+def drop_room_rates(sender, instance, origin=None, **kwargs):
+    # The calendar rows cascade; only the hotel's lowest rate can move
+    if _cascaded_from(origin, Hotel):
+        return
+    refresh_lowest_rates([instance.hotel_id])
+
+
+@receiver(post_save, sender=RateRule)
+def materialise_rule(sender, instance, raw=False, **kwargs):
+    """
+    Re-expand the hotel's rules; the whole hotel, so a rule moved from one
+    room type to another also clears the old one
+    """
+    if raw:
+        return
+    materialise(hotel_ids=[instance.hotel_id])
+
+
+@receiver(post_delete, sender=RateRule)
+def materialise_without_rule(sender, instance, origin=None, **kwargs):
+    """
+    Re-expand the remaining rules, unless the rule goes with its hotel or room
+    type (writing calendar rows then would orphan them)
+    """
+    if _cascaded_from(origin, Hotel, RoomType):
+        return
+    materialise(hotel_ids=[instance.hotel_id])
@@ -0,0 +1,252 @@
+"""
+Related-hotels similarity index
+
+Each active hotel is turned into a feature vector built from one-hot blocks:
+location zone, property type, effective price band and star category, plus
+its amenity_mask bits. Each block is L2-normalised and weighted, so the 60-odd
+amenity bits cannot drown out location and price. The whole vector is then
+normalised again, which makes cosine similarity a plain dot product. The top
+``RELATED_HOTELS_K`` neighbours per hotel are stored in HotelNeighbour.
+
+``rebuild()`` computes the full similarity matrix in one matrix product and
+stores every hotel's vector in HotelVector. ``refresh_hotel()`` handles a
+single hotel change: it computes only that hotel's vector and scores it
+against the stored vectors (one matrix-vector product). Per stored list it
+reads just the size, the weakest score and whether the hotel is in it, then
+re-ranks only the lists the hotel could enter or leave and updates only the
+HotelNeighbour rows whose neighbour or score actually changed.
+
+File Location: hotels/similarity.py
+"""
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from .models import AMENITY_BIT_LIMIT, Hotel, HotelNeighbour, HotelVector
+
+RELATED_HOTELS_K = 6
+
+# Effective (discounted) nightly price band edges in rupees
+PRICE_BANDS = [1500, 3000, 6000, 12000]
+
+FEATURE_WEIGHTS = {
+    'zone': 3.0,
+    'price': 2.0,
+    'stars': 1.0,
+    'property_type': 1.0,
+    'amenities': 1.5,
+}
+
+ZONES = [key for key, _ in Hotel.LOCATION_ZONES]
+PROPERTY_TYPES = [key for key, _ in Hotel.PROPERTY_TYPES]
+FEATURE_FIELDS = [
+    'id', 'location_zone', 'property_type', 'base_price', 'discount_percentage',
+    'star_rating', 'amenity_mask',
+]
+
+
+def _one_hot(size, index):
+    block = np.zeros(size)
+    if index is not None:
+        block[index] = 1.0
+    return block
+
+
+def _normalise(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def feature_vector(row):
+    """Unit-length feature vector for one ``FEATURE_FIELDS`` values() row"""
+    price = float(row['base_price']) * (100 - row['discount_percentage']) / 100
+    mask = row['amenity_mask']
+    blocks = {
+        'zone': _one_hot(len(ZONES), ZONES.index(row['location_zone']) if row['location_zone'] in ZONES else None),
+        'property_type': _one_hot(
+            len(PROPERTY_TYPES),
+            PROPERTY_TYPES.index(row['property_type']) if row['property_type'] in PROPERTY_TYPES else None,
+        ),
+        'price': _one_hot(len(PRICE_BANDS) + 1, int(np.searchsorted(PRICE_BANDS, price, side='right'))),
+        'stars': _one_hot(5, min(max(row['star_rating'], 1), 5) - 1),
+        'amenities': np.array([(mask >> bit) & 1 for bit in range(AMENITY_BIT_LIMIT)], dtype=float),
+    }
+    vector = np.concatenate([_normalise(blocks[name]) * weight for name, weight in FEATURE_WEIGHTS.items()])
+    return _normalise(vector)
+
+
+def feature_matrix():
+    """``(hotel_ids, matrix)`` with one unit row per active hotel"""
+    rows = list(Hotel.objects.filter(is_active=True).order_by('id').values(*FEATURE_FIELDS))
+    if not rows:
+        return [], np.zeros((0, 0))
+    return [row['id'] for row in rows], np.vstack([feature_vector(row) for row in rows])
+
+
+def top_neighbours(scores, ids, own_index, k=RELATED_HOTELS_K):
+    """Best ``k`` ``(hotel_id, score)`` pairs from one row of similarities"""
+    scores = scores.copy()
+    scores[own_index] = -np.inf
+    k = min(k, len(ids) - 1)
+    if k <= 0:
+        return []
+    best = np.argpartition(-scores, k - 1)[:k]
+    # Stable ordering: higher score first, then lower hotel id
+    best = sorted(best, key=lambda index: (-scores[index], ids[index]))
+    return [(ids[index], float(scores[index])) for index in best]
+
+
+def _write(neighbours_by_hotel):
+    HotelNeighbour.objects.filter(hotel_id__in=list(neighbours_by_hotel)).delete()
+    HotelNeighbour.objects.bulk_create(
+        [
+            HotelNeighbour(hotel_id=hotel_id, neighbour_id=neighbour_id, rank=rank, score=score)
+            for hotel_id, neighbours in neighbours_by_hotel.items()
+            for rank, (neighbour_id, score) in enumerate(neighbours)
+        ],
+        batch_size=500,
+    )
+
+
+def _store_vectors(ids, matrix):
+    HotelVector.objects.bulk_create(
+        [HotelVector(hotel_id=hotel_id, vector=vector.tobytes()) for hotel_id, vector in zip(ids, matrix)],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['hotel'],
+        update_fields=['vector'],
+    )
+
+
+def stored_matrix():
+    """
+    ``(hotel_ids, matrix)`` from the stored vectors of the active hotels;
+    hotels indexed before vectors were stored get theirs computed once
+    """
+    rows = list(
+        Hotel.objects.filter(is_active=True).order_by('id').values_list('id', 'similarity_vector__vector')
+    )
+    if not rows:
+        return [], np.zeros((0, 0))
+    missing = [hotel_id for hotel_id, blob in rows if blob is None]
+    computed = {}
+    if missing:
+        for row in Hotel.objects.filter(id__in=missing).values(*FEATURE_FIELDS):
+            computed[row['id']] = feature_vector(row)
+        _store_vectors(list(computed), list(computed.values()))
+    vectors = [
+        computed[hotel_id] if blob is None else np.frombuffer(blob, dtype=np.float64)
+        for hotel_id, blob in rows
+    ]
+    return [hotel_id for hotel_id, _ in rows], np.vstack(vectors)
+
+
+def _write_changes(neighbours_by_hotel):
+    """
+    Bring the stored lists of the given hotels in line with
+    ``neighbours_by_hotel``, touching only the rows that differ. Returns the
+    ids of hotels whose lists changed.
+    """
+    stored = {
+        (row.hotel_id, row.rank): row
+        for row in HotelNeighbour.objects.filter(hotel_id__in=list(neighbours_by_hotel))
+    }
+    changed, created, changed_hotels = [], [], set()
+    for hotel_id, neighbours in neighbours_by_hotel.items():
+        for rank, (neighbour_id, score) in enumerate(neighbours):
+            row = stored.pop((hotel_id, rank), None)
+            if row is None:
+                created.append(HotelNeighbour(hotel_id=hotel_id, neighbour_id=neighbour_id, rank=rank, score=score))
+            elif (row.neighbour_id, row.score) != (neighbour_id, score):
+                row.neighbour_id, row.score = neighbour_id, score
+                changed.append(row)
+            else:
+                continue
+            changed_hotels.add(hotel_id)
+    if stored:
+        # Lists that got shorter
+        HotelNeighbour.objects.filter(pk__in=[row.pk for row in stored.values()]).delete()
+        changed_hotels.update(row.hotel_id for row in stored.values())
+    HotelNeighbour.objects.bulk_update(changed, ['neighbour', 'score'], batch_size=500)
+    HotelNeighbour.objects.bulk_create(created, batch_size=500)
+    return changed_hotels
+
+
+@transaction.atomic
+def rebuild(k=RELATED_HOTELS_K):
+    """Recompute every hotel's vector and neighbours; returns the number of hotels indexed"""
+    ids, matrix = feature_matrix()
+    HotelNeighbour.objects.all().delete()
+    HotelVector.objects.all().delete()
+    _store_vectors(ids, matrix)
+    if len(ids) < 2:
+        return len(ids)
+    similarity = matrix @ matrix.T
+    _write({hotel_id: top_neighbours(similarity[index], ids, index, k) for index, hotel_id in enumerate(ids)})
+    return len(ids)
+
+
+@transaction.atomic
+def refresh_hotel(hotel_id, k=RELATED_HOTELS_K):
+    """
+    Update the index after one hotel was saved, deactivated or deleted.
+    Returns the ids of hotels whose neighbour lists changed.
+    """
+    row = Hotel.objects.filter(pk=hotel_id, is_active=True).values(*FEATURE_FIELDS).first()
+    changed = set()
+    if row is None:
+        HotelVector.objects.filter(hotel_id=hotel_id).delete()
+        if HotelNeighbour.objects.filter(hotel_id=hotel_id).delete()[0]:
+            changed.add(hotel_id)
+    else:
+        _store_vectors([hotel_id], [feature_vector(row)])
+
+    ids, matrix = stored_matrix()
+    position = {pk: index for index, pk in enumerate(ids)}
+    target = min(k, len(ids) - 1)
+
+    # Size, weakest score and whether the hotel is in it, per stored list
+    lists = {
+        owner_id: (size, tail, holds)
+        for owner_id, size, tail, holds in HotelNeighbour.objects.values('hotel_id')
+        .annotate(size=Count('id'), tail=Min('score'), holds=Count('id', filter=Q(neighbour_id=hotel_id)))
+        .values_list('hotel_id', 'size', 'tail', 'holds')
+        .order_by()
+    }
+
+    dirty = set()
+    if hotel_id in position:
+        scores = matrix @ matrix[position[hotel_id]]
+        dirty.add(hotel_id)
+    for owner_id, index in position.items():
+        if owner_id == hotel_id:
+            continue
+        size, tail, holds = lists.get(owner_id, (0, None, 0))
+        if holds or size < target:
+            # The hotel's score in this list changed (or it left the index),
+            # or the list is short (e.g. after a neighbour was deleted)
+            dirty.add(owner_id)
+        elif hotel_id in position and scores[index] >= tail:
+            # Similarity is symmetric, so scores[index] is what the hotel would
+            # score in owner_id's list; re-rank when it reaches the current tail
+            dirty.add(owner_id)
+
+    dirty = sorted(dirty)
+    rows = [position[owner_id] for owner_id in dirty]
+    similarity = matrix[rows] @ matrix.T if rows else []
+    updates = {
+        owner_id: top_neighbours(similarity[row], ids, position[owner_id], k)
+        for row, owner_id in enumerate(dirty)
+    }
+    return changed | _write_changes(updates)
+
+
+def related_hotels(hotel, limit=3):
+    """Most similar active hotels, read from the precomputed table"""
+    rows = (
+        HotelNeighbour.objects.filter(hotel=hotel, neighbour__is_active=True)
+        .select_related('neighbour')
+        .order_by('rank')[:limit]
+    )
+    return [row.neighbour for row in rows]
@@ -1,8 +1,27 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from .models import Hotel, Review
+from bookings.quotes import quote_room_stay
+from .admin import ReviewAdmin
+from .cards import card_cache_key
+from .models import (
+    FEATURE_FLAG_BITS, Amenity, Hotel, HotelImage, HotelNeighbour, HotelVector, RateCalendar, RateRule, RatingSummary,
+    Review, RoomType, parse_distance_metres,
+)
+from .rates import RATE_HORIZON_DAYS, StayNotSellable, refresh_lowest_rates
+from .reviews import encode_cursor
+from .similarity import feature_vector, rebuild as rebuild_neighbours
 
 
 class ReviewPermissionsTests(TestCase):
@@ -50,3 +69,535 @@ class ReviewPermissionsTests(TestCase):
         response = self.client.post(self.detail_url, {'delete_review_id': self.review.id})
         self.assertEqual(response.status_code, 302)
         self.assertFalse(Review.objects.filter(id=self.review.id).exists())
+
+
+class SearchCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.hotel = Hotel.objects.create(
+            name='Temple View Inn',
+            slug='temple-view-inn',
+            description='Steps from the temple',
+            address='1 Temple Road',
+            distance_from_temple='200m',
+            base_price=2500,
+            has_wifi=True,
+        )
+        self.search_url = reverse('hotels:search')
+
+    def test_card_is_cached_on_save(self):
+        key = card_cache_key(self.hotel.pk, self.hotel.updated_at)
+        entry = cache.get(key)
+        self.assertIsNotNone(entry)
+        self.assertEqual(entry['card']['name'], 'Temple View Inn')
+        self.assertIn('Temple View Inn', entry['html'])
+
+    def test_search_serves_cards_from_cache(self):
+        response = self.client.get(self.search_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['hotel_cards'][0]['id'], 'temple-view-inn')
+        self.assertContains(response, 'Free Wi-Fi')
+
+    def test_partial_save_invalidates_card(self):
+        self.hotel.name = 'Temple View Residency'
+        self.hotel.save(update_fields=['name'])
+        response = self.client.get(self.search_url)
+        self.assertEqual(response.context['hotel_cards'][0]['name'], 'Temple View Residency')
+
+    def test_cold_cache_rebuilds_missing_cards(self):
+        cache.clear()
+        response = self.client.get(self.search_url)
+        self.assertEqual(len(response.context['hotel_cards']), 1)
+        self.assertIsNotNone(cache.get(card_cache_key(self.hotel.pk, self.hotel.updated_at)))
+
+
+class DistanceSortTests(TestCase):
+    def _hotel(self, name, distance):
+        return Hotel.objects.create(
+            name=name,
+            description='Stay',
+            address='Dwarka',
+            distance_from_temple=distance,
+            base_price=2000,
+        )
+
+    def test_parse_distance_metres(self):
+        self.assertEqual(parse_distance_metres('200m from Dwarkadhish Temple'), 200)
+        self.assertEqual(parse_distance_metres('1.2 km'), 1200)
+        self.assertEqual(parse_distance_metres('500 meters'), 500)
+        self.assertIsNone(parse_distance_metres('5 min walk'))
+        self.assertIsNone(parse_distance_metres(''))
+
+    def test_distance_is_stored_on_save(self):
+        hotel = self._hotel('Near', '350 m')
+        self.assertEqual(hotel.distance_m, 350)
+        hotel.distance_from_temple = '2 km'
+        hotel.save(update_fields=['distance_from_temple'])
+        hotel.refresh_from_db()
+        self.assertEqual(hotel.distance_m, 2000)
+
+    def test_search_sorts_and_filters_by_distance(self):
+        self._hotel('Far', '1.5 km')
+        self._hotel('Unknown', 'Near the beach')
+        self._hotel('Close', '150m')
+        url = reverse('hotels:search')
+
+        response = self.client.get(url, {'sort': 'distance'})
+        names = [card['name'] for card in response.context['hotel_cards']]
+        self.assertEqual(names, ['Close', 'Far', 'Unknown'])
+
+        response = self.client.get(url, {'sort': 'distance', 'max_distance': 1000})
+        names = [card['name'] for card in response.context['hotel_cards']]
+        self.assertEqual(names, ['Close'])
+
+
+class AmenityMaskTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pool = Amenity.objects.create(name='Pool', icon='fa-swimmer')
+        self.spa = Amenity.objects.create(name='Spa', icon='fa-spa')
+        self.hotel = Hotel.objects.create(
+            name='Sea Breeze',
+            description='By the beach',
+            address='Beach Road',
+            distance_from_temple='1 km',
+            base_price=3000,
+            has_wifi=True,
+        )
+        self.other = Hotel.objects.create(
+            name='Plain Stay',
+            description='Simple rooms',
+            address='Market Road',
+            distance_from_temple='300m',
+            base_price=1500,
+        )
+
+    def test_mask_tracks_flags_and_m2m(self):
+        self.hotel.amenities.add(self.pool, self.spa)
+        self.hotel.refresh_from_db()
+        expected = FEATURE_FLAG_BITS['wifi'] | (1 << self.pool.bit) | (1 << self.spa.bit)
+        self.assertEqual(self.hotel.amenity_mask, expected)
+
+        self.pool.hotel_set.remove(self.hotel)
+        self.hotel.refresh_from_db()
+        self.assertFalse(self.hotel.amenity_mask & (1 << self.pool.bit))
+
+        self.spa.delete()
+        self.hotel.refresh_from_db()
+        self.assertEqual(self.hotel.amenity_mask, FEATURE_FLAG_BITS['wifi'])
+
+    def test_multi_amenity_filter_uses_mask(self):
+        self.hotel.amenities.add(self.pool, self.spa)
+        self.other.amenities.add(self.pool)
+        response = self.client.get(
+            reverse('hotels:search'), {'amenity': [self.pool.id, self.spa.id]}
+        )
+        names = [card['name'] for card in response.context['hotel_cards']]
+        self.assertEqual(names, ['Sea Breeze'])
+        labels = [feature['label'] for feature in response.context['hotel_cards'][0]['features']]
+        self.assertEqual(labels, ['Free Wi-Fi', 'Pool', 'Spa'])
+
+
+class RatingSummaryTests(TestCase):
+    def setUp(self):
+        self.hotel = Hotel.objects.create(
+            name='Gomti Residency',
+            description='Near the ghat',
+            address='Ghat Road',
+            distance_from_temple='400m',
+            base_price=1800,
+        )
+
+    def _review(self, rating, approved=True):
+        return Review.objects.create(
+            hotel=self.hotel,
+            guest_name='Guest',
+            rating=rating,
+            comment='Stay',
+            stay_date='2024-01-01',
+            is_approved=approved,
+        )
+
+    def _summary(self):
+        return RatingSummary.objects.get(hotel=self.hotel)
+
+    def test_create_edit_delete_update_totals(self):
+        first = self._review(5)
+        self._review(3)
+        self._review(1, approved=False)
+        summary = self._summary()
+        self.assertEqual((summary.review_count, summary.rating_sum), (2, 8))
+        self.assertEqual((summary.stars_5, summary.stars_3, summary.stars_1), (1, 1, 0))
+
+        first.rating = 4
+        first.save(update_fields=['rating'])
+        summary = self._summary()
+        self.assertEqual((summary.rating_sum, summary.stars_5, summary.stars_4), (7, 0, 1))
+
+        first.delete()
+        self.hotel.refresh_from_db()
+        self.assertEqual(self.hotel.total_reviews, 1)
+        self.assertEqual(self.hotel.rating, Decimal('3.00'))
+
+    def test_admin_bulk_approval_adjusts_totals(self):
+        self._review(4, approved=False)
+        self._review(2, approved=False)
+        admin_view = ReviewAdmin(Review, None)
+        admin_view.message_user = lambda *args, **kwargs: None
+        admin_view.approve_reviews(None, Review.objects.all())
+        self.assertEqual(self._summary().review_count, 2)
+        self.hotel.refresh_from_db()
+        self.assertEqual(self.hotel.rating, Decimal('3.00'))
+
+        admin_view.unapprove_reviews(None, Review.objects.filter(rating=4))
+        summary = self._summary()
+        self.assertEqual((summary.review_count, summary.stars_4, summary.stars_2), (1, 0, 1))
+
+    def test_details_page_reads_totals_without_writing(self):
+        self._review(5)
+        self._review(4)
+        url = reverse('hotels:details', args=[self.hotel.slug])
+        self.hotel.refresh_from_db()
+        before = self.hotel.updated_at
+        response = self.client.get(url)
+        self.assertEqual(response.context['dynamic_rating'], 4.5)
+        self.assertEqual(response.context['rating_distribution'][0], (5, 1, 50))
+        self.hotel.refresh_from_db()
+        self.assertEqual(self.hotel.updated_at, before)
+
+    def test_reconcile_rebuilds_from_reviews(self):
+        self._review(5)
+        self._review(2)
+        RatingSummary.objects.all().update(review_count=9, rating_sum=1, stars_5=0)
+        Hotel.objects.filter(pk=self.hotel.pk).update(rating=1, total_reviews=9)
+        call_command('reconcile_ratings', stdout=StringIO())
+        summary = self._summary()
+        self.assertEqual((summary.review_count, summary.rating_sum, summary.stars_5), (2, 7, 1))
+        self.hotel.refresh_from_db()
+        self.assertEqual((self.hotel.rating, self.hotel.total_reviews), (Decimal('3.50'), 2))
+
+
+class ReviewPaginationTests(TestCase):
+    def setUp(self):
+        self.hotel = Hotel.objects.create(
+            name='Dwarkadhish Lords',
+            description='Temple side',
+            address='Temple Road',
+            distance_from_temple='100m',
+            base_price=2200,
+        )
+        self.reviews = [
+            Review.objects.create(
+                hotel=self.hotel,
+                guest_name=f'Guest {index}',
+                rating=4,
+                comment='Good',
+                stay_date='2024-01-01',
+                is_approved=True,
+            )
+            for index in range(25)
+        ]
+        # Identical timestamps force the id tiebreak
+        Review.objects.filter(hotel=self.hotel).update(created_at=self.reviews[0].created_at)
+        self.reviews_url = reverse('hotels:reviews', args=[self.hotel.slug])
+
+    def test_details_page_embeds_first_page_only(self):
+        response = self.client.get(reverse('hotels:details', args=[self.hotel.slug]))
+        self.assertEqual(len(response.context['reviews']), 10)
+        self.assertIsNotNone(response.context['next_review_cursor'])
+        self.assertNotIn('all_reviews', response.context)
+
+    def test_cursor_walks_every_review_once(self):
+        seen = []
+        response = self.client.get(reverse('hotels:details', args=[self.hotel.slug]))
+        seen += [review.id for review in response.context['reviews']]
+        cursor = response.context['next_review_cursor']
+        while cursor:
+            data = self.client.get(self.reviews_url, {'cursor': cursor}).json()
+            seen += [review['id'] for review in data['reviews']]
+            self.assertEqual(data['html'].count('list-group-item'), len(data['reviews']))
+            cursor = data['next_cursor']
+        expected = sorted((review.id for review in self.reviews), reverse=True)
+        self.assertEqual(seen, expected)
+
+    def test_page_is_a_single_query(self):
+        cursor = encode_cursor(Review.objects.get(pk=self.reviews[20].pk))
+        with self.assertNumQueries(2):  # hotel lookup + one keyset page
+            data = self.client.get(self.reviews_url, {'cursor': cursor, 'limit': 5}).json()
+        self.assertEqual(len(data['reviews']), 5)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.reviews_url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RelatedHotelsTests(TestCase):
+    def _hotel(self, name, zone, price, **extra):
+        return Hotel.objects.create(
+            name=name,
+            description='Stay',
+            address='Road',
+            distance_from_temple='500m',
+            location_zone=zone,
+            base_price=price,
+            **extra,
+        )
+
+    def setUp(self):
+        self.temple = self._hotel('Temple One', 'dwarkadhish', 2000, has_wifi=True)
+        self.twin = self._hotel('Temple Two', 'dwarkadhish', 2200, has_wifi=True)
+        self.beach = self._hotel('Beach Resort', 'dwarka_beach', 15000, property_type='resort', star_rating=5)
+
+    def _neighbours(self, hotel):
+        return list(HotelNeighbour.objects.filter(hotel=hotel).values_list('neighbour_id', flat=True))
+
+    def test_incremental_index_matches_full_rebuild(self):
+        self.assertEqual(self._neighbours(self.temple)[0], self.twin.id)
+        self._hotel('Temple Three', 'dwarkadhish', 2100, has_wifi=True)
+        self.beach.location_zone = 'dwarkadhish'
+        self.beach.save(update_fields=['location_zone'])
+        self.twin.delete()
+        incremental = {hotel.id: self._neighbours(hotel) for hotel in Hotel.objects.all()}
+        rebuild_neighbours()
+        rebuilt = {hotel.id: self._neighbours(hotel) for hotel in Hotel.objects.all()}
+        self.assertEqual(incremental, rebuilt)
+
+    def test_refresh_scores_one_vector_and_touches_changed_rows(self):
+        self.assertEqual(HotelVector.objects.count(), 3)
+        before = dict(HotelNeighbour.objects.values_list('pk', 'neighbour_id'))
+        self.beach.star_rating = 3
+        with mock.patch('hotels.similarity.feature_vector', wraps=feature_vector) as computed, \
+                CaptureQueriesContext(connection) as queries:
+            self.beach.save(update_fields=['star_rating'])
+        self.assertEqual(computed.call_count, 1)
+        # Same ranking everywhere: only the beach's scores are rewritten, in place
+        self.assertEqual(dict(HotelNeighbour.objects.values_list('pk', 'neighbour_id')), before)
+        writes = [query['sql'] for query in queries.captured_queries
+                  if 'hotels_hotelneighbour' in query['sql'] and not query['sql'].startswith('SELECT')]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+
+    def test_inactive_hotels_leave_the_index(self):
+        self.twin.is_active = False
+        self.twin.save()
+        self.assertEqual(self._neighbours(self.twin), [])
+        self.assertNotIn(self.twin.id, self._neighbours(self.temple))
+
+    def test_details_page_shows_most_similar_first(self):
+        response = self.client.get(reverse('hotels:details', args=[self.temple.slug]))
+        self.assertEqual(response.context['related_hotels'], [self.twin, self.beach])
+
+
+class DetailFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = get_user_model().objects.create_user(username='pilgrim', password='pass123')
+        self.hotel = Hotel.objects.create(
+            name='Gomti View',
+            description='Overlooks the ghat',
+            address='Ghat Road',
+            distance_from_temple='300m',
+            base_price=2400,
+        )
+        RoomType.objects.create(hotel=self.hotel, name='Deluxe Room', price_per_night=2400)
+        Review.objects.create(
+            hotel=self.hotel,
+            guest_name='Pilgrim',
+            rating=5,
+            comment='Lovely',
+            stay_date='2024-01-01',
+            is_approved=True,
+            author=self.author,
+        )
+        self.url = reverse('hotels:details', args=[self.hotel.slug])
+
+    def _queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, len(queries)
+
+    def test_warm_page_skips_fragment_queries(self):
+        cold, cold_queries = self._queries()
+        warm, warm_queries = self._queries()
+        self.assertLess(warm_queries, cold_queries)
+        self.assertEqual(warm_queries, 2)  # hotel + first review page
+        self.assertEqual(cold.context['fragments'], warm.context['fragments'])
+
+    def test_related_writes_expire_fragments(self):
+        self.client.get(self.url)
+        RoomType.objects.create(hotel=self.hotel, name='Temple Suite', price_per_night=5200)
+        self.assertContains(self.client.get(self.url), 'Temple Suite')
+
+        self.hotel.amenities.add(Amenity.objects.create(name='Rooftop Aarti Deck', icon='fa-om'))
+        self.assertContains(self.client.get(self.url), 'Rooftop Aarti Deck')
+
+        image = HotelImage.objects.create(hotel=self.hotel, image='hotels/gallery/ghat.jpg')
+        self.assertContains(self.client.get(self.url), image.image.url)
+
+        Review.objects.create(
+            hotel=self.hotel, guest_name='Second', rating=3, comment='Ok',
+            stay_date='2024-02-01', is_approved=True,
+        )
+        self.assertContains(self.client.get(self.url), '2 guests')
+
+    def test_per_user_parts_render_with_warm_fragments(self):
+        self.client.get(self.url)
+        anonymous = self.client.get(self.url)
+        self.assertNotContains(anonymous, 'Edit Review')
+
+        self.client.login(username='pilgrim', password='pass123')
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Edit Review')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+        response = self.client.post(self.url, {
+            'guest_name': 'Pilgrim', 'rating': 4, 'comment': 'Again', 'stay_date': '2024-03-01',
+        }, follow=True)
+        self.assertContains(response, 'Thank you for your review!')
+
+
+class RateCalendarTests(TestCase):
+    """Staff rules are expanded into per-night rates that pricing reads directly"""
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        # Start the stays on the next Monday so weekday rules are predictable
+        self.monday = self.today + timedelta(days=7 - self.today.weekday())
+        self.hotel = Hotel.objects.create(
+            name="Rate Inn", description="Rates", address="Temple Road",
+            distance_from_temple="150m", base_price=Decimal('2500.00'),
+        )
+        self.room = RoomType.objects.create(hotel=self.hotel, name="Deluxe", price_per_night=Decimal('2000.00'))
+
+    def night(self, day):
+        return RateCalendar.objects.get(room_type=self.room, date=day)
+
+    def test_rules_materialise_with_precedence(self):
+        self.assertEqual(self.night(self.today).rate, Decimal('2000.00'))
+        RateRule.objects.create(
+            hotel=self.hotel, name="Weekend", start_date=self.today, end_date=self.today + timedelta(days=60),
+            weekdays=0b1100000, adjustment_percentage=50,
+        )
+        saturday = self.monday + timedelta(days=5)
+        RateRule.objects.create(
+            hotel=self.hotel, room_type=self.room, name="Janmashtami", start_date=saturday,
+            end_date=saturday + timedelta(days=1), rate=Decimal('5000.00'), min_stay=2, priority=1,
+        )
+        self.assertEqual(self.night(self.monday).rate, Decimal('2000.00'))
+        self.assertEqual(self.night(self.monday + timedelta(days=12)).rate, Decimal('3000.00'))
+        festival = self.night(saturday)
+        self.assertEqual((festival.rate, festival.min_stay), (Decimal('5000.00'), 2))
+
+        # Deleting the festival rule falls back to the weekend rate
+        RateRule.objects.get(name="Janmashtami").delete()
+        self.assertEqual((self.night(saturday).rate, self.night(saturday).min_stay), (Decimal('3000.00'), 1))
+
+    def test_stay_priced_with_one_range_query(self):
+        RateRule.objects.create(
+            hotel=self.hotel, name="Festival", start_date=self.monday + timedelta(days=1),
+            end_date=self.monday + timedelta(days=1), rate=Decimal('4000.00'),
+        )
+        with self.assertNumQueries(1):
+            quote = quote_room_stay(self.hotel, self.room.id, self.monday, self.monday + timedelta(days=3))
+        self.assertEqual((quote.base_price, quote.nightly_rate), (Decimal('8000.00'), Decimal('2666.67')))
+
+    def test_closed_nights_and_min_stay_are_refused(self):
+        RateRule.objects.create(
+            hotel=self.hotel, name="Renovation", start_date=self.monday, end_date=self.monday, is_closed=True,
+        )
+        RateRule.objects.create(
+            hotel=self.hotel, name="Long weekend", start_date=self.monday + timedelta(days=4),
+            end_date=self.monday + timedelta(days=6), min_stay=3,
+        )
+        with self.assertRaises(StayNotSellable):
+            quote_room_stay(self.hotel, self.room.id, self.monday, self.monday + timedelta(days=2))
+        with self.assertRaises(StayNotSellable):
+            quote_room_stay(self.hotel, self.room.id, self.monday + timedelta(days=4), self.monday + timedelta(days=6))
+        quote = quote_room_stay(self.hotel, self.room.id, self.monday + timedelta(days=4), self.monday + timedelta(days=7))
+        self.assertEqual(quote.nights, 3)
+
+    def test_stays_beyond_the_calendar_use_room_rates_and_rules(self):
+        start = self.monday + timedelta(days=RATE_HORIZON_DAYS + 7)
+        self.assertFalse(RateCalendar.objects.filter(date__gte=start).exists())
+        RateRule.objects.create(
+            hotel=self.hotel, name="Festival", start_date=start + timedelta(days=1),
+            end_date=start + timedelta(days=1), rate=Decimal('4000.00'), min_stay=3,
+        )
+        RateRule.objects.create(
+            hotel=self.hotel, name="Renovation", start_date=start + timedelta(days=5),
+            end_date=start + timedelta(days=5), is_closed=True,
+        )
+        quote = quote_room_stay(self.hotel, self.room.id, start, start + timedelta(days=3))
+        # Priced from the room (2000) and the rule, not the hotel's 2500
+        self.assertEqual(quote.base_price, Decimal('8000.00'))
+        with self.assertRaises(StayNotSellable):
+            quote_room_stay(self.hotel, self.room.id, start, start + timedelta(days=2))
+        with self.assertRaises(StayNotSellable):
+            quote_room_stay(self.hotel, self.room.id, start + timedelta(days=4), start + timedelta(days=6))
+        self.assertFalse(RateCalendar.objects.filter(date__gte=start).exists())
+
+    def test_search_totals_use_the_cheapest_sellable_room(self):
+        RoomType.objects.create(hotel=self.hotel, name="Suite", price_per_night=Decimal('3500.00'))
+        RateRule.objects.create(
+            hotel=self.hotel, room_type=self.room, name="Closed", start_date=self.monday + timedelta(days=7),
+            end_date=self.monday + timedelta(days=7), is_closed=True,
+        )
+        search = reverse('hotels:search')
+        card = self.client.get(search, {'checkin': self.monday, 'checkout': self.monday + timedelta(days=2)}).context['hotel_cards'][0]
+        self.assertEqual((card['stayTotal'], card['stayNights']), (4480.0, 2))
+        # Deluxe is closed on the second Monday, so the Suite is the cheapest left
+        card = self.client.get(search, {
+            'checkin': self.monday + timedelta(days=7), 'checkout': self.monday + timedelta(days=8),
+        }).context['hotel_cards'][0]
+        self.assertEqual(card['stayTotal'], 3920.0)
+
+    def test_lowest_rate_drives_price_sort(self):
+        budget = Hotel.objects.create(
+            name="Budget Stay", description="Cheap", address="Beach Road",
+            distance_from_temple="900m", base_price=Decimal('1000.00'),
+        )
+        RoomType.objects.create(hotel=budget, name="Standard", price_per_night=Decimal('3000.00'))
+        RoomType.objects.create(hotel=self.hotel, name="Dorm", price_per_night=Decimal('900.00'), is_available=False)
+        self.hotel.refresh_from_db()
+        budget.refresh_from_db()
+        # Closed (unavailable) rooms do not count towards the lowest rate
+        self.assertEqual((self.hotel.lowest_rate_30d, budget.lowest_rate_30d), (Decimal('2000.00'), Decimal('3000.00')))
+
+        response = self.client.get(reverse('hotels:search'), {'sort': 'price_low'})
+        self.assertEqual([card['name'] for card in response.context['hotel_cards']], ["Rate Inn", "Budget Stay"])
+
+        # The hotel discount applies to the sort and the price filter alike
+        Hotel.objects.filter(pk=budget.pk).update(discount_percentage=50)
+        response = self.client.get(reverse('hotels:search'), {'sort': 'price_low'})
+        self.assertEqual([card['name'] for card in response.context['hotel_cards']], ["Budget Stay", "Rate Inn"])
+        response = self.client.get(reverse('hotels:search'), {'min_price': 1600, 'max_price': 1900})
+        self.assertEqual([card['name'] for card in response.context['hotel_cards']], [])
+        response = self.client.get(reverse('hotels:search'), {'min_price': 1400, 'max_price': 1600})
+        self.assertEqual([card['name'] for card in response.context['hotel_cards']], ["Budget Stay"])
+
+        RateRule.objects.create(
+            hotel=self.hotel, name="Closed", start_date=self.today, end_date=self.today + timedelta(days=40),
+            is_closed=True,
+        )
+        refresh_lowest_rates()
+        self.hotel.refresh_from_db()
+        self.assertIsNone(self.hotel.lowest_rate_30d)
+
+    def test_master_manages_rules(self):
+        staff = get_user_model().objects.create_superuser(username='staff', email='s@example.com', password='pass123')
+        self.client.force_login(staff)
+        response = self.client.post(reverse('master:rate-create', args=[self.hotel.id]), {
+            'name': 'Diwali', 'room_type': '', 'start_date': self.monday, 'end_date': self.monday + timedelta(days=2),
+            'weekdays': ['0', '1'], 'rate': '', 'adjustment_percentage': 25, 'min_stay': 1, 'priority': 0,
+        })
+        self.assertRedirects(response, reverse('master:hotel-rates', args=[self.hotel.id]))
+        rule = RateRule.objects.get()
+        self.assertEqual(rule.weekdays, 0b11)
+        self.assertEqual(self.night(self.monday + timedelta(days=1)).rate, Decimal('2500.00'))
+        self.assertEqual(self.night(self.monday + timedelta(days=2)).rate, Decimal('2000.00'))
+
+        page = self.client.get(reverse('master:hotel-rates', args=[self.hotel.id]))
+        self.assertContains(page, 'Diwali')
+        self.client.post(reverse('master:rate-delete', args=[rule.pk]))
+        self.assertEqual(self.night(self.monday).rate, Decimal('2000.00'))
@@ -11,4 +11,6 @@ urlpatterns = [
     path("", views.search_hotels, name="search"),
     # Individual hotel details page using slug in the URL
     path("<slug:slug>/", views.hotel_details, name="details"),
+    # "Load more" pages of approved reviews (keyset cursor)
+    path("<slug:slug>/reviews/", views.hotel_reviews, name="reviews"),
 ]
\ No newline at end of file
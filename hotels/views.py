@@ -1,13 +1,41 @@
 """Hotels app views - Search, Details, Filters"""
 
-import re
-
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Value
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404
-from django.urls import reverse
+from django.template.loader import render_to_string
+
+from bookings.availability import available_hotel_ids, parse_stay
+from bookings.quotes import cheapest_stays
+
+from .cards import get_cards
+from .fragments import get_fragments
+from .models import FEATURE_FLAG_BITS, Amenity, Hotel, Review
+from .reviews import MAX_REVIEWS_PAGE_SIZE, REVIEWS_PAGE_SIZE, InvalidCursor, review_page
+
+
+def amenity_filter_mask(values):
+    """
+    Translate amenity filter values (Amenity ids or has_* keys such as
+    "wifi") into an amenity_mask. Returns ``(mask, unmapped_ids)``.
+    """
+    mask = 0
+    amenity_ids = []
+    for value in values:
+        if value in FEATURE_FLAG_BITS:
+            mask |= FEATURE_FLAG_BITS[value]
+        elif str(value).isdigit():
+            amenity_ids.append(int(value))
 
-from .models import Amenity, Hotel, Review
+    mapped = set()
+    if amenity_ids:
+        bits = Amenity.objects.filter(id__in=amenity_ids, bit__isnull=False).values_list('id', 'bit')
+        for amenity_id, bit in bits:
+            mask |= 1 << bit
+            mapped.add(amenity_id)
+    return mask, [amenity_id for amenity_id in amenity_ids if amenity_id not in mapped]
 
 
 LOCATION_LABEL_TO_ZONE = {
@@ -22,9 +50,11 @@ def search_hotels(request):
     
     # Get search parameters
     location = request.GET.get('location', 'Dwarka, Gujarat')
-    checkin = request.GET.get('checkin', '')
-    checkout = request.GET.get('checkout', '')
+    # The home page form posts checkIn/checkOut; older links use lowercase
+    checkin = request.GET.get('checkin') or request.GET.get('checkIn', '')
+    checkout = request.GET.get('checkout') or request.GET.get('checkOut', '')
     guests = request.GET.get('guests', '2')
+    rooms = request.GET.get('rooms', '1')
     
     # Get filter parameters
     min_price = request.GET.get('min_price', 500)
@@ -32,6 +62,7 @@ def search_hotels(request):
     star_ratings = request.GET.getlist('star_rating')
     property_types = request.GET.getlist('property_type')
     amenities = request.GET.getlist('amenity')
+    max_distance = request.GET.get('max_distance', '')
     
     # Sort parameter
     sort_by = request.GET.get('sort', 'recommended')
@@ -43,13 +74,24 @@ def search_hotels(request):
     if zone:
         hotels = hotels.filter(location_zone=zone)
     
+    # Filter and sort on one nightly price: the lowest calendar rate for the
+    # next 30 days (hotels/rates.py), or base_price for hotels without a
+    # calendar, less the hotel discount
+    hotels = hotels.alias(
+        nightly_price=ExpressionWrapper(
+            Coalesce(F('lowest_rate_30d'), F('base_price'))
+            * (Value(100) - F('discount_percentage')) / Value(100.0),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+    )
+
     # Apply price filter
     try:
         min_price = float(min_price)
         max_price = float(max_price)
         hotels = hotels.filter(
-            base_price__gte=min_price,
-            base_price__lte=max_price
+            nightly_price__gte=min_price,
+            nightly_price__lte=max_price
         )
     except (ValueError, TypeError):
         pass
@@ -62,85 +104,84 @@ def search_hotels(request):
     if property_types:
         hotels = hotels.filter(property_type__in=property_types)
     
-    # Apply amenity filter
+    # Apply walking distance filter (metres from Dwarkadhish Temple)
+    if max_distance:
+        try:
+            hotels = hotels.filter(distance_m__lte=int(max_distance))
+        except (ValueError, TypeError):
+            pass
+    
+    # Apply amenity filter as a single bitwise predicate on amenity_mask
     if amenities:
-        for amenity_id in amenities:
+        required_mask, unmapped = amenity_filter_mask(amenities)
+        if required_mask:
+            hotels = hotels.alias(
+                matched_amenities=F('amenity_mask').bitand(required_mask)
+            ).filter(matched_amenities=required_mask)
+        for amenity_id in unmapped:
+            # Amenities beyond the bitmask capacity fall back to a join
             hotels = hotels.filter(amenities__id=amenity_id)
     
+    # Only keep hotels that can still sell rooms for the requested stay
+    stay = parse_stay(checkin, checkout)
+    if stay:
+        try:
+            guests_count = max(int(guests), 1)
+            rooms_count = max(int(rooms), 1)
+        except (ValueError, TypeError):
+            guests_count, rooms_count = 1, 1
+        available_ids = available_hotel_ids(
+            *stay,
+            guests=guests_count,
+            rooms=rooms_count,
+            hotel_ids=hotels.values('id'),
+        )
+        hotels = hotels.filter(id__in=available_ids)
+    
     # Apply sorting
     if sort_by == 'price_low':
-        hotels = hotels.order_by('base_price')
+        hotels = hotels.order_by('nightly_price', 'id')
     elif sort_by == 'price_high':
-        hotels = hotels.order_by('-base_price')
+        hotels = hotels.order_by('-nightly_price', 'id')
     elif sort_by == 'rating':
         hotels = hotels.order_by('-rating')
     elif sort_by == 'distance':
-        # You can implement custom distance sorting
-        pass
+        hotels = hotels.order_by(F('distance_m').asc(nulls_last=True), '-rating')
     else:  # recommended
         hotels = hotels.order_by('-is_featured', '-rating')
     
-    default_image = "https://images.unsplash.com/photo-1582719508461-905c673771fd?w=300&h=250&fit=crop"
-    hotel_cards = []
-    for idx, hotel in enumerate(hotels, start=1):
-        distance_label = hotel.distance_from_temple or "Dwarka"
-        match = re.search(r"[\d.]+", distance_label)
-        distance_value = float(match.group()) if match else 0
-
-        amenities_list = []
-        features = []
-
-        if hotel.has_wifi:
-            amenities_list.append('wifi')
-            features.append({"icon": "fas fa-wifi", "label": "Free Wi-Fi"})
-        if hotel.has_breakfast:
-            amenities_list.append('breakfast')
-            features.append({"icon": "fas fa-coffee", "label": "Breakfast"})
-        if hotel.has_temple_view:
-            amenities_list.append('templeview')
-            features.append({"icon": "fas fa-om", "label": "Temple View"})
-        if hotel.has_parking:
-            amenities_list.append('parking')
-            features.append({"icon": "fas fa-parking", "label": "Parking"})
-        if hotel.has_ac:
-            amenities_list.append('ac')
-            features.append({"icon": "fas fa-snowflake", "label": "AC Rooms"})
-
-        discount_label = f"{hotel.discount_percentage}% OFF" if hotel.discount_percentage else ""
-
-        hotel_cards.append({
-            "id": hotel.slug,
-            "name": hotel.name,
-            "badge": hotel.badge or "",
-            "rating": float(hotel.rating or 0),
-            "reviews": hotel.total_reviews or 0,
-            "distance": distance_value,
-            "distanceLabel": distance_label,
-            "description": (hotel.description or "")[:200],
-            "price": float(hotel.discounted_price or 0),
-            "originalPrice": float(hotel.base_price or 0),
-            "discountLabel": discount_label,
-            "img": hotel.main_image.url if getattr(hotel.main_image, 'url', None) else default_image,
-            "link": reverse('hotels:details', args=[hotel.slug]),
-            "propertyType": hotel.property_type,
-            "amenities": amenities_list,
-            "features": features,
-            "order": idx,
-        })
+    # Only ids, revisions and rates are read here; the cards themselves come from cache
+    rows = list(hotels.values_list('id', 'updated_at', 'discount_percentage'))
+    hotel_cards, hotel_card_fragments = get_cards([(hotel_id, updated_at) for hotel_id, updated_at, _ in rows])
+
+    if stay:
+        # Whole-stay totals for the requested dates: the cheapest sellable
+        # room type, priced by the same quote engine as the booking page
+        nights = (stay[1] - stay[0]).days
+        quotes = cheapest_stays(
+            {hotel_id: discount_percentage for hotel_id, _, discount_percentage in rows}, *stay, rooms_count
+        )
+        for card in hotel_cards:
+            # card['order'] is the 1-based position of the card's row
+            quote = quotes.get(rows[card['order'] - 1][0])
+            if quote is not None:
+                card['stayTotal'] = float(quote.total)
+                card['stayNights'] = nights
 
     # Get all amenities for filter display
     all_amenities = Amenity.objects.all()
     
     context = {
-        'hotels': hotels,
-        'hotels_count': hotels.count(),
+        'hotels_count': len(hotel_cards),
         'all_amenities': all_amenities,
         'hotel_cards': hotel_cards,
+        'hotel_card_fragments': hotel_card_fragments,
         'search_params': {
             'location': location,
             'checkin': checkin,
             'checkout': checkout,
             'guests': guests,
+            'rooms': rooms,
         },
         'filters': {
             'min_price': min_price,
@@ -148,6 +189,7 @@ def search_hotels(request):
             'star_ratings': star_ratings,
             'property_types': property_types,
             'amenities': amenities,
+            'max_distance': max_distance,
             'sort_by': sort_by,
         }
     }
@@ -204,42 +246,52 @@ def hotel_details(request, slug):
             messages.success(request, 'Thank you for your review!')
             return redirect(request.path)
 
-    all_reviews = Review.objects.filter(hotel=hotel, is_approved=True)
-    reviews = all_reviews[:10]
-    room_types = hotel.room_types.filter(is_available=True)
-    related_hotels = Hotel.objects.filter(
-        is_active=True
-    ).exclude(id=hotel.id)[:3]
-    gallery_images = hotel.images.all()
-    amenities = hotel.amenities.all()
+    reviews, next_review_cursor = review_page(hotel)
     from django.urls import reverse
     booking_url = reverse('bookings:booking_page', args=[hotel.slug])
 
-    # Calculate dynamic average rating and update hotel.rating
-    if all_reviews.exists():
-        dynamic_rating = round(sum(r.rating for r in all_reviews) / all_reviews.count(), 2)
-        if hotel.rating != dynamic_rating:
-            hotel.rating = dynamic_rating
-            hotel.total_reviews = all_reviews.count()
-            hotel.save(update_fields=["rating", "total_reviews"])
-    else:
-        dynamic_rating = None
-        if hotel.rating != 0:
-            hotel.rating = 0
-            hotel.total_reviews = 0
-            hotel.save(update_fields=["rating", "total_reviews"])
-
     context = {
         'hotel': hotel,
+        # Shared blocks come from the versioned fragment cache (hotels/fragments.py);
+        # reviews carry per-user edit/delete controls and are rendered per request
+        'fragments': get_fragments(hotel),
         'reviews': reviews,
-        'room_types': room_types,
-        'related_hotels': related_hotels,
-        'gallery_images': gallery_images,
-        'amenities': amenities,
         'booking_url': booking_url,
-        'dynamic_rating': dynamic_rating,
-        'all_reviews': all_reviews,
+        'next_review_cursor': next_review_cursor,
     }
     
     return render(request, 'hotels/hotel_details.html', context)
 
+
+
+def hotel_reviews(request, slug):
+    """Next page of approved reviews for "load more" (JSON with an HTML fragment)"""
+    hotel = get_object_or_404(Hotel, slug=slug, is_active=True)
+    try:
+        limit = min(max(int(request.GET.get('limit', REVIEWS_PAGE_SIZE)), 1), MAX_REVIEWS_PAGE_SIZE)
+    except ValueError:
+        limit = REVIEWS_PAGE_SIZE
+    try:
+        reviews, next_cursor = review_page(hotel, request.GET.get('cursor') or None, limit)
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    html = ''.join(
+        render_to_string('hotels/partials/review_item.html', {'review': review}, request=request)
+        for review in reviews
+    )
+    return JsonResponse({
+        'reviews': [
+            {
+                'id': review.id,
+                'guest_name': review.guest_name,
+                'rating': review.rating,
+                'comment': review.comment,
+                'stay_date': review.stay_date.isoformat(),
+                'created_at': review.created_at.isoformat(),
+            }
+            for review in reviews
+        ],
+        'html': html,
+        'next_cursor': next_cursor,
+    })
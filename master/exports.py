@@ -0,0 +1,124 @@
+"""
+Streaming bookings export for finance
+
+Bookings for a date range are written as CSV or NDJSON (one JSON object per
+line) with the hotel, room type, guest and payment columns joined in. Rows
+come from ``.values_list()`` read with ``iterator(chunk_size=...)`` and are
+encoded a chunk at a time into a StreamingHttpResponse, so memory stays flat
+and the first bytes go out before the last rows are read, however long the
+range. No model instances are built and nothing is looked up per row.
+
+File Location: master/exports.py
+"""
+
+import csv
+import io
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from bookings.models import Booking
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (column header, lookup) in output order
+EXPORT_COLUMNS = [
+    ("booking_id", "booking_id"),
+    ("created_at", "created_at"),
+    ("status", "status"),
+    ("payment_status", "payment_status"),
+    ("hotel", "hotel__name"),
+    ("hotel_city", "hotel__city"),
+    ("room_type", "room_type__name"),
+    ("check_in", "check_in"),
+    ("check_out", "check_out"),
+    ("nights", "nights"),
+    ("rooms", "num_rooms"),
+    ("adults", "num_adults"),
+    ("children", "num_children"),
+    ("base_price", "base_price"),
+    ("discount_amount", "discount_amount"),
+    ("coupon_code", "coupon_code"),
+    ("coupon_discount", "coupon_discount"),
+    ("taxes", "taxes"),
+    ("total_amount", "total_amount"),
+    ("guest_name", "guest_detail__full_name"),
+    ("guest_email", "guest_detail__email"),
+    ("guest_phone", "guest_detail__phone"),
+    ("payment_method", "payment__payment_method"),
+    ("payment_successful", "payment__is_successful"),
+    ("payment_date", "payment__payment_date"),
+    ("transaction_id", "payment__transaction_id"),
+    ("gateway_order_id", "payment__gateway_order_id"),
+    ("gateway_payment_id", "payment__gateway_payment_id"),
+]
+HEADERS = [header for header, _ in EXPORT_COLUMNS]
+
+DATE_FIELDS = {
+    "created": "Booking date",
+    "check_in": "Check-in date",
+}
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_rows(start, end, date_field="created", hotel=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Value tuples (in EXPORT_COLUMNS order) for bookings made or checking in ``start``..``end``"""
+    if date_field == "check_in":
+        bookings = Booking.objects.filter(check_in__gte=start, check_in__lte=end)
+    else:
+        bookings = Booking.objects.filter(
+            created_at__gte=_day_start(start), created_at__lt=_day_start(end + timedelta(days=1))
+        )
+    if hotel is not None:
+        bookings = bookings.filter(hotel=hotel)
+    rows = bookings.values_list(*(lookup for _, lookup in EXPORT_COLUMNS)).order_by("pk")
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def _local(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    return value
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append([_local(value) for value in row])
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def csv_stream(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """CSV text, the header first, then one piece per chunk of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADERS)
+    yield buffer.getvalue()
+    for chunk in _chunks(rows, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+
+def ndjson_stream(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """One JSON object per booking and line, one piece per chunk of rows"""
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for chunk in _chunks(rows, chunk_size):
+        yield "".join(encoder.encode(dict(zip(HEADERS, row))) + "\n" for row in chunk)
+
+
+def stream(rows, export_format):
+    return ndjson_stream(rows) if export_format == "ndjson" else csv_stream(rows)
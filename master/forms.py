@@ -1,6 +1,8 @@
 from django import forms
 
-from hotels.models import Amenity, Hotel, RoomType
+from hotels.models import Amenity, Hotel, RateRule, RoomType
+
+from .exports import DATE_FIELDS
 
 
 class BaseStyledModelForm(forms.ModelForm):
@@ -94,3 +96,98 @@ class AmenityForm(BaseStyledModelForm):
     class Meta:
         model = Amenity
         fields = ["name", "icon", "category"]
+
+
+class RateRuleForm(BaseStyledModelForm):
+    weekdays = forms.TypedMultipleChoiceField(
+        choices=RateRule.WEEKDAY_CHOICES,
+        coerce=int,
+        initial=[day for day, _ in RateRule.WEEKDAY_CHOICES],
+        widget=forms.CheckboxSelectMultiple,
+    )
+
+    class Meta:
+        model = RateRule
+        fields = [
+            "name",
+            "room_type",
+            "start_date",
+            "end_date",
+            "weekdays",
+            "rate",
+            "adjustment_percentage",
+            "min_stay",
+            "is_closed",
+            "priority",
+        ]
+        widgets = {
+            "start_date": forms.DateInput(attrs={"type": "date"}),
+            "end_date": forms.DateInput(attrs={"type": "date"}),
+        }
+
+    def __init__(self, *args, hotel=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["room_type"].queryset = RoomType.objects.filter(hotel=hotel)
+        self.fields["room_type"].empty_label = "All room types"
+        if self.instance.pk:
+            self.initial["weekdays"] = [
+                day for day, _ in RateRule.WEEKDAY_CHOICES if self.instance.weekdays & (1 << day)
+            ]
+
+    def clean_weekdays(self):
+        """Store the selected days as the model's bitmask"""
+        mask = 0
+        for day in self.cleaned_data["weekdays"]:
+            mask |= 1 << day
+        if not mask:
+            raise forms.ValidationError("Pick at least one weekday.")
+        return mask
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get("start_date")
+        end_date = cleaned_data.get("end_date")
+        if start_date and end_date and end_date < start_date:
+            self.add_error("end_date", "End date cannot be before the start date.")
+        return cleaned_data
+
+
+class AnalyticsFilterForm(forms.Form):
+    """Hotel and night range for the occupancy report"""
+
+    MAX_DAYS = 366
+
+    hotel = forms.ModelChoiceField(
+        queryset=Hotel.objects.order_by("name"), required=False, empty_label="All hotels"
+    )
+    start = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+    end = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs.update({"class": "form-control form-control-dark"})
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get("start")
+        end = cleaned_data.get("end")
+        if start and end:
+            if end < start:
+                self.add_error("end", "End date cannot be before the start date.")
+            elif (end - start).days >= self.MAX_DAYS:
+                self.add_error("end", f"Pick a range of at most {self.MAX_DAYS} nights.")
+        return cleaned_data
+
+
+class BookingExportForm(AnalyticsFilterForm):
+    """Range, hotel and file format for the bookings export"""
+
+    date_field = forms.ChoiceField(choices=list(DATE_FIELDS.items()), initial="created", required=False)
+    format = forms.ChoiceField(choices=[("csv", "CSV"), ("ndjson", "NDJSON")], initial="csv", required=False)
+
+    def clean_date_field(self):
+        return self.cleaned_data["date_field"] or "created"
+
+    def clean_format(self):
+        return self.cleaned_data["format"] or "csv"
@@ -0,0 +1,193 @@
+"""
+Keyset pagination and cheap counts for the master module's list views
+
+``KeysetPaginationMixin`` replaces ListView's page-number pagination. Rows
+are ordered by ``keyset_ordering`` (non-null fields ending in a unique one,
+normally ``pk``) and each page seeks past the last row of the previous page,
+so page 50 is the same indexed range scan as page 1 instead of an OFFSET
+that reads and discards every earlier row. As in hotels/reviews.py, one
+extra row tells whether another page exists and the cursors are opaque
+tokens; ``after`` walks forward and ``before`` walks back.
+
+The "N results" line comes from ``result_count``: exact COUNTs are cached
+for ``COUNT_CACHE_SECONDS`` per distinct query, and an unfiltered count of a
+large table uses the planner's row estimate (PostgreSQL ``reltuples``,
+SQLite ``sqlite_stat1`` after ANALYZE) instead of scanning it.
+
+File Location: master/pagination.py
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import DatabaseError, connection
+from django.db.models import Q
+
+COUNT_CACHE_SECONDS = 60
+APPROXIMATE_COUNT_THRESHOLD = 10000
+
+ResultCount = namedtuple("ResultCount", ["value", "approximate"])
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, length):
+    """The ``length`` key values stored in a cursor token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor(token) from exc
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor(token)
+    return values
+
+
+def _field_name(field):
+    return field.lstrip("-")
+
+
+def _row_key(row, ordering):
+    return [getattr(row, _field_name(field)) for field in ordering]
+
+
+def seek(ordering, values, forward=True):
+    """Rows strictly after (or before) ``values`` in ``ordering``"""
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = _field_name(field)
+        lookup = "lt" if field.startswith("-") == forward else "gt"
+        condition |= Q(**equal, **{f"{name}__{lookup}": value})
+        equal[name] = value
+    return condition
+
+
+class KeysetPage:
+    """The page_obj of a keyset-paginated list"""
+
+    def __init__(self, object_list, ordering, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = encode_cursor(_row_key(object_list[-1], ordering)) if has_next else None
+        self.previous_cursor = encode_cursor(_row_key(object_list[0], ordering)) if has_previous else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_page(queryset, ordering, size, after=None, before=None):
+    """One page of ``queryset`` after the ``after`` cursor or before the ``before`` one"""
+    backward = bool(before)
+    cursor = before if backward else after
+    if cursor:
+        queryset = queryset.filter(seek(ordering, decode_cursor(cursor, len(ordering)), forward=not backward))
+    if backward:
+        ordering_used = [_field_name(field) if field.startswith("-") else f"-{field}" for field in ordering]
+    else:
+        ordering_used = list(ordering)
+    rows = list(queryset.order_by(*ordering_used)[:size + 1])
+    more = len(rows) > size
+    rows = rows[:size]
+    if backward:
+        rows.reverse()
+        return KeysetPage(rows, ordering, has_next=bool(rows), has_previous=more)
+    return KeysetPage(rows, ordering, has_next=more, has_previous=bool(cursor) and bool(rows))
+
+
+def approximate_count(model):
+    """The planner's row estimate for ``model``'s table, or None if there is none"""
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+    elif connection.vendor == "sqlite":
+        if "sqlite_stat1" not in connection.introspection.table_names(include_views=False):
+            return None
+        sql = "SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s LIMIT 1"
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+def result_count(queryset, timeout=COUNT_CACHE_SECONDS):
+    """ResultCount for ``queryset``: estimated for large unfiltered tables, otherwise an exact cached COUNT"""
+    queryset = queryset.order_by()
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return ResultCount(0, False)
+    key = "master:count:" + hashlib.md5(f"{sql}|{params!r}".encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        estimate = approximate_count(queryset.model) if not queryset.query.where else None
+        if estimate is not None and estimate >= APPROXIMATE_COUNT_THRESHOLD:
+            count = ResultCount(estimate, True)
+        else:
+            count = ResultCount(queryset.count(), False)
+        cache.set(key, count, timeout)
+    return count
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin: ``paginate_by`` rows per page in ``keyset_ordering``,
+    with ``page_obj`` a KeysetPage, ``result_count`` a ResultCount and
+    ``next_query``/``previous_query`` the query strings of the neighbouring
+    pages (other GET parameters kept). A stale or malformed cursor shows the
+    first page.
+    """
+
+    keyset_ordering = ("pk",)
+    paginate_by = 20
+
+    def _page_query(self, **cursor):
+        query = self.request.GET.copy()
+        query.pop("after", None)
+        query.pop("before", None)
+        query.update(cursor)
+        return query.urlencode()
+
+    def paginate_queryset(self, queryset, page_size):
+        self.unpaginated_queryset = queryset
+        try:
+            page = keyset_page(
+                queryset,
+                self.keyset_ordering,
+                page_size,
+                after=self.request.GET.get("after"),
+                before=self.request.GET.get("before"),
+            )
+        except InvalidCursor:
+            page = keyset_page(queryset, self.keyset_ordering, page_size)
+        return None, page, page.object_list, page.has_next or page.has_previous
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context.get("page_obj")
+        if page is not None:
+            context["result_count"] = result_count(self.unpaginated_queryset)
+            context["next_query"] = self._page_query(after=page.next_cursor) if page.has_next else ""
+            context["previous_query"] = self._page_query(before=page.previous_cursor) if page.has_previous else ""
+        return context
@@ -0,0 +1,225 @@
+"""Tests for master app"""
+
+import csv
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.tests import BookingFixtureTestCase
+from hotels.models import Hotel, RoomType
+from .pagination import result_count
+
+
+class MasterListPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        staff = User.objects.create_user(username='desk', password='pass123', is_staff=True)
+        staff.user_permissions.add(*Permission.objects.filter(codename__in=['view_hotel', 'view_roomtype']))
+        self.client.login(username='desk', password='pass123')
+        self.hotels = [
+            Hotel.objects.create(
+                name=f'Hotel {index:02d}', description='Listed', address='Temple Road',
+                distance_from_temple='100m', base_price=2000, is_active=index % 3 != 0,
+            )
+            for index in range(45)
+        ]
+        for hotel in self.hotels[:3]:
+            RoomType.objects.create(hotel=hotel, name='Deluxe', price_per_night=2000, total_rooms=2)
+            RoomType.objects.create(hotel=hotel, name='Suite', price_per_night=4000, total_rooms=1)
+
+    def walk(self, url, params=None):
+        pages, query = [], ''
+        response = self.client.get(url, params or {})
+        while True:
+            pages.append([hotel.name for hotel in response.context['hotels']])
+            query = response.context['next_query']
+            if not query:
+                return pages, response
+            response = self.client.get(f'{url}?{query}')
+
+    def test_pages_walk_forward_and_back(self):
+        url = reverse('master:hotels')
+        pages, last = self.walk(url)
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+        self.assertEqual(sum(pages, []), sorted(hotel.name for hotel in self.hotels))
+        self.assertEqual(last.context['result_count'], (45, False))
+
+        back = self.client.get(f"{url}?{last.context['previous_query']}")
+        self.assertEqual([hotel.name for hotel in back.context['hotels']], pages[1])
+
+        pages, last = self.walk(url, {'status': 'active'})
+        self.assertEqual(sum(pages, []), sorted(hotel.name for hotel in self.hotels if hotel.is_active))
+        self.assertIn('status=active', last.context['previous_query'])
+
+    def test_deep_pages_cost_the_same_as_the_first(self):
+        url = reverse('master:hotels')
+        first = self.client.get(url)
+        cursor = first.context['next_query']
+        with CaptureQueriesContext(connection) as first_page:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as deep_page:
+            self.client.get(f'{url}?{cursor}')
+        self.assertEqual(len(deep_page), len(first_page))
+        hotel_queries = [query['sql'] for query in deep_page if 'FROM "hotels_hotel"' in query['sql']]
+        self.assertTrue(hotel_queries)
+        self.assertFalse([sql for sql in hotel_queries if 'OFFSET' in sql])
+
+        broken = self.client.get(url, {'after': 'not-a-cursor'})
+        self.assertEqual(len(broken.context['hotels']), 20)
+
+    def test_rooms_hub_counts_rooms_in_one_query(self):
+        url = reverse('master:rooms-hub')
+        response = self.client.get(url)
+        counts = {hotel.name: hotel.room_count for hotel in response.context['hotels']}
+        self.assertEqual((counts['Hotel 01'], counts['Hotel 02'], counts['Hotel 04']), (2, 2, 0))
+        self.assertEqual(response.context['hotel_total'].value, 30)
+        self.assertEqual(response.context['room_total'].value, 4)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len([query for query in queries if 'hotels_' in query['sql']]), 1)
+
+    def test_large_unfiltered_tables_use_the_estimate(self):
+        with mock.patch('master.pagination.approximate_count', return_value=250000):
+            self.assertEqual(result_count(Hotel.objects.all()), (250000, True))
+            self.assertEqual(result_count(Hotel.objects.filter(is_active=True)), (30, False))
+
+
+class MasterAnalyticsViewTests(BookingFixtureTestCase):
+    """The occupancy report is limited to staff who can view bookings"""
+
+    hotel_name = "Fact Inn"
+    total_rooms = 4
+    days_ahead = 30
+
+    def test_master_analytics_requires_booking_permission(self):
+        self.login_staff('desk', 'view_hotel')
+        response = self.client.get(reverse('master:analytics'))
+        self.assertEqual(response.status_code, 403)
+        self.assertNotContains(self.client.get(reverse('master:dashboard')), reverse('master:analytics'))
+
+    def test_master_analytics_view(self):
+        self.login_staff('analyst', 'view_hotel', 'view_booking')
+        self.book()
+        response = self.client.get(reverse('master:analytics'), {
+            'hotel': self.hotel.pk, 'start': self.check_in.isoformat(), 'end': self.check_in.isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['report'].totals['occupancy'], 25.0)
+
+        response = self.client.get(reverse('master:analytics'), {
+            'start': self.check_in.isoformat(), 'end': (self.check_in - timedelta(days=1)).isoformat(),
+        })
+        self.assertIsNone(response.context['report'])
+
+
+@override_settings(PAYMENT_WORKER=False)
+class MasterDashboardTests(BookingFixtureTestCase):
+    """The dashboard charts come from cached daily rollups"""
+
+    hotel_name = "Rollup Inn"
+    total_rooms = 5
+    days_ahead = 15
+
+    def book(self, payment_method='payathotel'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return super().book(guest={'full_name': 'Summed'}, payment_method=payment_method)
+
+    def test_dashboard_reads_cached_rollups(self):
+        self.login_staff('manager', 'view_hotel')
+        self.book()
+        self.book(payment_method='razorpay')
+
+        response = self.client.get(reverse('master:dashboard'), {'range': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['stats']['series']), 7)
+        self.assertEqual((response.context['totals']['created'], response.context['online_share']), (2, 50))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('master:dashboard'), {'range': 7})
+        self.assertFalse([query for query in queries if 'bookings_dailybookingstats' in query['sql']])
+        self.assertEqual(len(self.client.get(reverse('master:dashboard'), {'range': 'x'}).context['stats']['series']), 90)
+
+
+@override_settings(PAYMENT_WORKER=False)
+class BookingExportTests(BookingFixtureTestCase):
+    """Finance exports stream joined rows without per-booking queries"""
+
+    hotel_name = "Ledger Inn"
+    total_rooms = 10
+    days_ahead = 5
+
+    def setUp(self):
+        super().setUp()
+        self.staff = self.login_staff('finance', 'view_hotel', 'view_booking')
+        self.today = timezone.localdate()
+
+    def book_many(self, count, payment_method='payathotel'):
+        return [
+            self.book(
+                payment_method=payment_method,
+                guest={'full_name': f'Guest {index}', 'email': f'guest{index}@example.com'},
+            )
+            for index in range(count)
+        ]
+
+    def export(self, **params):
+        params = dict({'start': self.today.isoformat(), 'end': self.today.isoformat()}, **params)
+        response = self.client.get(reverse('master:booking-export'), params)
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as queries:
+            body = b''.join(response.streaming_content).decode()
+        return response, body, len(queries)
+
+    def test_csv_has_joined_columns(self):
+        bookings = self.book_many(2) + self.book_many(1, payment_method='razorpay')
+        response, body, queries = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="bookings-', response['Content-Disposition'])
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual([row['booking_id'] for row in rows], [booking.booking_id for booking in bookings])
+        self.assertEqual(
+            (rows[0]['hotel'], rows[0]['room_type'], rows[0]['guest_name'], rows[0]['payment_method']),
+            ('Ledger Inn', 'Deluxe', 'Guest 0', 'payathotel'),
+        )
+        self.assertEqual(rows[2]['payment_method'], 'razorpay')
+        self.assertEqual(queries, 1)
+
+        self.book_many(5)
+        _, _, queries = self.export()
+        self.assertEqual(queries, 1)
+
+    def test_ndjson_by_check_in_and_empty_ranges(self):
+        booking = self.book_many(1)[0]
+        response, body, _ = self.export(format='ndjson', date_field='check_in', start=self.check_in.isoformat(), end=self.check_in.isoformat())
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        record = json.loads(body.splitlines()[0])
+        self.assertEqual((record['booking_id'], record['total_amount'], record['check_in']),
+                         (booking.booking_id, str(booking.total_amount), self.check_in.isoformat()))
+
+        _, body, _ = self.export(format='ndjson', start=(self.today - timedelta(days=9)).isoformat(),
+                                 end=(self.today - timedelta(days=1)).isoformat())
+        self.assertEqual(body, '')
+
+    def test_requires_booking_permission_and_valid_range(self):
+        form_page = self.client.get(reverse('master:booking-export'))
+        self.assertEqual(form_page.status_code, 200)
+        self.assertFalse(form_page.streaming)
+        invalid = self.client.get(reverse('master:booking-export'), {
+            'start': self.today.isoformat(), 'end': (self.today + timedelta(days=400)).isoformat(),
+        })
+        self.assertFalse(invalid.streaming)
+        self.assertTrue(invalid.context['form'].errors)
+
+        self.staff.user_permissions.remove(Permission.objects.get(codename='view_booking'))
+        self.assertEqual(self.client.get(reverse('master:booking-export')).status_code, 403)
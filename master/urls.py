@@ -6,6 +6,8 @@ app_name = "master"
 
 urlpatterns = [
     path("", views.dashboard, name="dashboard"),
+    path("analytics/", views.analytics, name="analytics"),
+    path("bookings/export/", views.export_bookings, name="booking-export"),
     path("hotels/", views.HotelListView.as_view(), name="hotels"),
     path("hotels/create/", views.HotelCreateView.as_view(), name="hotel-create"),
     path("hotels/<int:pk>/edit/", views.HotelUpdateView.as_view(), name="hotel-edit"),
@@ -23,6 +25,18 @@ urlpatterns = [
     ),
     path("rooms/<int:pk>/edit/", views.RoomTypeUpdateView.as_view(), name="room-edit"),
     path("rooms/<int:pk>/delete/", views.RoomTypeDeleteView.as_view(), name="room-delete"),
+    path(
+        "hotels/<int:hotel_id>/rates/",
+        views.RateRuleListView.as_view(),
+        name="hotel-rates",
+    ),
+    path(
+        "hotels/<int:hotel_id>/rates/create/",
+        views.RateRuleCreateView.as_view(),
+        name="rate-create",
+    ),
+    path("rates/<int:pk>/edit/", views.RateRuleUpdateView.as_view(), name="rate-edit"),
+    path("rates/<int:pk>/delete/", views.RateRuleDeleteView.as_view(), name="rate-delete"),
     path("amenities/", views.AmenityListView.as_view(), name="amenities"),
     path("amenities/create/", views.AmenityCreateView.as_view(), name="amenity-create"),
     path("amenities/<int:pk>/edit/", views.AmenityUpdateView.as_view(), name="amenity-edit"),
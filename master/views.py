@@ -2,17 +2,23 @@ from datetime import timedelta
 
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
-from django.db.models import Q
-from django.http import HttpResponseForbidden
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.generic import CreateView, DeleteView, ListView, UpdateView
 
+from bookings import analytics as booking_analytics
+from bookings import rollups as booking_rollups
 from bookings.models import Booking
-from hotels.models import Amenity, Hotel, RoomType
-from .forms import AmenityForm, HotelForm, RoomTypeForm
+from core.search import filter_hotels
+from hotels.models import Amenity, Hotel, RateCalendar, RateRule, RoomType
+from . import exports
+from .forms import AmenityForm, AnalyticsFilterForm, BookingExportForm, HotelForm, RateRuleForm, RoomTypeForm
+from .pagination import KeysetPaginationMixin, result_count
 
 
 def staff_required(view_func):
@@ -40,35 +46,112 @@ class StaffPermissionRequiredMixin(LoginRequiredMixin, PermissionRequiredMixin):
         return super().dispatch(request, *args, **kwargs)
 
 
+DASHBOARD_RANGES = (7, 30, 90)
+DASHBOARD_CACHE_SECONDS = 60
+CHART_WIDTH, CHART_HEIGHT = 600, 220
+
+
+def _chart_paths(values):
+    """SVG line and area paths for a daily series, scaled to the chart box"""
+    peak = max(values) or 1
+    step = CHART_WIDTH / max(len(values) - 1, 1)
+    points = [
+        (round(index * step, 1), round(CHART_HEIGHT - 10 - value / peak * (CHART_HEIGHT - 40), 1))
+        for index, value in enumerate(values)
+    ]
+    line = "M" + " L".join(f"{x} {y}" for x, y in points)
+    return {"line": line, "area": f"{line} L{points[-1][0]} {CHART_HEIGHT} L0 {CHART_HEIGHT} Z", "peak": max(values)}
+
+
+def _dashboard_stats(days):
+    """Tiles and chart series from the daily rollups, cached briefly"""
+    key = f"master:dashboard:{days}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = booking_rollups.summary(days)
+        stats["hotels"] = Hotel.objects.count()
+        stats["rooms"] = RoomType.objects.count()
+        cache.set(key, stats, DASHBOARD_CACHE_SECONDS)
+    return stats
+
+
 @staff_required
 def dashboard(request):
-    now = timezone.now()
-    week_ago = now - timedelta(days=7)
-    stats = {
-        "hotels": Hotel.objects.count(),
-        "rooms": RoomType.objects.count(),
-        "bookings": Booking.objects.count(),
-        "recent_bookings": Booking.objects.filter(created_at__gte=week_ago).count(),
-    }
+    try:
+        days = int(request.GET.get("range", DASHBOARD_RANGES[-1]))
+    except ValueError:
+        days = DASHBOARD_RANGES[-1]
+    if days not in DASHBOARD_RANGES:
+        days = DASHBOARD_RANGES[-1]
+    stats = _dashboard_stats(days)
+    totals = stats["totals"]
+    paying = totals["pay_at_hotel"] + totals["online"]
     latest_bookings = (
         Booking.objects.select_related("hotel", "room_type")
         .order_by("-created_at")[:5]
     )
-    chart_data = [12, 18, 9, 20, 25, 22, 28]
     return render(
         request,
         "master/dashboard.html",
-        {"stats": stats, "chart_data": chart_data, "latest_bookings": latest_bookings},
+        {
+            "stats": stats,
+            "totals": totals,
+            "online_share": round(totals["online"] / paying * 100) if paying else 0,
+            "chart": _chart_paths([point["created"] for point in stats["series"]]),
+            "days": days,
+            "ranges": DASHBOARD_RANGES,
+            "latest_bookings": latest_bookings,
+        },
     )
 
 
+@staff_required
+def analytics(request):
+    """Occupancy, ADR and RevPAR from the BookedNight facts"""
+    if not request.user.has_perm("bookings.view_booking"):
+        return HttpResponseForbidden("Insufficient permissions")
+    today = timezone.localdate()
+    form = AnalyticsFilterForm(request.GET or {"start": today - timedelta(days=29), "end": today})
+    report = None
+    if form.is_valid():
+        hotel = form.cleaned_data["hotel"]
+        report = booking_analytics.performance(
+            form.cleaned_data["start"],
+            form.cleaned_data["end"],
+            hotel_ids=[hotel.pk] if hotel else None,
+        )
+    return render(request, "master/analytics.html", {"form": form, "report": report})
+
+
+@staff_required
+def export_bookings(request):
+    """Stream bookings with guest, payment and hotel columns as CSV or NDJSON"""
+    if not request.user.has_perm("bookings.view_booking"):
+        return HttpResponseForbidden("Insufficient permissions")
+    form = BookingExportForm(request.GET or None)
+    if not form.is_valid():
+        today = timezone.localdate()
+        if not form.is_bound:
+            form = BookingExportForm(initial={"start": today.replace(day=1), "end": today})
+        return render(request, "master/export.html", {"form": form})
+    data = form.cleaned_data
+    rows = exports.export_rows(data["start"], data["end"], data["date_field"], data["hotel"])
+    content_type, extension = exports.FORMATS[data["format"]]
+    response = StreamingHttpResponse(exports.stream(rows, data["format"]), content_type=content_type)
+    response["Content-Disposition"] = (
+        f'attachment; filename="bookings-{data["start"]:%Y%m%d}-{data["end"]:%Y%m%d}.{extension}"'
+    )
+    return response
+
+
 @method_decorator(staff_required, name="dispatch")
-class HotelListView(StaffPermissionRequiredMixin, ListView):
+class HotelListView(KeysetPaginationMixin, StaffPermissionRequiredMixin, ListView):
     model = Hotel
     template_name = "master/hotels/list.html"
     context_object_name = "hotels"
     permission_required = "hotels.view_hotel"
     paginate_by = 20
+    keyset_ordering = ("name", "pk")
 
     def get_queryset(self):
         queryset = Hotel.objects.all()
@@ -76,11 +159,8 @@ class HotelListView(StaffPermissionRequiredMixin, ListView):
         status = self.request.GET.get("status")
         city = self.request.GET.get("city")
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search)
-                | Q(city__icontains=search)
-                | Q(address__icontains=search)
-            )
+            # Keyset pages follow the name order, not search relevance
+            queryset = filter_hotels(queryset, search, ranked=False)
         if status == "active":
             queryset = queryset.filter(is_active=True)
         elif status == "inactive":
@@ -123,23 +203,21 @@ class HotelDeleteView(StaffPermissionRequiredMixin, DeleteView):
 
 
 @method_decorator(staff_required, name="dispatch")
-class RoomsHubView(StaffPermissionRequiredMixin, ListView):
+class RoomsHubView(KeysetPaginationMixin, StaffPermissionRequiredMixin, ListView):
     model = Hotel
     template_name = "master/rooms/hub.html"
     context_object_name = "hotels"
     permission_required = "hotels.view_roomtype"
+    paginate_by = 24
+    keyset_ordering = ("name", "pk")
 
     def get_queryset(self):
-        return (
-            Hotel.objects.filter(is_active=True)
-            .prefetch_related("room_types")
-            .order_by("name")
-        )
+        return Hotel.objects.filter(is_active=True).annotate(room_count=Count("room_types"))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["room_total"] = RoomType.objects.count()
-        context["hotel_total"] = Hotel.objects.count()
+        context["hotel_total"] = context["result_count"]
+        context["room_total"] = result_count(RoomType.objects.filter(hotel__is_active=True))
         return context
 
 
@@ -221,6 +299,103 @@ class RoomTypeDeleteView(StaffPermissionRequiredMixin, DeleteView):
         return reverse_lazy("master:hotel-rooms", kwargs={"hotel_id": self.object.hotel_id})
 
 
+RATE_PREVIEW_DAYS = 14
+
+
+@method_decorator(staff_required, name="dispatch")
+class RateRuleListView(StaffPermissionRequiredMixin, ListView):
+    model = RateRule
+    template_name = "master/rates/list.html"
+    context_object_name = "rules"
+    permission_required = "hotels.view_raterule"
+
+    def get_queryset(self):
+        self.hotel = get_object_or_404(Hotel, pk=self.kwargs.get("hotel_id"))
+        return RateRule.objects.filter(hotel=self.hotel).select_related("room_type")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        today = timezone.localdate()
+        days = [today + timedelta(days=offset) for offset in range(RATE_PREVIEW_DAYS)]
+        # What the rules currently resolve to, straight from the calendar
+        nights = {
+            (night.room_type_id, night.date): night
+            for night in RateCalendar.objects.filter(
+                hotel=self.hotel, date__gte=days[0], date__lte=days[-1]
+            )
+        }
+        context["hotel"] = self.hotel
+        context["preview_days"] = days
+        context["preview_rows"] = [
+            (room, [nights.get((room.pk, day)) for day in days])
+            for room in self.hotel.room_types.all()
+        ]
+        context["can_add_rule"] = self.request.user.has_perm("hotels.add_raterule")
+        return context
+
+
+class RateRuleFormMixin:
+    form_class = RateRuleForm
+    template_name = "master/rates/form.html"
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["hotel"] = self.hotel
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["hotel"] = self.hotel
+        return context
+
+    def get_success_url(self):
+        return reverse_lazy("master:hotel-rates", kwargs={"hotel_id": self.hotel.pk})
+
+
+@method_decorator(staff_required, name="dispatch")
+class RateRuleCreateView(RateRuleFormMixin, StaffPermissionRequiredMixin, CreateView):
+    model = RateRule
+    permission_required = "hotels.add_raterule"
+
+    def dispatch(self, request, *args, **kwargs):
+        self.hotel = get_object_or_404(Hotel, pk=kwargs.get("hotel_id"))
+        return super().dispatch(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        form.instance.hotel = self.hotel
+        return super().form_valid(form)
+
+
+@method_decorator(staff_required, name="dispatch")
+class RateRuleUpdateView(RateRuleFormMixin, StaffPermissionRequiredMixin, UpdateView):
+    model = RateRule
+    permission_required = "hotels.change_raterule"
+
+    def get_object(self, queryset=None):
+        rule = super().get_object(queryset)
+        self.hotel = rule.hotel
+        return rule
+
+
+@method_decorator(staff_required, name="dispatch")
+class RateRuleDeleteView(StaffPermissionRequiredMixin, DeleteView):
+    model = RateRule
+    template_name = "master/components/confirm_delete.html"
+    permission_required = "hotels.delete_raterule"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["hotel"] = self.object.hotel
+        context["entity_label"] = f"rate rule '{self.object.name}'"
+        context["back_url"] = reverse_lazy(
+            "master:hotel-rates", kwargs={"hotel_id": self.object.hotel_id}
+        )
+        return context
+
+    def get_success_url(self):
+        return reverse_lazy("master:hotel-rates", kwargs={"hotel_id": self.object.hotel_id})
+
+
 @method_decorator(staff_required, name="dispatch")
 class AmenityListView(StaffPermissionRequiredMixin, ListView):
     model = Amenity
@@ -1,3 +1,67 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from bookings.history import booking_history
+from bookings.models import Booking
+from bookings.services import create_booking
+from hotels.models import Hotel, RoomType
+
+
+class DashboardHistoryTests(TestCase):
+    """The dashboard's booking history costs the same for one stay or many"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='pilgrim', password='pass123')
+        self.client.login(username='pilgrim', password='pass123')
+        self.hotel = Hotel.objects.create(
+            name="Repeat Inn", description="Again", address="Temple Road",
+            distance_from_temple="150m", base_price=2000,
+        )
+        self.room_type = RoomType.objects.create(hotel=self.hotel, name="Deluxe", price_per_night=2000, total_rooms=20)
+        self.today = date.today()
+
+    def book(self, days_ahead, status=None):
+        check_in = self.today + timedelta(days=days_ahead)
+        booking = create_booking(
+            hotel=self.hotel, room_type=self.room_type, check_in=check_in,
+            check_out=check_in + timedelta(days=1), guest={'full_name': 'Pilgrim'}, user=self.user,
+        )
+        if status:
+            Booking.objects.filter(pk=booking.pk).update(status=status)
+        return booking
+
+    def dashboard_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('users:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_history_is_split_in_memory(self):
+        upcoming = self.book(5)
+        cancelled = self.book(6, status='cancelled')
+        Booking.objects.filter(pk=self.book(1).pk).update(
+            check_in=self.today - timedelta(days=3), check_out=self.today - timedelta(days=1),
+        )
+        with self.assertNumQueries(2):
+            history = booking_history(self.user, self.today)
+            self.assertEqual({booking.hotel.name for booking in history.bookings}, {'Repeat Inn'})
+            self.assertEqual({booking.payment.payment_method for booking in history.bookings}, {'payathotel'})
+        self.assertEqual([booking.pk for booking in history.upcoming], [upcoming.pk])
+        self.assertIn(cancelled.pk, [booking.pk for booking in history.previous])
+        self.assertEqual((history.total_count, history.upcoming_count, history.previous_count), (3, 1, 2))
 
-# Create your tests here.
+    def test_dashboard_queries_do_not_grow_with_bookings(self):
+        self.book(5)
+        self.book(6, status='cancelled')
+        baseline, _ = self.dashboard_queries()
+        for days_ahead in range(7, 17):
+            self.book(days_ahead)
+        queries, response = self.dashboard_queries()
+        self.assertEqual(queries, baseline)
+        self.assertEqual(response.context['upcoming_count'], 11)
+        self.assertEqual(response.context['total_bookings'], 12)
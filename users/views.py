@@ -8,11 +8,10 @@ from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Q
 from django.shortcuts import redirect, render
 from django.utils import timezone
 
-from bookings.models import Booking
+from bookings.history import booking_history
 from .forms import LoginForm, OTPVerificationForm, SignupForm
 from .models import UserProfile
 
@@ -133,6 +132,19 @@ def user_logout(request):
     return redirect('core:index')
 
 
+def _dashboard_context(user, profile):
+    """Profile and booking history for the dashboard (two booking queries)"""
+    history = booking_history(user)
+    return {
+        'profile': profile,
+        'upcoming_bookings': history.upcoming,
+        'previous_bookings': history.previous,
+        'upcoming_count': history.upcoming_count,
+        'previous_count': history.previous_count,
+        'total_bookings': history.total_count,
+    }
+
+
 @login_required
 def user_dashboard(request):
     """User dashboard view with bookings and profile editing"""
@@ -148,19 +160,7 @@ def user_dashboard(request):
             # Validate length
             if len(phone) != 10:
                 messages.error(request, 'Phone number must be exactly 10 digits.')
-                # Get bookings for context
-                all_bookings = Booking.objects.filter(user=request.user).order_by('-created_at')
-                today = timezone.now().date()
-                upcoming_bookings = all_bookings.filter(check_in__gte=today, status__in=['pending', 'confirmed'])
-                previous_bookings = all_bookings.filter(
-                    Q(check_out__lt=today) | Q(status__in=['completed', 'cancelled'])
-                )
-                context = {
-                    'profile': profile,
-                    'upcoming_bookings': upcoming_bookings,
-                    'previous_bookings': previous_bookings,
-                    'total_bookings': all_bookings.count(),
-                }
+                context = _dashboard_context(request.user, profile)
                 return render(request, 'users/dashboard.html', context)
         
         # Update user info
@@ -180,21 +180,6 @@ def user_dashboard(request):
         messages.success(request, 'Profile updated successfully!')
         return redirect('users:dashboard')
     
-    # Get all bookings for the user
-    all_bookings = Booking.objects.filter(user=request.user).order_by('-created_at')
-    
-    # Separate upcoming and previous bookings
-    today = timezone.now().date()
-    upcoming_bookings = all_bookings.filter(check_in__gte=today, status__in=['pending', 'confirmed'])
-    previous_bookings = all_bookings.filter(
-        Q(check_out__lt=today) | Q(status__in=['completed', 'cancelled'])
-    )
-    
-    context = {
-        'profile': profile,
-        'upcoming_bookings': upcoming_bookings,
-        'previous_bookings': previous_bookings,
-        'total_bookings': all_bookings.count(),
-    }
+    context = _dashboard_context(request.user, profile)
     
     return render(request, 'users/dashboard.html', context)